@@ -0,0 +1,6 @@
+"""
+Benchmarks for the walk-in queue application
+
+Each module is runnable on its own, e.g. ``python -m benchmarks.sessions``.
+They run against a throw-away test database, never against db.sqlite3.
+"""
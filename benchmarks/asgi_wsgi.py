@@ -0,0 +1,227 @@
+"""
+Async views under ASGI vs sync views under WSGI for the read-heavy pages
+
+Builds a SQLite database with synthetic history (production profile, WAL),
+then serves it twice: uvicorn with walkin_project.asgi (async dashboard, desk
+detail and desk management views, WALKIN_ASYNC_VIEWS=1) and a threaded WSGI
+server with walkin_project.wsgi (sync views). The same number of client
+threads request the three pages for --duration seconds against each server;
+requests/sec and p50/p95/p99 latency are reported.
+
+--query-delay adds a fixed delay to every SQL statement inside the servers,
+standing in for a database across the network, where waiting on queries
+rather than Python dominates.
+
+    python -m benchmarks.asgi_wsgi --concurrency 32 --duration 20
+    python -m benchmarks.asgi_wsgi --concurrency 32 --query-delay 5
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .common import BASE_DIR, percentile, setup_django
+
+SERVERS = ['wsgi', 'asgi']
+
+
+def prepare(args):
+    """Runs in a child process: create the database, print desk ids and a session cookie"""
+    setup_django()
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.test import Client
+
+    from walkin.models import Desk, Location, User, WalkInQueue
+    from walkin.synthetic import generate
+
+    call_command('migrate', verbosity=0)
+    generate(1, args.desks, args.days, args.per_day, seed=0)
+    location = Location.objects.get()
+    desks = list(Desk.objects.filter(location=location).order_by('id'))
+    for number in range(args.waiting):
+        WalkInQueue.enqueue(desks[number % len(desks)], customer_name=f'Khách {number}', service_type='-')
+    User.objects.create_user('bench', password='pw', location=location, role='admin')
+    client = Client()
+    client.login(username='bench', password='pw')
+    print(json.dumps({
+        'desks': [desk.id for desk in desks],
+        'session': client.cookies[settings.SESSION_COOKIE_NAME].value,
+    }))
+
+
+def install_query_delay(delay):
+    """Sleep `delay` seconds before every statement on every connection"""
+    from django.db.backends.signals import connection_created
+
+    def wrapper(execute, sql, params, many, context):
+        time.sleep(delay)
+        return execute(sql, params, many, context)
+
+    def on_connect(sender, connection, **kwargs):
+        connection.execute_wrappers.append(wrapper)
+
+    connection_created.connect(on_connect, weak=False)
+
+
+def serve(args):
+    """Runs in a child process: serve the app on args.port until killed"""
+    if args.serve == 'wsgi':
+        from socketserver import ThreadingMixIn
+        from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+        from walkin_project.wsgi import application
+
+        class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+            daemon_threads = True
+            request_queue_size = 1024
+
+        class QuietHandler(WSGIRequestHandler):
+            def log_message(self, *args):
+                pass
+
+        if args.query_delay:
+            install_query_delay(args.query_delay / 1000)
+        make_server('127.0.0.1', args.port, application, ThreadingWSGIServer, QuietHandler).serve_forever()
+    else:
+        import uvicorn
+
+        from walkin_project.asgi import application
+
+        if args.query_delay:
+            install_query_delay(args.query_delay / 1000)
+        uvicorn.run(application, host='127.0.0.1', port=args.port, log_level='warning', backlog=1024)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def load(port, paths, session, concurrency, duration):
+    """Client threads request `paths` in turn; returns (requests, errors, latencies)"""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+    headers = {'Cookie': f'sessionid={session}'}
+
+    def client(index):
+        own, failed = [], 0
+        position = index
+        while time.monotonic() < deadline:
+            path = paths[position % len(paths)]
+            position += 1
+            started = time.perf_counter()
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                connection.close()
+                ok = response.status == 200
+            except OSError:
+                ok = False
+            if ok:
+                own.append(time.perf_counter() - started)
+            else:
+                failed += 1
+        with lock:
+            latencies.extend(own)
+            errors.append(failed)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies), sum(errors), latencies
+
+
+def run_server(server, args, env, paths, session):
+    port = free_port()
+    command = [sys.executable, '-m', 'benchmarks.asgi_wsgi', '--serve', server, '--port', str(port),
+               '--query-delay', str(args.query_delay)]
+    server_env = dict(env, WALKIN_ASYNC_VIEWS='1' if server == 'asgi' else '0')
+    process = subprocess.Popen(command, env=server_env, cwd=BASE_DIR)
+    try:
+        wait_until_up(port)
+        load(port, paths, session, args.concurrency, min(args.duration, 3))  # warm-up
+        requests, errors, latencies = load(port, paths, session, args.concurrency, args.duration)
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        'requests': requests,
+        'errors': errors,
+        'rps': requests / args.duration,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=32, help='client threads')
+    parser.add_argument('--duration', type=float, default=20, help='seconds per server')
+    parser.add_argument('--query-delay', type=float, default=0, help='milliseconds added to every SQL statement')
+    parser.add_argument('--desks', type=int, default=8)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--per-day', type=int, default=40)
+    parser.add_argument('--waiting', type=int, default=40, help='tickets waiting today')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--prepare', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--serve', choices=SERVERS, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        prepare(args)
+        return
+    if args.serve:
+        setup_django()
+        serve(args)
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, WALKIN_DB_PROFILE='production', WALKIN_DB_NAME=os.path.join(directory, 'bench.sqlite3'))
+        command = [sys.executable, '-m', 'benchmarks.asgi_wsgi', '--prepare', '--desks', str(args.desks),
+                   '--days', str(args.days), '--per-day', str(args.per_day), '--waiting', str(args.waiting)]
+        output = subprocess.run(command, env=env, cwd=BASE_DIR, check=True, capture_output=True, text=True)
+        prepared = json.loads(output.stdout.strip().splitlines()[-1])
+        paths = ['/dashboard/', '/desks/management/'] + [f'/desks/{desk_id}/' for desk_id in prepared['desks']]
+
+        print(f'{args.concurrency} clients x {args.duration:.0f}s, query delay {args.query_delay} ms')
+        print(f'{"server":8} {"req/s":>8} {"errors":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+        for server in SERVERS:
+            result = results[server] = run_server(server, args, env, paths, prepared['session'])
+            print(f'{server:8} {result["rps"]:8.1f} {result["errors"]:7d} {result["p50_ms"]:8.1f} '
+                  f'{result["p95_ms"]:8.1f} {result["p99_ms"]:8.1f}')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Simulate manual vs automatic desk assignment on recorded queue traffic
+
+Replays the arrivals of one location (synthetic history by default, or a
+real location with --location) through a discrete-event simulation of the
+desks: one clerk per desk, priority customers first, recorded service
+durations. Each arrival is either sent to the desk it was recorded at
+(manual) or to the desk walkin.assignment ranks first, using the same
+in-memory waitlists and moving-average service times as the live system.
+Reports mean/p50/p95 wait per policy; with --check the run exits with
+status 1 unless automatic assignment has a lower mean and p95 wait.
+
+    python -m benchmarks.assignment --days 30 --desks 8 --per-day 50
+    python -m benchmarks.assignment --location 3 --days 60 --check
+"""
+
+import argparse
+import heapq
+import json
+import sys
+from collections import defaultdict
+from datetime import timedelta
+
+from .common import percentile, setup_django, test_database
+
+POLICIES = ['manual', 'auto']
+
+
+def recorded_days(location, days):
+    """Completed tickets of the last `days` days, grouped by day and sorted by arrival"""
+    from django.db.models import F
+
+    from walkin.models import WalkInQueue
+    from walkin.utils import local_today
+
+    since = local_today(location) - timedelta(days=days)
+    rows = (
+        WalkInQueue.objects.filter(
+            location=location, queue_date__gte=since, status='completed',
+            started_at__isnull=False, completed_at__isnull=False,
+        )
+        .annotate(service=F('completed_at') - F('started_at'))
+        .order_by('queue_date', 'created_at')
+        .values_list('id', 'queue_date', 'created_at', 'desk_id', 'service_type', 'is_priority', 'service')
+    )
+    grouped = defaultdict(list)
+    for queue_id, day, created_at, desk_id, service_type, is_priority, service in rows:
+        grouped[day].append((queue_id, created_at, desk_id, service_type, is_priority, service.total_seconds()))
+    return [grouped[day] for day in sorted(grouped)]
+
+
+def simulate(desks, days, policy):
+    """Waiting times (seconds) of every replayed customer under `policy`"""
+    from walkin.assignment import rank_desks
+    from walkin.eta import ServiceTimes, update_stats
+    from walkin.waitlist import DeskWaitlist
+
+    stats = {}
+    times = ServiceTimes(stats=stats)
+    by_id = {desk.id: desk for desk in desks}
+    covering = {}
+    waits = []
+
+    for arrivals in days:
+        day = arrivals[0][1].date()
+        waitlists = {desk.id: DeskWaitlist(day) for desk in desks}
+        tickets = {}
+        finished = []  # (completed_at, desk_id)
+
+        def start_next(desk_id, now):
+            waitlist = waitlists[desk_id]
+            queue_id = waitlist.peek()
+            if queue_id is None:
+                return
+            waitlist.remove(queue_id)
+            created_at, service_type, service = tickets[queue_id]
+            waits.append((now - created_at).total_seconds())
+            waitlist.serving = (queue_id, service_type, now)
+            heapq.heappush(finished, (now + timedelta(seconds=service), desk_id))
+
+        def finish_until(moment):
+            while finished and finished[0][0] <= moment:
+                now, desk_id = heapq.heappop(finished)
+                queue_id, service_type, started_at = waitlists[desk_id].serving
+                update_stats(stats, desk_id, service_type, (now - started_at).total_seconds())
+                waitlists[desk_id].serving = None
+                start_next(desk_id, now)
+
+        for queue_id, created_at, desk_id, service_type, is_priority, service in arrivals:
+            finish_until(created_at)
+            if policy == 'auto':
+                if service_type not in covering:
+                    covering[service_type] = [desk for desk in desks if desk.covers(service_type)]
+                candidates = [(desk, waitlists[desk.id]) for desk in covering[service_type]]
+                if candidates:
+                    desk_id = rank_desks(candidates, times, is_priority, now=created_at)[0][0].id
+            if desk_id not in by_id:
+                continue
+            tickets[queue_id] = (created_at, service_type, service)
+            waitlists[desk_id].push(queue_id, is_priority, created_at, service_type)
+            if waitlists[desk_id].serving is None:
+                start_next(desk_id, created_at)
+        while finished:
+            finish_until(finished[0][0])
+    return waits
+
+
+def summarize(waits):
+    minutes = [wait / 60 for wait in waits]
+    return {
+        'customers': len(minutes),
+        'mean_min': sum(minutes) / len(minutes) if minutes else 0.0,
+        'p50_min': percentile(minutes, 0.50),
+        'p95_min': percentile(minutes, 0.95),
+    }
+
+
+def run(location, days):
+    desks = list(location.desks.filter(is_active=True).order_by('id'))
+    history = recorded_days(location, days)
+    print(f'{location.name}: {len(desks)} desks, {sum(len(day) for day in history)} completed tickets '
+          f'over {len(history)} days')
+    results = {}
+    print(f'{"policy":10} {"customers":>10} {"mean min":>10} {"p50 min":>10} {"p95 min":>10}')
+    for policy in POLICIES:
+        result = results[policy] = summarize(simulate(desks, history, policy))
+        print(f'{policy:10} {result["customers"]:10d} {result["mean_min"]:10.2f} '
+              f'{result["p50_min"]:10.2f} {result["p95_min"]:10.2f}')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--location', type=int,
+                        help='replay this location from the configured database instead of synthetic data')
+    parser.add_argument('--desks', type=int, default=8, help='synthetic desks')
+    parser.add_argument('--days', type=int, default=30, help='days of history to replay')
+    parser.add_argument('--per-day', type=int, default=50, help='synthetic customers per desk and day')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--check', action='store_true',
+                        help='exit with status 1 unless auto has a lower mean and p95 wait than manual')
+    args = parser.parse_args()
+
+    setup_django()
+    from walkin.models import Location
+    from walkin.synthetic import generate
+
+    if args.location is not None:
+        results = run(Location.objects.get(id=args.location), args.days)
+    else:
+        with test_database():
+            generate(1, args.desks, args.days, args.per_day, seed=args.seed)
+            results = run(Location.objects.get(), args.days)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'results': results}, output, indent=2)
+
+    manual, auto = results['manual'], results['auto']
+    better = auto['mean_min'] < manual['mean_min'] and auto['p95_min'] < manual['p95_min']
+    print(f'auto vs manual: mean {auto["mean_min"] - manual["mean_min"]:+.2f} min, '
+          f'p95 {auto["p95_min"] - manual["p95_min"]:+.2f} min')
+    if args.check and not better:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""Shared helpers for the benchmark scripts"""
+
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+# Re-exported for the benchmark scripts, same interpolation as /ops/perf/ and the SQLite aggregate
+from walkin.stats import percentile  # noqa: F401
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """Configure Django the same way manage.py does"""
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'walkin_project.settings')
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Create the test database for the duration of a benchmark"""
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+@contextmanager
+def count_writes(table, using='default'):
+    """Count INSERT/UPDATE/DELETE statements against `table`"""
+    from django.db import connections
+
+    counter = {'writes': 0}
+    quoted = f'"{table}"'
+
+    def wrapper(execute, sql, params, many, context):
+        statement = sql.lstrip().upper()
+        if quoted in sql and statement.startswith(('INSERT', 'UPDATE', 'DELETE')):
+            counter['writes'] += 1
+        return execute(sql, params, many, context)
+
+    with connections[using].execute_wrapper(wrapper):
+        yield counter
@@ -0,0 +1,198 @@
+"""
+Replay clerk and lobby display traffic against the walk-in views
+
+Builds a synthetic dataset (walkin.synthetic) in a throwaway test database,
+drives each scenario through the Django test client and reports throughput,
+latency percentiles and SQL queries per request. With --baseline the run
+exits with status 1 when a tracked metric is worse than the baseline by
+more than the allowed threshold.
+
+    python -m benchmarks.flows --days 90 --output baseline.json
+    python -m benchmarks.flows --days 90 --baseline baseline.json --threshold 0.25
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from .common import percentile, setup_django, test_database
+
+# Metrics compared against the baseline; lower is better for all of them
+TIMING_METRICS = ['p50_ms', 'p95_ms']
+QUERY_METRICS = ['queries']
+
+# Share of each request in the mixed clerk + display workload
+MIX = {
+    'dashboard': 10,
+    'desk_detail': 30,
+    'add_to_queue': 15,
+    'call_queue': 10,
+    'complete_queue': 10,
+    'display_board_data': 25,
+}
+
+
+class Flows:
+    """Scenario requests against one synthetic location"""
+
+    def __init__(self, rng):
+        from django.test import Client
+        from django.urls import reverse
+
+        from walkin.models import Location, User, WalkInQueue
+        from walkin.utils import local_today
+
+        self.reverse = reverse
+        self.rng = rng
+        self.location = Location.objects.order_by('id').first()
+        self.desks = list(self.location.desks.order_by('id'))
+        self.clerk = User.objects.create_user('bench-clerk', location=self.location, role='admin')
+        self.client = Client()
+        self.client.force_login(self.clerk)
+        self.display = Client()
+        self.today = WalkInQueue.objects.filter(location=self.location, queue_date=local_today(self.location))
+        self.waiting, self.serving = [], []
+
+    def prepare(self):
+        """Pick the tickets the next call/complete requests act on (not timed)"""
+        if not self.waiting:
+            self.waiting = list(self.today.filter(status='waiting').values_list('id', flat=True))
+        if not self.serving:
+            self.serving = list(self.today.filter(status='in_progress').values_list('id', flat=True))
+
+    def post(self, url, data=None):
+        response = self.client.post(url, data or {})
+        # Redirects are not followed, drop the flash message cookie instead
+        self.client.cookies.pop('messages', None)
+        return response
+
+    def dashboard(self):
+        return self.client.get(self.reverse('dashboard'))
+
+    def desk_detail(self):
+        return self.client.get(self.reverse('desk_detail', args=[self.rng.choice(self.desks).id]))
+
+    def add_to_queue(self):
+        desk = self.rng.choice(self.desks)
+        return self.post(self.reverse('add_to_queue', args=[desk.id]), {
+            'customer_name': 'Khách benchmark',
+            'service_type': desk.service_type,
+            'is_priority': 'on' if self.rng.random() < 0.1 else '',
+        })
+
+    def call_queue(self):
+        if not self.waiting:
+            return self.add_to_queue()
+        queue_id = self.waiting.pop(0)
+        self.serving.append(queue_id)
+        return self.post(self.reverse('call_queue', args=[queue_id]))
+
+    def complete_queue(self):
+        if not self.serving:
+            return self.call_queue()
+        return self.post(self.reverse('complete_queue', args=[self.serving.pop(0)]))
+
+    def display_board_data(self):
+        return self.display.get(self.reverse('display_board_data', args=[self.location.id]))
+
+
+def measure(flows, names, requests):
+    """Run `requests` requests picked from `names` and collect statistics"""
+    from django.db import connection
+
+    weights = [MIX[name] for name in names]
+    latencies, queries = [], []
+    counter = {'queries': 0}
+
+    def count(execute, sql, params, many, context):
+        counter['queries'] += 1
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        name = flows.rng.choices(names, weights)[0]
+        flows.prepare()
+        counter['queries'] = 0
+        with connection.execute_wrapper(count):
+            request_started = time.perf_counter()
+            response = getattr(flows, name)()
+            latencies.append(time.perf_counter() - request_started)
+        if response.status_code >= 400:
+            raise RuntimeError(f'{name} returned {response.status_code}')
+        queries.append(counter['queries'])
+    elapsed = time.perf_counter() - started
+
+    return {
+        'requests': requests,
+        'rps': requests / elapsed,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'queries': sum(queries) / len(queries),
+    }
+
+
+def compare(results, baseline, threshold, query_threshold):
+    """Regressions as (scenario, metric, baseline value, current value)"""
+    regressions = []
+    for scenario, metrics in results.items():
+        previous = baseline.get(scenario)
+        if previous is None:
+            continue
+        for metric in TIMING_METRICS + QUERY_METRICS:
+            allowed = threshold if metric in TIMING_METRICS else query_threshold
+            if metric in previous and metrics[metric] > previous[metric] * (1 + allowed) + 1e-9:
+                regressions.append((scenario, metric, previous[metric], metrics[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--locations', type=int, default=2)
+    parser.add_argument('--desks', type=int, default=6, help='desks per location')
+    parser.add_argument('--days', type=int, default=30, help='days of queue history')
+    parser.add_argument('--per-day', type=int, default=40, help='average customers per desk and day')
+    parser.add_argument('--requests', type=int, default=200, help='requests per scenario')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--baseline', help='results JSON of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed relative increase of the latency percentiles')
+    parser.add_argument('--query-threshold', type=float, default=0.0,
+                        help='allowed relative increase of the queries per request')
+    args = parser.parse_args()
+
+    setup_django()
+    from walkin.synthetic import generate
+
+    with test_database():
+        rows = generate(args.locations, args.desks, args.days, args.per_day, seed=args.seed)
+        print(f'{rows} queue rows: {args.locations} locations x {args.desks} desks x {args.days} days')
+        flows = Flows(random.Random(args.seed))
+
+        results = {}
+        print(f'{"scenario":20} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"queries":>8}')
+        for name in list(MIX) + ['mixed']:
+            names = list(MIX) if name == 'mixed' else [name]
+            result = results[name] = measure(flows, names, args.requests)
+            print(f'{name:20} {result["rps"]:8.1f} {result["p50_ms"]:8.2f} {result["p95_ms"]:8.2f} '
+                  f'{result["p99_ms"]:8.2f} {result["queries"]:8.2f}')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'results': results}, output, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline)['results'], args.threshold, args.query_threshold)
+        for scenario, metric, previous, current in regressions:
+            print(f'REGRESSION {scenario} {metric}: {previous:.2f} -> {current:.2f}')
+        if regressions:
+            sys.exit(1)
+        print('no regressions')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+"""
+Replay an offline kiosk backlog: one POST per ticket vs the batch ingest API
+
+Both modes go through the test client (full middleware, session auth and
+on-commit receivers) against a fresh test database. "single" posts every
+ticket to the add-to-queue view; "batch" uploads the same tickets to
+/api/v1/tickets/batch/ in chunks of --batch-size, then replays the whole
+backlog a second time to show that retries create nothing.
+
+    python -m benchmarks.ingest --tickets 500 --batch-size 250
+"""
+
+import argparse
+import json
+import time
+
+from .common import setup_django, test_database
+
+
+def make_backlog(desks, count):
+    return [
+        {
+            'idempotency_key': f'kiosk-{index}',
+            'desk': desks[index % len(desks)].id,
+            'customer_name': f'Khách {index}',
+            'service_type': 'Hộ tịch',
+        }
+        for index in range(count)
+    ]
+
+
+def replay_single(client, backlog):
+    from django.urls import reverse
+
+    for ticket in backlog:
+        client.post(reverse('add_to_queue', args=[ticket['desk']]), {
+            'customer_name': ticket['customer_name'],
+            'service_type': ticket['service_type'],
+        })
+
+
+def replay_batch(client, backlog, batch_size):
+    from django.urls import reverse
+
+    created = 0
+    for start in range(0, len(backlog), batch_size):
+        response = client.post(
+            reverse('api_ticket_batch'),
+            json.dumps({'tickets': backlog[start:start + batch_size]}),
+            content_type='application/json',
+        )
+        created += response.json()['created']
+    return created
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--tickets', type=int, default=500)
+    parser.add_argument('--desks', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=250)
+    parser.add_argument('--output', help='write the results as JSON')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.test import Client
+
+    from walkin.models import Desk, Location, User, WalkInQueue
+
+    results = {}
+    with test_database():
+        location = Location.objects.create(name='Benchmark', address='-', state='-')
+        User.objects.create_user('bench', password='pw', location=location, role='admin')
+        desks = [
+            Desk.objects.create(location=location, desk_number=f'Bàn {n}', desk_name=f'Bàn {n}', service_type='-')
+            for n in range(1, args.desks + 1)
+        ]
+        backlog = make_backlog(desks, args.tickets)
+        client = Client()
+        client.login(username='bench', password='pw')
+
+        started = time.perf_counter()
+        replay_single(client, backlog)
+        results['single'] = time.perf_counter() - started
+
+        WalkInQueue.objects.all().delete()
+        started = time.perf_counter()
+        created = replay_batch(client, backlog, args.batch_size)
+        results['batch'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        duplicates = replay_batch(client, backlog, args.batch_size)
+        results['batch_retry'] = time.perf_counter() - started
+
+    print(f'{"mode":12} {"seconds":>10} {"tickets/s":>10}')
+    for mode, seconds in results.items():
+        print(f'{mode:12} {seconds:10.2f} {args.tickets / seconds:10.0f}')
+    print(f'batch created {created} tickets, retry created {duplicates}')
+    print(f'speedup: {results["single"] / results["batch"]:.1f}x')
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'args': vars(args), 'results': results}, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Session writes per request: save-every-request vs. sliding refresh
+
+Simulates one clerk browsing the dashboard for a working day and counts
+the writes against the django_session table.
+
+    python -m benchmarks.sessions --requests 1000 --spacing 20
+"""
+
+import argparse
+import time
+
+from .common import count_writes, setup_django, test_database
+
+STOCK_MIDDLEWARE = 'django.contrib.sessions.middleware.SessionMiddleware'
+SLIDING_MIDDLEWARE = 'walkin.sessions.SlidingSessionMiddleware'
+
+
+def scenarios(settings):
+    middleware = list(settings.MIDDLEWARE)
+    position = middleware.index(SLIDING_MIDDLEWARE)
+
+    def with_session_middleware(name):
+        return middleware[:position] + [name] + middleware[position + 1:]
+
+    return [
+        ('save every request (db)', {
+            'MIDDLEWARE': with_session_middleware(STOCK_MIDDLEWARE),
+            'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+            'SESSION_SAVE_EVERY_REQUEST': True,
+        }),
+        ('sliding refresh (cached_db)', {
+            'MIDDLEWARE': with_session_middleware(SLIDING_MIDDLEWARE),
+            'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+            'SESSION_SAVE_EVERY_REQUEST': False,
+        }),
+        ('sliding refresh (signed_cookies)', {
+            'MIDDLEWARE': with_session_middleware(SLIDING_MIDDLEWARE),
+            'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+            'SESSION_SAVE_EVERY_REQUEST': False,
+        }),
+    ]
+
+
+def run_scenario(overrides, requests, spacing):
+    from django.test import Client, override_settings
+    from django.urls import reverse
+
+    from walkin.models import Location, User
+    from walkin.sessions import SlidingSessionMiddleware
+
+    location, _ = Location.objects.get_or_create(
+        name='Benchmark', defaults={'address': '-', 'state': '-'},
+    )
+    if not User.objects.filter(username='bench').exists():
+        User.objects.create_user('bench', password='bench', location=location)
+
+    # Simulated clock: each request happens `spacing` seconds after the last
+    simulated = {'now': time.time()}
+    SlidingSessionMiddleware.clock = staticmethod(lambda: simulated['now'])
+
+    with override_settings(**overrides):
+        client = Client()
+        client.login(username='bench', password='bench')
+        url = reverse('dashboard')
+        started = time.perf_counter()
+        with count_writes('django_session') as counter:
+            for _ in range(requests):
+                simulated['now'] += spacing
+                client.get(url)
+        elapsed = time.perf_counter() - started
+
+    SlidingSessionMiddleware.clock = staticmethod(time.time)
+    return counter['writes'], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500, help='page views per scenario')
+    parser.add_argument('--spacing', type=float, default=20.0, help='simulated seconds between page views')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+
+    with test_database():
+        print(f'{args.requests} page views, one every {args.spacing:g}s '
+              f'(refresh interval {settings.WALKIN_SESSION_REFRESH_INTERVAL}s)')
+        print(f'{"scenario":36} {"writes":>8} {"writes/req":>11} {"ms/req":>8}')
+        for name, overrides in scenarios(settings):
+            writes, elapsed = run_scenario(overrides, args.requests, args.spacing)
+            print(f'{name:36} {writes:8d} {writes / args.requests:11.3f} '
+                  f'{elapsed * 1000 / args.requests:8.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+Multi-threaded queue write benchmark for the SQLite database profiles
+
+Each profile runs in its own process against a fresh database file. Worker
+threads play clerks: enqueue a customer, call, then complete the ticket,
+while reader threads render the desk statistics at the same time.
+
+    python -m benchmarks.sqlite_writes --threads 8 --tickets 50
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from .common import BASE_DIR, percentile, setup_django
+
+PROFILES = ['development', 'production']
+
+
+def worker_main(args):
+    """Runs inside the child process for one profile"""
+    setup_django()
+    from django.core.management import call_command
+    from django.db import OperationalError, connections
+
+    from walkin.models import Desk, Location, User, WalkInQueue
+    from walkin.stats import annotate_desk_stats
+
+    call_command('migrate', verbosity=0)
+    location = Location.objects.create(name='Benchmark', address='-', state='-')
+    clerk = User.objects.create_user('bench', location=location)
+    desks = [
+        Desk.objects.create(location=location, desk_number=f'Bàn {n}', desk_name=f'Bàn {n}', service_type='-')
+        for n in range(1, args.desks + 1)
+    ]
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    stop_readers = threading.Event()
+
+    def clerk_thread(index):
+        desk = desks[index % len(desks)]
+        try:
+            for _ in range(args.tickets):
+                started = time.perf_counter()
+                try:
+                    queue = WalkInQueue.enqueue(desk, customer_name='A', service_type='-')
+                    queue = WalkInQueue.claim(queue.id, clerk)
+                    queue.complete()
+                except OperationalError as exc:
+                    with lock:
+                        errors.append(str(exc))
+                    continue
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+        finally:
+            connections.close_all()
+
+    def reader_thread():
+        try:
+            while not stop_readers.is_set():
+                list(annotate_desk_stats(Desk.objects.filter(location=location), location))
+        except OperationalError as exc:
+            with lock:
+                errors.append(str(exc))
+        finally:
+            connections.close_all()
+
+    readers = [threading.Thread(target=reader_thread) for _ in range(args.readers)]
+    clerks = [threading.Thread(target=clerk_thread, args=(i,)) for i in range(args.threads)]
+    started = time.perf_counter()
+    for thread in readers + clerks:
+        thread.start()
+    for thread in clerks:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop_readers.set()
+    for thread in readers:
+        thread.join()
+
+    print(json.dumps({
+        'tickets': len(latencies),
+        'errors': len(errors),
+        'elapsed': elapsed,
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+    }))
+
+
+def run_profile(profile, args):
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, WALKIN_DB_PROFILE=profile, WALKIN_DB_NAME=os.path.join(directory, 'bench.sqlite3'))
+        command = [
+            sys.executable, '-m', 'benchmarks.sqlite_writes', '--worker',
+            '--threads', str(args.threads), '--tickets', str(args.tickets),
+            '--desks', str(args.desks), '--readers', str(args.readers),
+        ]
+        output = subprocess.run(command, env=env, cwd=BASE_DIR, check=True, capture_output=True, text=True)
+        return json.loads(output.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8, help='concurrent clerk threads')
+    parser.add_argument('--tickets', type=int, default=50, help='tickets handled per clerk')
+    parser.add_argument('--desks', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=2, help='concurrent dashboard reader threads')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args)
+        return
+
+    print(f'{args.threads} clerk threads x {args.tickets} tickets, {args.readers} reader threads')
+    print(f'{"profile":12} {"tickets/s":>10} {"errors":>7} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+    for profile in PROFILES:
+        result = run_profile(profile, args)
+        print(f'{profile:12} {result["tickets"] / result["elapsed"]:10.1f} {result["errors"]:7d} '
+              f'{result["p50"] * 1000:8.2f} {result["p95"] * 1000:8.2f} {result["p99"] * 1000:8.2f}')
+
+
+if __name__ == '__main__':
+    main()
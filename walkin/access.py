@@ -0,0 +1,94 @@
+# walkin/access.py
+"""
+Quyền truy cập theo địa điểm, tính một lần cho mỗi request
+
+get_access(request) trả về AccessContext của người dùng hiện tại: id địa
+điểm, các id địa điểm được xem và vai trò. Các view so sánh id số nguyên
+(desk.location_id, queue.location_id) thay vì nạp đối tượng Location.
+
+Các dòng Location được giữ trong bộ nhớ của tiến trình (ít và hiếm khi đổi),
+được làm mới khi một địa điểm được lưu hoặc xoá ở bất kỳ worker nào nhờ số
+phiên bản trong cache dùng chung. Các đối tượng này dùng chung giữa các
+request nên chỉ được đọc, không được sửa.
+"""
+
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_version, get_version
+from .models import Location
+
+
+class LocationCache:
+    """Mọi địa điểm theo id, nạp lại khi phiên bản 'locations' thay đổi"""
+
+    def __init__(self):
+        self._rows = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def all(self):
+        version = get_version('locations', 'all')
+        with self._lock:
+            if self._version != version:
+                self._rows = {location.id: location for location in Location.objects.all()}
+                self._version = version
+            return self._rows
+
+    def get(self, location_id):
+        return self.all().get(location_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._version = None
+        bump_version('locations', 'all')
+
+
+locations = LocationCache()
+
+
+class AccessContext:
+    """Người dùng, địa điểm và các địa điểm được phép xem của một request"""
+
+    def __init__(self, user):
+        rows = locations.all()
+        self.user_id = user.pk
+        self.is_superuser = user.is_superuser
+        self.is_admin = user.is_admin_role()
+        self.location_id = user.location_id
+        self.location = rows.get(user.location_id)
+        if user.is_superuser:
+            ids = [location_id for location_id, location in rows.items() if location.active]
+        elif self.location is not None and self.location.active:
+            ids = [self.location_id]
+        else:
+            ids = []
+        self.location_ids = frozenset(ids)
+
+    def can_access(self, location_id):
+        """Người dùng có được thao tác trên dữ liệu của địa điểm này không"""
+        return self.is_superuser or (location_id is not None and location_id == self.location_id)
+
+    def accessible_locations(self):
+        """Các địa điểm đang hoạt động được xem, theo thứ tự tên"""
+        rows = locations.all()
+        return sorted((rows[location_id] for location_id in self.location_ids), key=lambda location: location.name)
+
+
+def get_access(request):
+    """AccessContext của request, chỉ được tính ở lần gọi đầu tiên"""
+    access = getattr(request, '_walkin_access', None)
+    if access is None or access.user_id != request.user.pk:
+        access = request._walkin_access = AccessContext(request.user)
+    return access
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_locations_on_change(sender, using, **kwargs):
+    # Sau khi commit: request khác nạp lại trước đó sẽ đọc dòng cũ và giữ
+    # chúng dưới phiên bản mới
+    transaction.on_commit(locations.invalidate, using=using)
@@ -4,7 +4,7 @@ from .models import Location, User
 
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
-    list_display = ['name', 'state', 'phone', 'active', 'created_at']
+    list_display = ['name', 'state', 'phone', 'time_zone', 'active', 'created_at']
     list_filter = ['active', 'state']
     search_fields = ['name', 'address', 'state']
 
@@ -26,11 +26,42 @@ class UserAdmin(BaseUserAdmin):
         ('Location & Role', {'fields': ('location', 'role')}),
     )
 
-from .models import Location, User, Desk, WalkInQueue
+from .models import Location, User, Desk, WalkInQueue, WalkInQueueArchive, DailyDeskStats
 
 @admin.register(Desk)
 class DeskAdmin(admin.ModelAdmin):
     list_display = ['desk_number', 'desk_name', 'location', 'is_active', 'created_at']
     list_filter = ['is_active', 'location', 'created_at']
     search_fields = ['desk_number', 'desk_name', 'service_type']
-    ordering = ['location', 'desk_number']
\ No newline at end of file
+    ordering = ['location', 'desk_number']
+
+
+@admin.register(DailyDeskStats)
+class DailyDeskStatsAdmin(admin.ModelAdmin):
+    list_display = ['day', 'location', 'desk', 'total', 'completed', 'cancelled', 'priority', 'wait_p50', 'service_p50']
+    list_filter = ['location', 'day']
+    date_hierarchy = 'day'
+    list_select_related = ['location', 'desk']
+    ordering = ['-day', 'desk']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(WalkInQueueArchive)
+class WalkInQueueArchiveAdmin(admin.ModelAdmin):
+    list_display = ['queue_number', 'customer_name', 'customer_phone', 'location', 'desk', 'queue_date', 'status']
+    list_filter = ['status', 'location', 'queue_date']
+    search_fields = ['queue_number', 'customer_name', 'customer_phone']
+    date_hierarchy = 'queue_date'
+    list_select_related = ['location', 'desk']
+    ordering = ['-queue_date', '-id']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,397 @@
+# walkin/api.py
+"""
+JSON API v1 cho kiosk lấy số và trang theo dõi trên điện thoại
+
+Các endpoint dùng chung phiên đăng nhập và quyền với giao diện HTML
+(get_access: quyền theo địa điểm, vai trò admin cho thao tác ghi). Dữ liệu
+được đọc bằng .values() với đúng các cột cần trả về: không dựng đối tượng
+model, không nạp quan hệ. Tham số `fields` (danh sách cách nhau bởi dấu
+phẩy) chọn các trường trong kết quả để giảm kích thước trên đường truyền
+chậm.
+
+Danh sách được phân trang bằng con trỏ (keyset) trên (created_at, id):
+trang sau bắt đầu từ WHERE (created_at, id) > con trỏ thay vì OFFSET, nên
+chi phí mỗi trang không tăng theo số trang đã đọc và không bị trùng/sót dòng
+khi có khách mới vào hàng giữa hai lần đọc.
+"""
+
+import base64
+import json
+from functools import wraps
+
+from django.db.models import Q
+from django.http import JsonResponse
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .access import get_access, locations
+from .assignment import choose_desk
+from .db import immediate_atomic
+from .eta import desk_estimates, wait_minutes
+from .ingest import IngestError, ingest_tickets, writable_desks
+from .models import Desk, WalkInQueue
+from .routers import read_from_replica
+from .waitlist import claim_next, registry as waitlists
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+DESK_FIELDS = (
+    'id', 'location_id', 'desk_number', 'desk_name', 'service_type', 'is_active', 'created_at',
+)
+TICKET_FIELDS = (
+    'id', 'location_id', 'desk_id', 'queue_number', 'queue_date', 'customer_name', 'customer_phone',
+    'service_type', 'notes', 'status', 'is_priority', 'created_at', 'called_at', 'started_at',
+    'completed_at',
+)
+# Các trường trả về cho mỗi số của một lô nhập
+BATCH_FIELDS = ('id', 'idempotency_key', 'desk_id', 'queue_number', 'queue_date', 'status', 'created_at')
+STATUSES = {choice for choice, _ in WalkInQueue._meta.get_field('status').choices}
+
+
+class ApiError(Exception):
+    """Lỗi trả về cho client dưới dạng {'error': ...} với mã HTTP tương ứng"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def api_view(methods=('GET',), admin=False):
+    """
+    Decorator cho endpoint API: kiểm tra đăng nhập, phương thức và vai trò
+
+    Khác login_required/admin_required của giao diện HTML, lỗi được trả về
+    dạng JSON (401/403/405) thay vì chuyển hướng. Request GET đọc dữ liệu
+    hàng đợi từ replica như các view chỉ đọc.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not request.user.is_authenticated:
+                return JsonResponse({'error': 'Chưa đăng nhập'}, status=401)
+            if request.method not in methods:
+                response = JsonResponse({'error': 'Phương thức không được hỗ trợ'}, status=405)
+                response['Allow'] = ', '.join(methods)
+                return response
+            if admin and request.method != 'GET' and not get_access(request).is_admin:
+                return JsonResponse({'error': 'Chỉ người quản trị mới được phép'}, status=403)
+            try:
+                if request.method == 'GET':
+                    with read_from_replica():
+                        return view_func(request, *args, **kwargs)
+                return view_func(request, *args, **kwargs)
+            except ApiError as error:
+                return JsonResponse({'error': error.message}, status=error.status)
+        return wrapper
+    return decorator
+
+
+def select_fields(request, allowed, required=()):
+    """Các trường được yêu cầu qua `fields`, mặc định mọi trường của `allowed`"""
+    value = request.GET.get('fields', '').strip()
+    if not value:
+        return list(allowed)
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ApiError(f'Trường không hợp lệ: {", ".join(unknown)}')
+    return list(dict.fromkeys([*required, *fields]))
+
+
+def encode_cursor(created_at, row_id):
+    raw = f'{created_at.isoformat()}|{row_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """(created_at, id) từ con trỏ do encode_cursor() tạo"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, row_id = raw.rsplit('|', 1)
+        created_at = parse_datetime(created_at)
+        row_id = int(row_id)
+    except ValueError:
+        created_at = None
+    if created_at is None:
+        raise ApiError('Con trỏ không hợp lệ')
+    return created_at, row_id
+
+
+def _limit(request):
+    try:
+        limit = int(request.GET.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ApiError('limit phải là số nguyên')
+    return min(max(limit, 1), MAX_LIMIT)
+
+
+def paginate(request, queryset, fields):
+    """
+    Một trang dữ liệu dạng {'results': [...], 'next': con trỏ hoặc None}
+
+    Các dòng được sắp theo (created_at, id); created_at và id luôn được đọc
+    để tạo con trỏ nhưng chỉ được trả về nếu có trong `fields`.
+    """
+    limit = _limit(request)
+    queryset = queryset.order_by('created_at', 'id')
+    cursor = request.GET.get('cursor')
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        queryset = queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=row_id))
+    columns = list(dict.fromkeys([*fields, 'created_at', 'id']))
+    rows = list(queryset.values(*columns)[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]['created_at'], rows[-1]['id']) if has_more else None
+    hidden = [column for column in ('created_at', 'id') if column not in fields]
+    for row in rows:
+        for column in hidden:
+            del row[column]
+    return {'results': rows, 'next': next_cursor}
+
+
+def _location_filter(request, access):
+    """Điều kiện location_id theo quyền và tham số `location`"""
+    location_id = request.GET.get('location')
+    if location_id:
+        if not location_id.isdigit() or not access.can_access(int(location_id)):
+            raise ApiError('Không có quyền', status=403)
+        return {'location_id': int(location_id)}
+    if access.is_superuser:
+        return {}
+    return {'location_id__in': access.location_ids}
+
+
+def _payload(request):
+    """Dữ liệu POST: JSON nếu Content-Type là application/json, nếu không thì form"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ApiError('JSON không hợp lệ')
+        if not isinstance(data, dict):
+            raise ApiError('JSON phải là một object')
+        return data
+    return request.POST
+
+
+def _get_desk(access, desk_id):
+    if not str(desk_id).isdigit():
+        raise ApiError('desk phải là số nguyên')
+    desk = Desk.objects.select_related('location').filter(id=int(desk_id)).first()
+    if desk is None:
+        raise ApiError('Không tìm thấy bàn', status=404)
+    if not access.can_access(desk.location_id):
+        raise ApiError('Không có quyền', status=403)
+    return desk
+
+
+def _get_ticket(access, ticket_id):
+    queue = WalkInQueue.objects.select_related('desk__location').filter(id=ticket_id).first()
+    if queue is None:
+        raise ApiError('Không tìm thấy số', status=404)
+    if not access.can_access(queue.location_id):
+        raise ApiError('Không có quyền', status=403)
+    return queue
+
+
+def _ticket_data(queue, fields=TICKET_FIELDS):
+    return {field: getattr(queue, field) for field in fields}
+
+
+@api_view()
+def desk_list(request):
+    """GET /api/v1/desks/ - các bàn của những địa điểm được xem"""
+    access = get_access(request)
+    desks = Desk.objects.filter(**_location_filter(request, access))
+    if request.GET.get('active') in ('1', 'true'):
+        desks = desks.filter(is_active=True)
+    return JsonResponse(paginate(request, desks, select_fields(request, DESK_FIELDS)))
+
+
+@api_view()
+def desk_queue(request, desk_id):
+    """
+    GET /api/v1/desks/<id>/queue/ - hàng chờ hiện tại của bàn theo thứ tự gọi
+
+    Không phân trang: chỉ gồm các khách đang chờ hôm nay, lấy từ hàng chờ
+    trong bộ nhớ kèm giờ gọi dự kiến.
+    """
+    desk = _get_desk(get_access(request), desk_id)
+    tickets, next_start = desk_estimates(desk, waitlists.get(desk).ordered())
+    return JsonResponse({
+        'desk': desk.id,
+        'is_active': desk.is_active,
+        'results': tickets,
+        'estimated_wait': wait_minutes(next_start) if next_start else None,
+    })
+
+
+@api_view(methods=('POST',), admin=True)
+@immediate_atomic()
+def desk_call_next(request, desk_id):
+    """POST /api/v1/desks/<id>/call-next/ - gọi khách kế tiếp của bàn"""
+    desk = _get_desk(get_access(request), desk_id)
+    queue = claim_next(desk, request.user)
+    if queue is None:
+        raise ApiError('Không còn khách nào đang chờ', status=409)
+    return JsonResponse(_ticket_data(queue))
+
+
+@api_view(methods=('GET', 'POST'), admin=True)
+def ticket_list(request):
+    """
+    GET /api/v1/tickets/ - danh sách số theo bàn, địa điểm, trạng thái, ngày
+    POST /api/v1/tickets/ - lấy số cho khách (CHỈ ADMIN)
+    """
+    if request.method == 'POST':
+        return _create_ticket(request)
+
+    access = get_access(request)
+    filters = _location_filter(request, access)
+    desk_id = request.GET.get('desk')
+    if desk_id:
+        if not desk_id.isdigit():
+            raise ApiError('desk phải là số nguyên')
+        filters['desk_id'] = int(desk_id)
+    statuses = [status for status in request.GET.get('status', '').split(',') if status]
+    if statuses:
+        if not STATUSES.issuperset(statuses):
+            raise ApiError('Trạng thái không hợp lệ')
+        filters['status__in'] = statuses
+    day = request.GET.get('date')
+    if day:
+        try:
+            filters['queue_date'] = parse_date(day)
+        except ValueError:
+            filters['queue_date'] = None
+        if filters['queue_date'] is None:
+            raise ApiError('Ngày không hợp lệ (YYYY-MM-DD)')
+    queues = WalkInQueue.objects.filter(**filters)
+    return JsonResponse(paginate(request, queues, select_fields(request, TICKET_FIELDS)))
+
+
+@immediate_atomic()
+def _create_ticket(request):
+    """Thêm khách vào hàng đợi của `desk`, hoặc bàn gọi sớm nhất của `location`"""
+    access = get_access(request)
+    data = _payload(request)
+    customer_name = str(data.get('customer_name') or '').strip()
+    service_type = str(data.get('service_type') or '').strip()
+    missing = [name for name, value in (('customer_name', customer_name), ('service_type', service_type)) if not value]
+    if missing:
+        raise ApiError(f'Thiếu trường: {", ".join(missing)}')
+    is_priority = data.get('is_priority') in (True, 'true', 'on', '1', 1)
+
+    if data.get('desk'):
+        desk = _get_desk(access, data['desk'])
+    elif data.get('location'):
+        location = locations.get(int(data['location'])) if str(data['location']).isdigit() else None
+        if location is None:
+            raise ApiError('Không tìm thấy địa điểm', status=404)
+        if not access.can_access(location.id):
+            raise ApiError('Không có quyền', status=403)
+        desk = choose_desk(location, service_type, is_priority)
+        if desk is None:
+            raise ApiError(f'Không có bàn nào đang mở phục vụ "{service_type}"', status=409)
+    else:
+        raise ApiError('Cần desk hoặc location')
+
+    queue = WalkInQueue.enqueue(
+        desk,
+        customer_name=customer_name,
+        customer_phone=str(data.get('customer_phone') or ''),
+        service_type=service_type,
+        notes=str(data.get('notes') or ''),
+        is_priority=is_priority,
+    )
+    return JsonResponse(_ticket_data(queue), status=201)
+
+
+@api_view(methods=('POST',), admin=True)
+def ticket_batch(request):
+    """
+    POST /api/v1/tickets/batch/ - nhập một lô số lấy ngoại tuyến (CHỈ ADMIN)
+
+    Body JSON: {"tickets": [{"idempotency_key", "desk", "customer_name",
+    "service_type", "customer_phone", "notes", "is_priority", "created_at"}]}.
+    Gửi lại cùng một lô trả về các số đã tạo với "created": false. Nếu có số
+    không hợp lệ, không số nào được ghi và lỗi được trả về theo vị trí.
+    """
+    if request.content_type != 'application/json':
+        raise ApiError('Cần Content-Type: application/json')
+    items = _payload(request).get('tickets')
+    desk_ids = {
+        item['desk'] for item in (items if isinstance(items, list) else ())
+        if isinstance(item, dict) and isinstance(item.get('desk'), int)
+    }
+    try:
+        results = ingest_tickets(items, writable_desks(get_access(request), desk_ids))
+    except IngestError as error:
+        return JsonResponse({
+            'error': 'Lô không hợp lệ',
+            'errors': [{'index': index, 'error': message} for index, message in error.errors],
+        }, status=400)
+    created = sum(1 for _, is_new in results if is_new)
+    return JsonResponse({
+        'created': created,
+        'duplicates': len(results) - created,
+        'results': [
+            dict(_ticket_data(queue, BATCH_FIELDS), created=is_new)
+            for queue, is_new in results
+        ],
+    }, status=201 if created else 200)
+
+
+@api_view()
+def ticket_detail(request, ticket_id):
+    """
+    GET /api/v1/tickets/<id>/ - một số kèm vị trí và thời gian chờ dự kiến
+
+    `position` và `estimated_wait` chỉ có khi khách còn đang chờ.
+    """
+    queue = _get_ticket(get_access(request), ticket_id)
+    data = _ticket_data(queue, select_fields(request, TICKET_FIELDS))
+    if queue.status == 'waiting':
+        tickets, _ = desk_estimates(queue.desk, waitlists.get(queue.desk).ordered())
+        ticket = next((ticket for ticket in tickets if ticket['id'] == queue.id), None)
+        data['position'] = ticket['position'] if ticket else None
+        data['estimated_wait'] = ticket['estimated_wait'] if ticket else None
+    return JsonResponse(data)
+
+
+# Các thao tác chuyển trạng thái: tên -> (hàm, thông báo khi không còn hợp lệ)
+TICKET_ACTIONS = {
+    'call': (
+        lambda queue, user: WalkInQueue.claim(queue.id, user),
+        'Số đã được gọi hoặc không còn trong hàng đợi',
+    ),
+    'complete': (
+        lambda queue, user: queue.complete() and queue,
+        'Số không còn đang được phục vụ',
+    ),
+    'cancel': (
+        lambda queue, user: queue.cancel() and queue,
+        'Số đã hoàn thành hoặc đã huỷ',
+    ),
+}
+
+
+@api_view(methods=('POST',), admin=True)
+@immediate_atomic()
+def ticket_action(request, ticket_id, action):
+    """
+    POST /api/v1/tickets/<id>/<call|complete|cancel>/ (CHỈ ADMIN)
+
+    Trả về 409 nếu trạng thái hiện tại không cho phép thao tác, ví dụ số đã
+    được nhân viên khác gọi.
+    """
+    if action not in TICKET_ACTIONS:
+        raise ApiError('Không tìm thấy thao tác', status=404)
+    queue = _get_ticket(get_access(request), ticket_id)
+    perform, conflict = TICKET_ACTIONS[action]
+    result = perform(queue, request.user)
+    if not result:
+        raise ApiError(conflict, status=409)
+    return JsonResponse(_ticket_data(result))
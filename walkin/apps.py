@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class WalkinConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'walkin'
+
+    def ready(self):
+        # Đăng ký các receiver tín hiệu (queue_changed, lưu Location/Desk)
+        from . import access, board, eta, events, metrics, rollups, waitlist  # noqa: F401
@@ -0,0 +1,114 @@
+# walkin/archive.py
+"""
+Lưu trữ hàng đợi cũ
+
+Các dòng WalkInQueue có queue_date trước mốc lưu trữ được chuyển sang bảng
+WalkInQueueArchive theo từng lô nhỏ. Mỗi lô là một transaction ngắn (chép
+bằng INSERT ... SELECT rồi xoá), nên khoá ghi chỉ bị giữ trong vài mili giây
+và nhân viên vẫn thao tác bình thường trong lúc lưu trữ.
+
+Bảng DailyDeskStats không bị đụng tới: thống kê các ngày đã lưu trữ vẫn còn
+nguyên, và rebuild_daily_stats() đọc cả bảng lưu trữ khi dựng lại.
+"""
+
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections, router
+from django.utils import timezone
+
+from .db import immediate_atomic
+from .models import Location, QueueCounter, WalkInQueue, WalkInQueueArchive
+from .utils import local_today
+
+
+def archive_horizon(days=None, location=None):
+    """
+    Ngày đầu tiên còn giữ trong bảng WalkInQueue của địa điểm
+
+    queue_date là ngày theo giờ địa phương nên mốc được tính từ ngày hiện tại
+    tại địa điểm (local_today(location)), không phải ngày của máy chủ.
+    """
+    if days is None:
+        days = settings.WALKIN_RETENTION_DAYS
+    return local_today(location) - timedelta(days=days)
+
+
+def archive_horizons(days=None, locations=None):
+    """Gom các địa điểm theo mốc lưu trữ: {mốc: [địa điểm, ...]}"""
+    if locations is None:
+        locations = Location.objects.all()
+    horizons = defaultdict(list)
+    for location in locations:
+        horizons[archive_horizon(days, location)].append(location)
+    return dict(horizons)
+
+
+def archived_columns():
+    """Các cột có ở cả WalkInQueue và WalkInQueueArchive, theo thứ tự của WalkInQueue"""
+    archived = {field.column for field in WalkInQueueArchive._meta.concrete_fields}
+    return [field.column for field in WalkInQueue._meta.concrete_fields if field.column in archived]
+
+
+def archive_batch(before, batch_size=500, locations=None):
+    """
+    Chuyển tối đa batch_size dòng có queue_date < before sang bảng lưu trữ
+
+    Trả về số dòng đã chuyển, 0 khi không còn gì để lưu trữ.
+    """
+    queues = WalkInQueue.objects.filter(queue_date__lt=before)
+    if locations is not None:
+        queues = queues.filter(location__in=locations)
+
+    using = router.db_for_write(WalkInQueue)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(column) for column in archived_columns())
+
+    with immediate_atomic(using):
+        # Dòng cũ nhất có id nhỏ nhất nên duyệt theo khoá chính là đủ nhanh
+        ids = list(queues.using(using).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return 0
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(WalkInQueueArchive._meta.db_table)} ({columns}, {quote("archived_at")}) '
+                f'SELECT {columns}, %s FROM {quote(WalkInQueue._meta.db_table)} WHERE {quote("id")} IN ({placeholders})',
+                [connection.ops.adapt_datetimefield_value(timezone.now()), *ids],
+            )
+        WalkInQueue.objects.using(using).filter(id__in=ids).delete()
+    return len(ids)
+
+
+def archive_queues(before, batch_size=500, locations=None, pause=0.0, progress=None):
+    """
+    Lưu trữ mọi dòng có queue_date < before, từng lô một
+
+    `pause` (giây) được nghỉ giữa hai lô để nhường khoá ghi cho nhân viên.
+    Bộ đếm số thứ tự của các ngày đã qua cũng được xoá. Trả về tổng số dòng.
+    `before` không được vượt quá ngày hiện tại tại bất kỳ địa điểm nào được
+    lưu trữ (mặc định: mọi địa điểm).
+    """
+    checked = Location.objects.all() if locations is None else locations
+    if any(before > local_today(location) for location in checked):
+        raise ValueError('Không thể lưu trữ hàng đợi của hôm nay')
+
+    total = 0
+    while True:
+        moved = archive_batch(before, batch_size=batch_size, locations=locations)
+        if not moved:
+            break
+        total += moved
+        if progress is not None:
+            progress(total)
+        if pause:
+            time.sleep(pause)
+
+    counters = QueueCounter.objects.filter(day__lt=before)
+    if locations is not None:
+        counters = counters.filter(desk__location__in=locations)
+    counters.delete()
+    return total
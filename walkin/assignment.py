@@ -0,0 +1,63 @@
+# walkin/assignment.py
+"""
+Tự động chọn bàn khi khách lấy số theo địa điểm
+
+Khách chỉ chọn loại dịch vụ; hệ thống chọn trong các bàn đang mở phục vụ
+loại đó bàn sẽ gọi khách sớm nhất. Giờ gọi dự kiến của mỗi bàn được tính từ
+hàng chờ trong bộ nhớ (waitlist.py: số người đứng trước, khách đang được
+phục vụ) và thời gian phục vụ gần đây (eta.py), không cần truy vấn hàng đợi.
+"""
+
+from django.utils import timezone
+
+from .eta import ServiceTimes, schedule
+from .waitlist import registry
+
+
+def service_type_choices(desks):
+    """Các loại dịch vụ (không trùng, theo thứ tự xuất hiện) của các bàn đang mở"""
+    choices = {}
+    for desk in desks:
+        if desk.is_active:
+            for name in desk.get_service_types():
+                choices.setdefault(name.casefold(), name)
+    return list(choices.values())
+
+
+def estimate_start(times, desk_id, waitlist, is_priority=False, now=None):
+    """Giờ bàn sẽ gọi một khách mới vào hàng lúc `now`"""
+    now = now or timezone.now()
+    serving = waitlist.serving[1:] if waitlist.serving else None
+    return schedule(times, desk_id, waitlist.ahead_of(is_priority), serving, now=now)[-1]
+
+
+def rank_desks(candidates, times, is_priority=False, now=None):
+    """
+    Sắp xếp các (desk, waitlist) theo giờ gọi dự kiến, sớm nhất trước
+
+    Khi bằng nhau, bàn ít người chờ hơn rồi tới số bàn nhỏ hơn được chọn.
+    """
+    now = now or timezone.now()
+    return sorted(
+        candidates,
+        key=lambda candidate: (
+            estimate_start(times, candidate[0].id, candidate[1], is_priority, now),
+            len(candidate[1]),
+            candidate[0].desk_number,
+        ),
+    )
+
+
+def choose_desk(location, service_type, is_priority=False, now=None):
+    """Bàn đang mở phục vụ `service_type` sẽ gọi khách sớm nhất, None nếu không có"""
+    desks = [desk for desk in location.desks.filter(is_active=True) if desk.covers(service_type)]
+    if not desks:
+        return None
+    candidates = [(desk, registry.get(desk)) for desk in desks]
+    service_types = {service_type}
+    for _, waitlist in candidates:
+        service_types.update(waitlist.ahead_of(False))
+        if waitlist.serving:
+            service_types.add(waitlist.serving[1])
+    times = ServiceTimes([desk.id for desk in desks], service_types)
+    return rank_desks(candidates, times, is_priority, now)[0][0]
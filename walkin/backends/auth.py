@@ -0,0 +1,23 @@
+# walkin/backends/auth.py
+"""Backend xác thực nạp sẵn địa điểm của người dùng"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class LocationModelBackend(ModelBackend):
+    """
+    ModelBackend với get_user() dùng select_related('location')
+
+    request.user.location có sẵn ngay khi người dùng được nạp cho mỗi
+    request, không cần thêm truy vấn khi view hay template dùng tới.
+    """
+
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related('location').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,64 @@
+# walkin/backends/sqlite3/base.py
+"""
+SQLite backend với PRAGMA cấu hình được và BEGIN IMMEDIATE
+
+Thêm vào OPTIONS của DATABASES hai khoá không có trong backend gốc:
+    'pragmas': {'journal_mode': 'WAL', 'busy_timeout': 20000, ...}
+        được thực thi mỗi khi mở kết nối mới
+    'transaction_mode': 'IMMEDIATE'
+        chế độ mặc định của mọi transaction (thường để trống và chỉ dùng
+        walkin.db.immediate_atomic cho các thao tác ghi hàng đợi)
+
+Đồng thời đăng ký hàm tổng hợp walkin_percentile(value, fraction), tương
+đương PERCENTILE_CONT của PostgreSQL, dùng bởi walkin.stats.Percentile.
+"""
+
+from django.db.backends.sqlite3 import base
+
+from ...stats import percentile
+
+
+class PercentileAggregate:
+    """Phân vị nội suy tuyến tính, bỏ qua giá trị NULL"""
+
+    def __init__(self):
+        self.values = []
+        self.fraction = 0.5
+
+    def step(self, value, fraction):
+        if value is not None:
+            self.values.append(value)
+            self.fraction = fraction
+
+    def finalize(self):
+        if not self.values:
+            return None
+        return percentile(self.values, self.fraction)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict.get('OPTIONS', {})
+        self.pragmas = dict(options.get('pragmas', {}))
+        self.transaction_mode = options.get('transaction_mode')
+        # Bật bởi immediate_atomic() cho transaction ngoài cùng kế tiếp
+        self.begin_immediate = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        conn.create_aggregate('walkin_percentile', 2, PercentileAggregate)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = 'IMMEDIATE' if self.begin_immediate else self.transaction_mode
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
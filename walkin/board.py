@@ -0,0 +1,119 @@
+# walkin/board.py
+"""Dữ liệu bảng hiển thị số thứ tự tại sảnh chờ"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_version, get_version
+from .eta import ServiceTimes, schedule, wait_minutes
+from .models import Location, Desk, WalkInQueue
+from .signals import queue_changed
+from .utils import today_filter
+
+
+def _board_key(location_id, version):
+    return f'walkin:board:{location_id}:v{version}'
+
+
+def build_board(location):
+    """Số đang phục vụ, các số kế tiếp và thời gian chờ dự kiến của từng bàn đang mở"""
+    next_count = getattr(settings, 'WALKIN_BOARD_NEXT_COUNT', 3)
+    now = timezone.now()
+    today = WalkInQueue.objects.filter(location=location, **today_filter(location))
+    serving = {
+        desk_id: (queue_number, service_type, started_at)
+        for desk_id, queue_number, service_type, started_at in
+        today.filter(status='in_progress')
+        .order_by('started_at')
+        .values_list('desk_id', 'queue_number', 'service_type', 'started_at')
+    }
+    upcoming = {}
+    waiting_types = {}
+    waiting = today.filter(status='waiting').values_list('desk_id', 'queue_number', 'service_type')
+    for desk_id, queue_number, service_type in waiting:
+        waiting_types.setdefault(desk_id, []).append(service_type)
+        numbers = upcoming.setdefault(desk_id, [])
+        if len(numbers) < next_count:
+            numbers.append(queue_number)
+
+    desks = list(location.desks.filter(is_active=True).values('id', 'desk_number', 'desk_name'))
+    service_types = {service_type for types in waiting_types.values() for service_type in types}
+    service_types.update(row[1] for row in serving.values())
+    times = ServiceTimes([desk['id'] for desk in desks], service_types)
+
+    def estimated_wait(desk_id):
+        current = serving.get(desk_id)
+        starts = schedule(
+            times, desk_id, waiting_types.get(desk_id, []),
+            current[1:] if current else None, now=now,
+        )
+        return wait_minutes(starts[-1], now)
+
+    return {
+        'location': {'id': location.id, 'name': location.name},
+        'generated_at': now.isoformat(),
+        'desks': [
+            {
+                'id': desk['id'],
+                'desk_number': desk['desk_number'],
+                'desk_name': desk['desk_name'],
+                'serving': serving[desk['id']][0] if desk['id'] in serving else None,
+                'next': upcoming.get(desk['id'], []),
+                'estimated_wait': estimated_wait(desk['id']),
+            }
+            for desk in desks
+        ],
+    }
+
+
+def get_board(location_id):
+    """
+    Trả về (board, etag) từ cache, dựng lại khi hàng đợi đã thay đổi
+
+    Trả về None nếu địa điểm không tồn tại hoặc ngưng hoạt động.
+    """
+    key = _board_key(location_id, get_version('location', location_id))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
+    location = Location.objects.filter(id=location_id, active=True).first()
+    if location is None:
+        return None
+    board = build_board(location)
+    # Thời điểm dựng không ảnh hưởng tới ETag: nội dung giống nhau thì 304
+    content = json.dumps(
+        {key: value for key, value in board.items() if key != 'generated_at'},
+        sort_keys=True,
+    )
+    etag = '"%s"' % hashlib.md5(content.encode()).hexdigest()
+    cached = (board, etag)
+    cache.set(key, cached, timeout=getattr(settings, 'WALKIN_BOARD_CACHE_TIMEOUT', 300))
+    return cached
+
+
+@receiver(queue_changed)
+def invalidate_board_on_queue_change(sender, queue, **kwargs):
+    bump_version('location', queue.location_id)
+
+
+# Bàn và địa điểm: tăng phiên bản sau khi commit như queue_changed, để bảng
+# dựng lại từ dòng chưa commit không được giữ dưới phiên bản mới
+@receiver(post_save, sender=Desk)
+@receiver(post_delete, sender=Desk)
+def invalidate_board_on_desk_change(sender, instance, using, **kwargs):
+    location_id = instance.location_id
+    transaction.on_commit(lambda: bump_version('location', location_id), using=using)
+
+
+@receiver(post_save, sender=Location)
+def invalidate_board_on_location_change(sender, instance, using, **kwargs):
+    location_id = instance.id
+    transaction.on_commit(lambda: bump_version('location', location_id), using=using)
@@ -0,0 +1,38 @@
+# walkin/cache.py
+"""Số phiên bản trong cache dùng chung để làm mới dữ liệu đã cache"""
+
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+# Cache của phiên bản, bộ đếm /metrics và số liệu ETA (CACHES['walkin_counters']):
+# tách khỏi cache chính để không bị đẩy ra khi cache chính đầy
+counters = ConnectionProxy(caches, 'walkin_counters')
+
+
+def _version_key(scope, object_id):
+    return f'walkin:version:{scope}:{object_id}'
+
+
+def get_version(scope, object_id):
+    """Phiên bản hiện tại của đối tượng, ví dụ get_version('location', 1)"""
+    key = _version_key(scope, object_id)
+    version = counters.get(key)
+    if version is None:
+        counters.add(key, 1, timeout=None)
+        version = counters.get(key, 1)
+    return version
+
+
+def bump_version(scope, object_id):
+    """
+    Tăng phiên bản để mọi khoá cache gắn với phiên bản cũ hết hiệu lực
+
+    Dữ liệu đang được dựng dở với phiên bản cũ sẽ được ghi vào khoá cũ nên
+    không thể đè lên kết quả mới.
+    """
+    key = _version_key(scope, object_id)
+    try:
+        return counters.incr(key)
+    except ValueError:
+        counters.add(key, 1, timeout=None)
+        return counters.incr(key)
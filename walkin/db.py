@@ -0,0 +1,34 @@
+# walkin/db.py
+"""Transaction cho các thao tác ghi hàng đợi"""
+
+from contextlib import contextmanager
+
+from django.db import transaction
+
+
+@contextmanager
+def immediate_atomic(using=None):
+    """
+    transaction.atomic() giành khoá ghi ngay từ đầu trên SQLite
+
+    Với transaction thông thường (BEGIN DEFERRED), SQLite chỉ xin khoá ghi ở
+    câu lệnh ghi đầu tiên; nếu transaction đã đọc trước đó và một kết nối
+    khác đang ghi thì lỗi "database is locked" được trả về ngay, bỏ qua
+    busy_timeout. BEGIN IMMEDIATE chờ khoá theo busy_timeout ngay tại BEGIN.
+
+    Dùng được như context manager hoặc decorator. Với các backend khác (hoặc
+    khi đã ở trong transaction) tương đương transaction.atomic().
+    """
+    connection = transaction.get_connection(using)
+    if connection.in_atomic_block or not hasattr(connection, 'begin_immediate'):
+        with transaction.atomic(using=using):
+            yield
+        return
+
+    connection.begin_immediate = True
+    try:
+        with transaction.atomic(using=using):
+            connection.begin_immediate = False
+            yield
+    finally:
+        connection.begin_immediate = False
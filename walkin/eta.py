@@ -0,0 +1,214 @@
+# walkin/eta.py
+"""
+Ước tính giờ được phục vụ của khách đang chờ
+
+Thời gian phục vụ của mỗi bàn, và của từng loại dịch vụ tại bàn, được giữ
+dưới dạng trung bình trượt (EWMA) trong cache 'walkin_counters' và được
+cập nhật mỗi khi một khách hoàn thành: O(1), không quét lại lịch sử. Bàn
+chưa có số liệu trong cache được khởi tạo từ DailyDeskStats 30 ngày gần nhất.
+
+Giờ bắt đầu dự kiến của một khách = thời gian còn lại của khách đang được
+phục vụ + tổng thời gian phục vụ dự kiến của những người đứng trước, chia
+cho số bàn đang mở cùng phục vụ hàng đó (mỗi bàn có hàng riêng nên mặc định
+là 1). Tính lại chỉ tốn một truy vấn hàng đợi và một lần đọc cache.
+"""
+
+import hashlib
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import counters
+from .db import immediate_atomic
+from .models import DailyDeskStats, Desk, WalkInQueue
+from .signals import queue_changed
+from .utils import local_today, today_filter
+
+# Số mẫu tối thiểu trước khi dùng số liệu riêng của loại dịch vụ
+MIN_SAMPLES = 3
+# Số ngày DailyDeskStats dùng để khởi tạo số liệu của bàn
+SEED_DAYS = 30
+
+
+def _stats_key(desk_id, service_type=None):
+    if service_type is None:
+        return f'walkin:eta:{desk_id}'
+    digest = hashlib.md5(service_type.encode()).hexdigest()[:12]
+    return f'walkin:eta:{desk_id}:{digest}'
+
+
+def ewma_update(stats, value, alpha):
+    """
+    Thêm một mẫu vào (mean, count)
+
+    Các mẫu đầu tiên được lấy trung bình đều (alpha không nhỏ hơn 1/count)
+    để ước tính không bị kéo về giá trị khởi tạo quá lâu.
+    """
+    if not stats or not stats[1]:
+        return (value, 1)
+    mean, count = stats
+    weight = max(alpha, 1 / (count + 1))
+    return (mean + weight * (value - mean), count + 1)
+
+
+def update_stats(stats, desk_id, service_type, seconds):
+    """Thêm một thời gian phục vụ vào dict số liệu (của bàn và của loại dịch vụ)"""
+    alpha = settings.WALKIN_ETA_ALPHA
+    keys = [_stats_key(desk_id), _stats_key(desk_id, service_type)]
+    for key in keys:
+        stats[key] = ewma_update(stats.get(key), seconds, alpha)
+
+
+def record_service(queue):
+    """Cập nhật thời gian phục vụ của bàn và của loại dịch vụ sau khi khách hoàn thành"""
+    if not (queue.started_at and queue.completed_at):
+        return
+    seconds = max((queue.completed_at - queue.started_at).total_seconds(), 0.0)
+    keys = [_stats_key(queue.desk_id), _stats_key(queue.desk_id, queue.service_type)]
+    # Đọc - cập nhật - ghi trong khi giữ khoá dòng của bàn (SELECT ... FOR
+    # UPDATE; trên SQLite là khoá ghi của BEGIN IMMEDIATE) để hai lần hoàn
+    # thành cùng lúc ở cùng bàn không ghi đè mẫu của nhau
+    with immediate_atomic():
+        list(Desk.objects.select_for_update().filter(id=queue.desk_id).values_list('id'))
+        stats = counters.get_many(keys)
+        update_stats(stats, queue.desk_id, queue.service_type, seconds)
+        counters.set_many(stats, timeout=None)
+
+
+def _seed(desk_ids):
+    """
+    Số liệu ban đầu của các bàn từ DailyDeskStats (một truy vấn GROUP BY)
+
+    SEED_DAYS ngày được tính theo ngày hiện tại tại địa điểm của từng bàn.
+    """
+    desks_since = defaultdict(list)
+    for desk in Desk.objects.filter(id__in=desk_ids).select_related('location').only('id', 'location__time_zone'):
+        desks_since[local_today(desk.location) - timedelta(days=SEED_DAYS)].append(desk.id)
+    window = Q(pk__in=[])
+    for since, ids in desks_since.items():
+        window |= Q(desk_id__in=ids, day__gte=since)
+    rows = (
+        DailyDeskStats.objects.filter(window)
+        .values('desk_id')
+        .annotate(total=Sum('service_sum'), count=Sum('service_count'))
+        .order_by()
+    )
+    seeded = {_stats_key(desk_id): (0.0, 0) for desk_id in desk_ids}
+    for row in rows:
+        if row['count']:
+            seeded[_stats_key(row['desk_id'])] = (row['total'] / row['count'], row['count'])
+    for key, stats in seeded.items():
+        counters.add(key, stats, timeout=None)
+    return seeded
+
+
+class ServiceTimes:
+    """
+    Thời gian phục vụ dự kiến (giây) của các bàn, đọc từ cache một lần
+
+    Truyền `stats` (dict do update_stats() cập nhật) để dùng số liệu trong
+    bộ nhớ thay vì cache, ví dụ trong mô phỏng.
+    """
+
+    def __init__(self, desk_ids=(), service_types=(), stats=None):
+        self.default = settings.WALKIN_ETA_DEFAULT_SERVICE_MINUTES * 60
+        if stats is not None:
+            self.stats = stats
+            return
+        desk_ids = list(desk_ids)
+        keys = [_stats_key(desk_id) for desk_id in desk_ids]
+        keys += [_stats_key(desk_id, service_type) for desk_id in desk_ids for service_type in set(service_types)]
+        self.stats = counters.get_many(keys)
+        missing = [desk_id for desk_id in desk_ids if _stats_key(desk_id) not in self.stats]
+        if missing:
+            self.stats.update(_seed(missing))
+
+    def expected(self, desk_id, service_type=None):
+        if service_type is not None:
+            stats = self.stats.get(_stats_key(desk_id, service_type))
+            if stats and stats[1] >= MIN_SAMPLES:
+                return stats[0]
+        stats = self.stats.get(_stats_key(desk_id))
+        if stats and stats[1]:
+            return stats[0]
+        return self.default
+
+
+def schedule(times, desk_id, waiting, serving=None, now=None, servers=1):
+    """
+    Giờ bắt đầu dự kiến của từng khách đang chờ (theo thứ tự trong hàng)
+
+    `waiting` là danh sách loại dịch vụ theo thứ tự gọi, `serving` là
+    (loại dịch vụ, started_at) của khách đang được phục vụ hoặc None. Trả về
+    danh sách dài len(waiting) + 1: phần tử cuối là giờ dự kiến cho một
+    khách mới vào hàng lúc này.
+    """
+    now = now or timezone.now()
+    servers = max(servers, 1)
+    ahead = 0.0
+    if serving is not None:
+        service_type, started_at = serving
+        elapsed = (now - started_at).total_seconds() if started_at else 0.0
+        ahead = max(times.expected(desk_id, service_type) - elapsed, 0.0)
+    starts = []
+    for service_type in waiting:
+        starts.append(now + timedelta(seconds=ahead / servers))
+        ahead += times.expected(desk_id, service_type)
+    starts.append(now + timedelta(seconds=ahead / servers))
+    return starts
+
+
+def wait_minutes(start, now=None):
+    """Số phút còn phải chờ, làm tròn lên"""
+    seconds = (start - (now or timezone.now())).total_seconds()
+    return max(math.ceil(seconds / 60), 0)
+
+
+def desk_estimates(desk, ordered_ids, now=None):
+    """
+    Ước tính cho các khách đang chờ của một bàn
+
+    `ordered_ids` là thứ tự gọi (xem waitlist.py). Trả về (danh sách dict
+    theo thứ tự, giờ dự kiến cho khách mới), rỗng/None nếu bàn đang đóng.
+    """
+    if not desk.is_active:
+        return [], None
+    now = now or timezone.now()
+    rows = {
+        row['id']: row for row in
+        WalkInQueue.objects.filter(
+            desk=desk, status__in=['waiting', 'in_progress'], **today_filter(desk.location)
+        ).values('id', 'queue_number', 'status', 'service_type', 'started_at')
+    }
+    waiting = [rows[queue_id] for queue_id in ordered_ids if rows.get(queue_id, {}).get('status') == 'waiting']
+    serving = next((row for row in rows.values() if row['status'] == 'in_progress'), None)
+
+    times = ServiceTimes([desk.id], [row['service_type'] for row in rows.values()])
+    starts = schedule(
+        times, desk.id,
+        [row['service_type'] for row in waiting],
+        (serving['service_type'], serving['started_at']) if serving else None,
+        now=now,
+    )
+    tickets = [
+        {
+            'id': row['id'],
+            'queue_number': row['queue_number'],
+            'position': position,
+            'estimated_start': start,
+            'estimated_wait': wait_minutes(start, now),
+        }
+        for position, (row, start) in enumerate(zip(waiting, starts), start=1)
+    ]
+    return tickets, starts[-1]
+
+
+@receiver(queue_changed)
+def record_service_on_complete(sender, queue, event, **kwargs):
+    if event == 'completed':
+        record_service(queue)
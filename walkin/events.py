@@ -0,0 +1,208 @@
+# walkin/events.py
+"""
+Đẩy sự kiện hàng đợi theo thời gian thực (Server-Sent Events)
+
+Mỗi thay đổi trạng thái của WalkInQueue được phát lên hai kênh
+'desk:<id>' và 'location:<id>'. Màn hình đang mở chỉ cần theo dõi kênh
+thay vì tải lại trang và truy vấn cơ sở dữ liệu liên tục.
+
+Broker mặc định chạy trong tiến trình (một worker). Khi chạy nhiều worker,
+cấu hình WALKIN_EVENT_BROKER để dùng RedisBroker.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .signals import queue_changed
+
+
+def desk_channel(desk_id):
+    return f'desk:{desk_id}'
+
+
+def location_channel(location_id):
+    return f'location:{location_id}'
+
+
+class InProcessBroker:
+    """Broker trong bộ nhớ, dùng cho một tiến trình duy nhất"""
+
+    # Số sự kiện tối đa được giữ cho một màn hình chậm, sự kiện cũ nhất bị bỏ
+    max_pending = 100
+
+    def __init__(self, **options):
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def publish(self, channel, message):
+        """Gửi sự kiện tới mọi subscriber, có thể gọi từ bất kỳ thread nào"""
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription.deliver(message)
+
+    def subscribe(self, channel):
+        subscription = _LocalSubscription(self, channel)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def _unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+
+class _LocalSubscription:
+
+    def __init__(self, broker, channel):
+        self.broker = broker
+        self.channel = channel
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=broker.max_pending)
+
+    def deliver(self, message):
+        try:
+            self.loop.call_soon_threadsafe(self._put, message)
+        except RuntimeError:
+            # Event loop của subscriber đã đóng
+            self.broker._unsubscribe(self)
+
+    def _put(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(message)
+
+    async def get(self, timeout=None):
+        """Chờ sự kiện tiếp theo, trả về None khi hết thời gian chờ"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def close(self):
+        self.broker._unsubscribe(self)
+
+
+class RedisBroker:
+    """
+    Broker dùng Redis pub/sub, cho triển khai nhiều worker
+
+    Cần redis-py (redis trong requirements.txt), RedisCache của settings cũng vậy.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='walkin:'):
+        import redis
+
+        self.url = url
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def publish(self, channel, message):
+        self._client.publish(self.prefix + channel, json.dumps(message))
+
+    def subscribe(self, channel):
+        return _RedisSubscription(self, channel)
+
+
+class _RedisSubscription:
+
+    def __init__(self, broker, channel):
+        import redis.asyncio
+
+        self.channel = broker.prefix + channel
+        self.client = redis.asyncio.Redis.from_url(broker.url)
+        self.pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self.subscribed = False
+
+    async def get(self, timeout=None):
+        if not self.subscribed:
+            await self.pubsub.subscribe(self.channel)
+            self.subscribed = True
+        item = await self.pubsub.get_message(timeout=timeout)
+        if item is None:
+            return None
+        return json.loads(item['data'])
+
+    async def close(self):
+        await self.pubsub.aclose()
+        await self.client.aclose()
+
+
+_broker = None
+
+
+def get_broker():
+    """Broker được cấu hình trong settings.WALKIN_EVENT_BROKER"""
+    global _broker
+    if _broker is None:
+        config = getattr(settings, 'WALKIN_EVENT_BROKER', {})
+        backend = import_string(config.get('BACKEND', 'walkin.events.InProcessBroker'))
+        _broker = backend(**config.get('OPTIONS', {}))
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'WALKIN_EVENT_BROKER':
+        _broker = None
+
+
+def serialize_queue_event(queue, event):
+    """Nội dung sự kiện gửi tới màn hình (không chứa thông tin cá nhân)"""
+    return {
+        'event': event,
+        'queue_id': queue.id,
+        'queue_number': queue.queue_number,
+        'desk_id': queue.desk_id,
+        'location_id': queue.location_id,
+        'status': queue.status,
+        'is_priority': queue.is_priority,
+        'at': timezone.now().isoformat(),
+    }
+
+
+@receiver(queue_changed)
+def broadcast_queue_event(sender, queue, event, **kwargs):
+    """Phát sự kiện lên kênh của bàn và của địa điểm"""
+    message = serialize_queue_event(queue, event)
+    broker = get_broker()
+    broker.publish(desk_channel(queue.desk_id), message)
+    broker.publish(location_channel(queue.location_id), message)
+
+
+async def event_stream(channel):
+    """
+    Luồng text/event-stream cho một kênh
+
+    Gửi dòng chú thích giữ kết nối định kỳ và tự kết thúc sau
+    WALKIN_EVENT_STREAM_TIMEOUT giây; EventSource sẽ tự kết nối lại, nhờ vậy
+    kết nối của trình duyệt đã đóng không bị giữ mãi trên server.
+    """
+    heartbeat = getattr(settings, 'WALKIN_EVENT_HEARTBEAT', 15)
+    lifetime = getattr(settings, 'WALKIN_EVENT_STREAM_TIMEOUT', 300)
+    subscription = get_broker().subscribe(channel)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + lifetime
+    try:
+        yield 'retry: 3000\n\n'
+        while loop.time() < deadline:
+            message = await subscription.get(timeout=heartbeat)
+            if message is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f'data: {json.dumps(message)}\n\n'
+    finally:
+        await subscription.close()
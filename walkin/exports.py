@@ -0,0 +1,173 @@
+# walkin/exports.py
+"""
+Xuất dữ liệu dạng luồng (CSV, XLSX)
+
+Các hàm nhận một iterable các dòng và trả về generator các khối bytes để
+dùng với StreamingHttpResponse: bộ nhớ không tăng theo số dòng, kể cả với
+hàng triệu dòng, miễn là nguồn dữ liệu cũng là iterator (ví dụ
+QuerySet.iterator(chunk_size=...)).
+
+Dưới ASGI, Django 4.2 đọc hết một iterator đồng bộ vào bộ nhớ
+(sync_to_async(list)) trước khi gửi; aiter_chunks() bọc generator thành
+async iterator để vẫn gửi dần từng khối.
+"""
+
+import codecs
+import csv
+import zipfile
+from datetime import datetime
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+
+# Số dòng gom lại trước khi trả một khối cho server
+ROWS_PER_CHUNK = 500
+
+
+class _Buffer:
+    """File chỉ-ghi (không seek được) cho zipfile, nội dung được lấy ra sau mỗi khối"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, bool):
+        return 'Có' if value else 'Không'
+    return str(value)
+
+
+class _Echo:
+    """Đối tượng giả file cho csv.writer: trả lại dòng vừa được ghi"""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(header, rows):
+    """CSV UTF-8 có BOM để Excel hiển thị đúng tiếng Việt"""
+    writer = csv.writer(_Echo())
+    yield codecs.BOM_UTF8 + writer.writerow(header).encode()
+    lines = []
+    for row in rows:
+        lines.append(writer.writerow([_cell_text(value) for value in row]))
+        if len(lines) >= ROWS_PER_CHUNK:
+            yield ''.join(lines).encode()
+            lines.clear()
+    if lines:
+        yield ''.join(lines).encode()
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+
+def _xlsx_cell(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t>{escape(_cell_text(value))}</t></is></c>'
+
+
+def _xlsx_row(values):
+    return '<row>' + ''.join(_xlsx_cell(value) for value in values) + '</row>'
+
+
+def stream_xlsx(header, rows, sheet_name='Sheet1'):
+    """
+    Tệp XLSX một trang tính, không cần thư viện ngoài
+
+    Chuỗi được ghi trực tiếp vào ô (inlineStr), ngày giờ ở dạng văn bản.
+    Tệp ZIP được ghi tuần tự (data descriptor) nên không cần lưu cả tệp.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(name=escape(sheet_name[:31])))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        yield buffer.take()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+            )
+            sheet.write(_xlsx_row(header).encode())
+            lines = []
+            for row in rows:
+                lines.append(_xlsx_row(row))
+                if len(lines) >= ROWS_PER_CHUNK:
+                    sheet.write(''.join(lines).encode())
+                    lines.clear()
+                    yield buffer.take()
+            sheet.write(''.join(lines).encode())
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.take()
+
+
+async def aiter_chunks(chunks):
+    """
+    Async iterator trả lần lượt các khối của generator `chunks` (dùng dưới ASGI)
+
+    Mỗi khối được lấy bằng một sync_to_async trên thread đồng bộ của request,
+    nên cursor của QuerySet.iterator() luôn được dùng trên cùng một thread và
+    chỉ một lô dòng nằm trong bộ nhớ tại một thời điểm.
+    """
+    next_chunk = sync_to_async(next)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        # Client ngắt kết nối giữa chừng: đóng generator để giải phóng cursor
+        await sync_to_async(chunks.close)()
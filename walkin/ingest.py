@@ -0,0 +1,168 @@
+# walkin/ingest.py
+"""
+Nhập một lô số đã lấy ngoại tuyến (kiosk mất kết nối rồi gửi lại khi có mạng)
+
+Mỗi số mang một idempotency_key do kiosk tạo. Cả lô được ghi trong một
+transaction: các khoá đã có trong cơ sở dữ liệu (lô đã gửi trước đó) được
+trả về như cũ, các số mới được cấp số thứ tự theo từng (bàn, ngày) bằng một
+lần QueueCounter.allocate(count=n) và ghi bằng một bulk_create. Gửi lại cùng
+một lô bao nhiêu lần cũng chỉ tạo số một lần.
+
+Thống kê tổng hợp theo bàn và ngày được cộng một lần cho cả lô, trong cùng
+transaction, thay vì một lần cho mỗi số.
+"""
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .db import immediate_atomic
+from .models import Desk, QueueCounter, WalkInQueue
+from .rollups import add_to_desk_day
+from .utils import location_timezone
+
+# Số tối đa trong một lô
+MAX_BATCH = 500
+
+
+class IngestError(ValueError):
+    """Lô không hợp lệ; `errors` là danh sách (vị trí trong lô hoặc khoá, thông báo)"""
+
+    def __init__(self, errors):
+        super().__init__('; '.join(f'#{index}: {message}' for index, message in errors))
+        self.errors = errors
+
+
+def _text(item, name, required=False, max_length=None):
+    value = item.get(name)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise ValueError(f'thiếu {name}')
+    if max_length and len(value) > max_length:
+        raise ValueError(f'{name} dài quá {max_length} ký tự')
+    return value
+
+
+def _created_at(item, now):
+    """Giờ lấy số trên kiosk, không được sau giờ hiện tại của máy chủ"""
+    value = item.get('created_at')
+    if not value:
+        return now
+    created_at = parse_datetime(str(value))
+    if created_at is None:
+        raise ValueError('created_at không hợp lệ')
+    if timezone.is_naive(created_at):
+        raise ValueError('created_at phải có múi giờ')
+    return min(created_at, now)
+
+
+def clean_batch(items, desks):
+    """
+    Kiểm tra các số trong lô, trả về danh sách dict đã chuẩn hoá
+
+    `desks` là các bàn được phép ghi, theo id. Số trùng khoá trong cùng lô
+    chỉ giữ số đầu tiên.
+    """
+    if not isinstance(items, list) or not items:
+        raise IngestError([(0, 'lô rỗng')])
+    if len(items) > MAX_BATCH:
+        raise IngestError([(MAX_BATCH, f'lô có quá {MAX_BATCH} số')])
+
+    now = timezone.now()
+    cleaned, errors, seen = [], [], set()
+    for index, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('phải là một object')
+            key = _text(item, 'idempotency_key', required=True, max_length=64)
+            desk = desks.get(item.get('desk')) if isinstance(item.get('desk'), int) else None
+            if desk is None:
+                raise ValueError('bàn không tồn tại hoặc không có quyền')
+            row = {
+                'idempotency_key': key,
+                'desk': desk,
+                'customer_name': _text(item, 'customer_name', required=True, max_length=200),
+                'customer_phone': _text(item, 'customer_phone', max_length=20),
+                'service_type': _text(item, 'service_type', required=True, max_length=100),
+                'notes': _text(item, 'notes'),
+                'is_priority': item.get('is_priority') is True,
+                'created_at': _created_at(item, now),
+            }
+        except ValueError as error:
+            errors.append((index, str(error)))
+            continue
+        if key not in seen:
+            seen.add(key)
+            cleaned.append(row)
+    if errors:
+        raise IngestError(errors)
+    return cleaned
+
+
+def ingest_tickets(items, desks):
+    """
+    Ghi một lô số, trả về [(queue, created)] theo thứ tự các khoá trong lô
+
+    `created` là False với các khoá đã được ghi ở lần gửi trước. Ném
+    IngestError nếu có số không hợp lệ (không số nào được ghi).
+    """
+    rows = clean_batch(items, desks)
+    keys = [row['idempotency_key'] for row in rows]
+
+    with immediate_atomic():
+        existing = WalkInQueue.objects.in_bulk(keys, field_name='idempotency_key')
+        # Một khoá chỉ được dùng lại cho đúng số đó (cùng bàn)
+        conflicts = [
+            (row['idempotency_key'], 'idempotency_key đã được dùng cho một số khác')
+            for row in rows
+            if row['idempotency_key'] in existing and existing[row['idempotency_key']].desk_id != row['desk'].id
+        ]
+        if conflicts:
+            raise IngestError(conflicts)
+        new_rows = [row for row in rows if row['idempotency_key'] not in existing]
+
+        # Nhóm theo (bàn, ngày tại địa điểm), cấp số theo giờ lấy số trên kiosk
+        groups = {}
+        for row in sorted(new_rows, key=lambda row: row['created_at']):
+            desk = row['desk']
+            day = timezone.localdate(row['created_at'], timezone=location_timezone(desk.location))
+            groups.setdefault((desk.id, day), []).append(row)
+
+        queues = []
+        for (desk_id, day), group in groups.items():
+            desk = group[0]['desk']
+            last = QueueCounter.allocate(desk, day, count=len(group))
+            for number, row in enumerate(group, start=last - len(group) + 1):
+                queues.append(WalkInQueue(
+                    location=desk.location,
+                    queue_date=day,
+                    queue_number=WalkInQueue.make_queue_number(desk, number),
+                    **row
+                ))
+        try:
+            with transaction.atomic():
+                created = WalkInQueue.objects.bulk_create(queues)
+        except IntegrityError:
+            # Một lần gửi khác cùng khoá vừa ghi xong (backend không khoá cả
+            # cơ sở dữ liệu như SQLite): client gửi lại lô sẽ nhận kết quả cũ
+            raise IngestError([(0, 'lô đang được ghi bởi một yêu cầu khác, hãy gửi lại')])
+
+        for queue in created:
+            queue.notify('enqueued', batch=True)
+        for (desk_id, day), group in groups.items():
+            add_to_desk_day(
+                desk_id, group[0]['desk'].location_id, day,
+                total=len(group),
+                waiting=len(group),
+                priority=sum(1 for row in group if row['is_priority']),
+            )
+
+    by_key = {queue.idempotency_key: (queue, True) for queue in created}
+    by_key.update((key, (queue, False)) for key, queue in existing.items())
+    return [by_key[key] for key in keys]
+
+
+def writable_desks(access, desk_ids):
+    """Các bàn (kèm địa điểm) trong `desk_ids` mà người dùng được ghi, theo id"""
+    desks = Desk.objects.select_related('location').filter(id__in=desk_ids)
+    return {desk.id: desk for desk in desks if access.can_access(desk.location_id)}
@@ -0,0 +1,152 @@
+# walkin/instrumentation.py
+"""
+Đo số truy vấn, thời gian SQL và thời gian render template của từng request
+
+Bật bằng WALKIN_INSTRUMENTATION=1 (xem settings.py). Kết quả được gửi kèm
+trong header Server-Timing / X-Query-Count / X-Duplicate-Queries và được gom
+theo tên URL để xem p50/p95/p99 tại /ops/perf/.
+"""
+
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from .stats import percentile
+
+_current = ContextVar('walkin_request_stats', default=None)
+
+
+class RequestStats:
+    """Số liệu đo được của một request"""
+
+    __slots__ = ('query_count', 'sql_time', 'template_time', 'statements')
+
+    def __init__(self):
+        self.query_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.statements = Counter()
+
+    @property
+    def duplicate_count(self):
+        """Số truy vấn lặp lại cùng câu SQL (dấu hiệu N+1)"""
+        return sum(count - 1 for count in self.statements.values() if count > 1)
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.query_count += 1
+            self.statements[sql] += 1
+
+
+class PerformanceRegistry:
+    """Cửa sổ trượt các request gần nhất theo tên URL"""
+
+    def __init__(self, window=1000):
+        self.window = window
+        self._samples = defaultdict(lambda: deque(maxlen=self.window))
+        self._lock = threading.Lock()
+
+    def record(self, url_name, duration, stats):
+        sample = (duration, stats.query_count, stats.sql_time, stats.template_time, stats.duplicate_count)
+        with self._lock:
+            self._samples[url_name].append(sample)
+
+    def summary(self):
+        with self._lock:
+            samples = {name: list(values) for name, values in self._samples.items()}
+        result = {}
+        for name, values in sorted(samples.items()):
+            durations = [value[0] * 1000 for value in values]
+            result[name] = {
+                'count': len(values),
+                'p50_ms': round(percentile(durations, 0.50), 2),
+                'p95_ms': round(percentile(durations, 0.95), 2),
+                'p99_ms': round(percentile(durations, 0.99), 2),
+                'avg_queries': round(sum(value[1] for value in values) / len(values), 2),
+                'max_queries': max(value[1] for value in values),
+                'avg_sql_ms': round(sum(value[2] for value in values) * 1000 / len(values), 2),
+                'avg_template_ms': round(sum(value[3] for value in values) * 1000 / len(values), 2),
+                'requests_with_duplicates': sum(1 for value in values if value[4]),
+            }
+        return result
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+
+
+registry = PerformanceRegistry(getattr(settings, 'WALKIN_INSTRUMENTATION_WINDOW', 1000))
+
+
+class QueryInstrumentationMiddleware:
+    """Đo từng request và ghi vào registry"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.record_query))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        if match is not None and match.url_name:
+            registry.record(match.url_name, duration, stats)
+
+        response['X-Query-Count'] = str(stats.query_count)
+        response['X-Duplicate-Queries'] = str(stats.duplicate_count)
+        response['Server-Timing'] = ', '.join([
+            f'sql;dur={stats.sql_time * 1000:.2f};desc="{stats.query_count} queries"',
+            f'tpl;dur={stats.template_time * 1000:.2f}',
+            f'total;dur={duration * 1000:.2f}',
+        ])
+        return response
+
+
+class _TimedTemplate(Template):
+
+    def render(self, context=None, request=None):
+        stats = _current.get()
+        if stats is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    Backend template Django ghi lại thời gian render vào request hiện tại
+
+    Thời gian render bao gồm cả các truy vấn được template thực thi muộn.
+    """
+
+    def from_string(self, template_code):
+        return _TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return _TimedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
@@ -0,0 +1,60 @@
+# walkin/management/commands/archive_walkins.py
+"""Chuyển hàng đợi cũ sang bảng lưu trữ"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from walkin.archive import archive_horizons, archive_queues
+from walkin.models import Location, WalkInQueue
+
+
+class Command(BaseCommand):
+    help = (
+        'Chuyển các dòng WalkInQueue cũ hơn WALKIN_RETENTION_DAYS ngày sang WalkInQueueArchive, '
+        'theo từng lô trong transaction ngắn'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Số ngày giữ lại, mặc định WALKIN_RETENTION_DAYS')
+        parser.add_argument('--batch-size', type=int, default=500, help='Số dòng mỗi transaction')
+        parser.add_argument('--pause', type=float, default=0.0, help='Số giây nghỉ giữa hai lô')
+        parser.add_argument('--location', type=int, action='append', help='ID địa điểm, có thể lặp lại')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ đếm số dòng sẽ được lưu trữ')
+
+    def handle(self, *args, **options):
+        if options['days'] is not None and options['days'] < 1:
+            raise CommandError('--days phải lớn hơn 0')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size phải lớn hơn 0')
+
+        locations = None
+        if options['location']:
+            locations = Location.objects.filter(id__in=options['location'])
+            if locations.count() != len(set(options['location'])):
+                raise CommandError('Không tìm thấy địa điểm')
+
+        # Mốc lưu trữ tính theo ngày địa phương của từng địa điểm
+        horizons = archive_horizons(options['days'], locations)
+        if options['dry_run']:
+            for before, group in sorted(horizons.items()):
+                count = WalkInQueue.objects.filter(queue_date__lt=before, location__in=group).count()
+                self.stdout.write(f'{count:,} dòng trước ngày {before} sẽ được lưu trữ')
+            return
+
+        started = time.monotonic()
+
+        def progress(moved):
+            self.stdout.write(f'  {moved:,} dòng')
+
+        for before, group in sorted(horizons.items()):
+            moved = archive_queues(
+                before,
+                batch_size=options['batch_size'],
+                locations=group,
+                pause=options['pause'],
+                progress=progress if options['verbosity'] > 1 else None,
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f'Đã lưu trữ {moved:,} dòng trước ngày {before} trong {time.monotonic() - started:.1f} giây'
+            ))
@@ -0,0 +1,42 @@
+# walkin/management/commands/rebuild_daily_stats.py
+"""Dựng lại bảng DailyDeskStats từ dữ liệu hàng đợi"""
+
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from walkin.models import Location, WalkInQueue, WalkInQueueArchive
+from walkin.rollups import rebuild_daily_stats
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại thống kê ngày theo bàn (DailyDeskStats) cho một khoảng ngày'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help='Ngày bắt đầu (YYYY-MM-DD), mặc định ngày cũ nhất')
+        parser.add_argument('--end', type=date.fromisoformat, help='Ngày kết thúc (YYYY-MM-DD), mặc định ngày mới nhất')
+        parser.add_argument('--location', type=int, action='append', help='ID địa điểm, có thể lặp lại')
+
+    def handle(self, *args, **options):
+        locations = None
+        sources = [WalkInQueue.objects.all(), WalkInQueueArchive.objects.all()]
+        if options['location']:
+            locations = Location.objects.filter(id__in=options['location'])
+            if locations.count() != len(set(options['location'])):
+                raise CommandError('Không tìm thấy địa điểm')
+            sources = [queryset.filter(location__in=locations) for queryset in sources]
+
+        bounds = [queryset.aggregate(first=Min('queue_date'), last=Max('queue_date')) for queryset in sources]
+        firsts = [bound['first'] for bound in bounds if bound['first'] is not None]
+        lasts = [bound['last'] for bound in bounds if bound['last'] is not None]
+        start = options['start'] or min(firsts, default=None)
+        end = options['end'] or max(lasts, default=None)
+        if start is None or end is None:
+            self.stdout.write('Không có dữ liệu hàng đợi')
+            return
+        if start > end:
+            raise CommandError('--start phải trước --end')
+
+        written = rebuild_daily_stats(start, end, locations=locations)
+        self.stdout.write(self.style.SUCCESS(f'Đã ghi {written:,} dòng thống kê từ {start} đến {end}'))
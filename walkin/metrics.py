@@ -0,0 +1,235 @@
+# walkin/metrics.py
+"""
+Số liệu vận hành theo định dạng Prometheus (/metrics)
+
+Bộ đếm được lưu trong cache 'walkin_counters' (cache.incr), nhờ vậy cộng
+dồn đúng khi chạy nhiều worker nếu CACHES dùng Redis. Với LocMemCache mỗi
+tiến trình có số liệu riêng.
+
+Số khách đang chờ / đang phục vụ của mỗi bàn được cập nhật dần theo tín
+hiệu queue_changed thay vì đếm lại bảng WalkInQueue mỗi lần scrape. Khi
+cache trống (khởi động lại, bị xoá), các giá trị này được nạp lại một lần
+từ cơ sở dữ liệu.
+"""
+
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.models import Count
+from django.dispatch import receiver
+from django.urls import get_resolver
+
+from .cache import counters
+from .models import Desk, WalkInQueue
+from .signals import queue_changed
+
+PREFIX = 'walkin:metrics:'
+
+# Trạng thái còn mở được theo dõi dưới dạng gauge
+OPEN_STATUSES = ('waiting', 'in_progress')
+QUEUE_EVENTS = ('enqueued', 'called', 'started', 'completed', 'cancelled')
+
+HTTP_METHODS = ('GET', 'HEAD', 'POST', 'OTHER')
+HTTP_CODES = ('1xx', '2xx', '3xx', '4xx', '5xx')
+# Cận trên các bucket (giây)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+WAIT_BUCKETS = (60, 300, 600, 900, 1800, 3600, 7200, 14400)
+
+SEEDED_KEY = PREFIX + 'seeded'
+
+
+def _incr(key, delta=1):
+    try:
+        counters.incr(key, delta)
+    except ValueError:
+        if not counters.add(key, delta, timeout=None):
+            counters.incr(key, delta)
+
+
+def _bucket(value, buckets):
+    """Chỉ số bucket nhỏ nhất chứa value (len(buckets) là +Inf)"""
+    for index, bound in enumerate(buckets):
+        if value <= bound:
+            return index
+    return len(buckets)
+
+
+def _observe(name, labels, value, buckets):
+    """Ghi một giá trị vào histogram: một bucket (không cộng dồn) và tổng"""
+    _incr(f'{PREFIX}{name}:{labels}:b{_bucket(value, buckets)}')
+    # cache.incr chỉ nhận số nguyên nên tổng được lưu theo mili giây
+    _incr(f'{PREFIX}{name}:{labels}:sum', int(value * 1000))
+
+
+def _depth_key(desk_id, status):
+    return f'{PREFIX}depth:{desk_id}:{status}'
+
+
+def view_names():
+    """Tên URL của toàn bộ view, dùng làm nhãn 'view'"""
+    names = set()
+
+    def collect(patterns):
+        for pattern in patterns:
+            if hasattr(pattern, 'url_patterns'):
+                collect(pattern.url_patterns)
+            elif pattern.name:
+                names.add(pattern.name)
+
+    collect(get_resolver().url_patterns)
+    return sorted(names) + ['unmatched']
+
+
+class MetricsMiddleware:
+    """
+    Đếm request và đo độ trễ theo tên URL
+
+    Hỗ trợ cả hai chế độ: dưới ASGI, middleware chỉ đồng bộ sẽ buộc cả chuỗi
+    xử lý (và các view async) chạy qua thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self.record(request, response, time.perf_counter() - started)
+        return response
+
+    def record(self, request, response, duration):
+        match = request.resolver_match
+        view = match.url_name if match is not None and match.url_name else 'unmatched'
+        method = request.method if request.method in HTTP_METHODS else 'OTHER'
+        code = f'{response.status_code // 100}xx'
+        _incr(f'{PREFIX}http:{view}:{method}:{code}')
+        _observe('latency', view, duration, LATENCY_BUCKETS)
+
+
+@receiver(queue_changed)
+def record_queue_event(sender, queue, event, status=None, previous_status=None, **kwargs):
+    """Cập nhật bộ đếm sự kiện và số khách theo trạng thái của bàn"""
+    _incr(f'{PREFIX}events:{queue.location_id}:{event}')
+    if previous_status != status:
+        if previous_status in OPEN_STATUSES:
+            _incr(_depth_key(queue.desk_id, previous_status), -1)
+        if status in OPEN_STATUSES:
+            _incr(_depth_key(queue.desk_id, status))
+    if event == 'started' and queue.started_at:
+        wait = (queue.started_at - queue.created_at).total_seconds()
+        _observe('wait', queue.location_id, max(wait, 0), WAIT_BUCKETS)
+
+
+def seed_queue_depth():
+    """Nạp lại số khách theo trạng thái của mọi bàn từ cơ sở dữ liệu"""
+    rows = (
+        WalkInQueue.objects.filter(status__in=OPEN_STATUSES)
+        .values('desk_id', 'status')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    counts = {_depth_key(row['desk_id'], row['status']): row['total'] for row in rows}
+    for desk_id in Desk.objects.values_list('id', flat=True):
+        for status in OPEN_STATUSES:
+            counts.setdefault(_depth_key(desk_id, status), 0)
+    counters.set_many(counts, timeout=None)
+    counters.set(SEEDED_KEY, True, timeout=None)
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def _histogram(lines, name, help_text, series, values, buckets):
+    """series: danh sách (nhãn trong cache, dict nhãn Prometheus)"""
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for key_label, labels in series:
+        counts = [values.get(f'{PREFIX}{key_label}:b{index}', 0) for index in range(len(buckets) + 1)]
+        total = sum(counts)
+        if not total:
+            continue
+        cumulative = 0
+        for bound, count in zip(list(buckets) + ['+Inf'], counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{_labels(**labels, le=bound)}}} {cumulative}')
+        seconds = values.get(f'{PREFIX}{key_label}:sum', 0) / 1000
+        lines.append(f'{name}_sum{{{_labels(**labels)}}} {seconds}')
+        lines.append(f'{name}_count{{{_labels(**labels)}}} {total}')
+
+
+def render_metrics():
+    """Nội dung text/plain theo định dạng exposition của Prometheus"""
+    if not counters.get(SEEDED_KEY):
+        seed_queue_depth()
+
+    views = view_names()
+    desks = list(Desk.objects.order_by('location_id', 'id').values_list('id', 'location_id'))
+    location_ids = sorted({location_id for _, location_id in desks})
+
+    keys = [f'{PREFIX}http:{view}:{method}:{code}' for view in views for method in HTTP_METHODS for code in HTTP_CODES]
+    keys += [f'{PREFIX}latency:{view}:b{index}' for view in views for index in range(len(LATENCY_BUCKETS) + 1)]
+    keys += [f'{PREFIX}latency:{view}:sum' for view in views]
+    keys += [_depth_key(desk_id, status) for desk_id, _ in desks for status in OPEN_STATUSES]
+    keys += [f'{PREFIX}events:{location_id}:{event}' for location_id in location_ids for event in QUEUE_EVENTS]
+    keys += [f'{PREFIX}wait:{location_id}:b{index}' for location_id in location_ids for index in range(len(WAIT_BUCKETS) + 1)]
+    keys += [f'{PREFIX}wait:{location_id}:sum' for location_id in location_ids]
+    values = counters.get_many(keys)
+
+    lines = [
+        '# HELP walkin_http_requests_total HTTP requests by view, method and status class',
+        '# TYPE walkin_http_requests_total counter',
+    ]
+    for view in views:
+        for method in HTTP_METHODS:
+            for code in HTTP_CODES:
+                count = values.get(f'{PREFIX}http:{view}:{method}:{code}')
+                if count:
+                    lines.append(f'walkin_http_requests_total{{{_labels(view=view, method=method, code=code)}}} {count}')
+
+    _histogram(
+        lines, 'walkin_http_request_duration_seconds', 'HTTP request latency by view',
+        [(f'latency:{view}', {'view': view}) for view in views], values, LATENCY_BUCKETS,
+    )
+
+    lines.append('# HELP walkin_desk_queue_depth Open tickets per desk by status')
+    lines.append('# TYPE walkin_desk_queue_depth gauge')
+    location_depth = {}
+    for desk_id, location_id in desks:
+        for status in OPEN_STATUSES:
+            depth = max(values.get(_depth_key(desk_id, status), 0), 0)
+            location_depth[location_id, status] = location_depth.get((location_id, status), 0) + depth
+            lines.append(
+                f'walkin_desk_queue_depth{{{_labels(location=location_id, desk=desk_id, status=status)}}} {depth}'
+            )
+
+    lines.append('# HELP walkin_location_queue_depth Open tickets per location by status')
+    lines.append('# TYPE walkin_location_queue_depth gauge')
+    for (location_id, status), depth in sorted(location_depth.items()):
+        lines.append(f'walkin_location_queue_depth{{{_labels(location=location_id, status=status)}}} {depth}')
+
+    lines.append('# HELP walkin_queue_events_total Queue transitions by location and event')
+    lines.append('# TYPE walkin_queue_events_total counter')
+    for location_id in location_ids:
+        for event in QUEUE_EVENTS:
+            count = values.get(f'{PREFIX}events:{location_id}:{event}', 0)
+            lines.append(f'walkin_queue_events_total{{{_labels(location=location_id, event=event)}}} {count}')
+
+    _histogram(
+        lines, 'walkin_queue_wait_seconds', 'Time from created_at to started_at',
+        [(f'wait:{location_id}', {'location': location_id}) for location_id in location_ids],
+        values, WAIT_BUCKETS,
+    )
+    return '\n'.join(lines) + '\n'
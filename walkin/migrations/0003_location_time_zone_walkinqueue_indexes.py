@@ -0,0 +1,31 @@
+# Generated by Django 4.2.25 on 2026-10-16 22:28
+
+from django.db import migrations, models
+import walkin.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('walkin', '0002_desk_alter_location_options_alter_user_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='time_zone',
+            field=models.CharField(default='Asia/Ho_Chi_Minh', help_text="IANA time zone used to determine the location's business day", max_length=64, validators=[walkin.models.validate_time_zone]),
+        ),
+        migrations.AddIndex(
+            model_name='walkinqueue',
+            index=models.Index(fields=['desk', 'status', 'created_at'], name='walkin_queue_desk_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='walkinqueue',
+            index=models.Index(fields=['location', 'status', 'created_at'], name='walkin_queue_loc_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='walkinqueue',
+            index=models.Index(fields=['desk', 'created_at'], name='walkin_queue_desk_created_idx'),
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 4.2.25 on 2026-10-16 22:40
+
+import zoneinfo
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_queue_date(apps, schema_editor):
+    """Gán ngày lấy số cho các dòng cũ theo múi giờ của địa điểm"""
+    WalkInQueue = apps.get_model('walkin', 'WalkInQueue')
+    queues = WalkInQueue.objects.select_related('location').filter(queue_date__isnull=True)
+    for queue in queues.iterator(chunk_size=2000):
+        tz = zoneinfo.ZoneInfo(queue.location.time_zone)
+        queue.queue_date = queue.created_at.astimezone(tz).date()
+        queue.save(update_fields=['queue_date'])
+
+
+def renumber_duplicates(apps, schema_editor):
+    """
+    Đánh lại số của các (bàn, ngày) có số thứ tự trùng trước khi thêm ràng buộc
+
+    Số trùng có thể đến từ cách cấp số cũ (COUNT + 1 khi hai nhân viên thêm
+    khách cùng lúc) hoặc từ việc gán ngày theo giờ địa phương ở bước trước
+    (hai ngày UTC gộp vào một ngày làm việc). Các số của nhóm được đánh lại
+    liên tục theo giờ vào hàng, khớp với cách QueueCounter tiếp nối số cũ.
+    """
+    WalkInQueue = apps.get_model('walkin', 'WalkInQueue')
+    duplicates = (
+        WalkInQueue.objects.order_by()
+        .values('desk_id', 'queue_date', 'queue_number')
+        .annotate(count=models.Count('id'))
+        .filter(count__gt=1)
+    )
+    groups = {(row['desk_id'], row['queue_date']) for row in duplicates}
+    for desk_id, day in sorted(groups):
+        queues = (
+            WalkInQueue.objects.select_related('desk')
+            .filter(desk_id=desk_id, queue_date=day)
+            .order_by('created_at', 'id')
+        )
+        for number, queue in enumerate(queues, start=1):
+            # Cùng định dạng với WalkInQueue.make_queue_number
+            queue.queue_number = f"{queue.desk.desk_number.replace('Bàn ', '')}{number:03d}"
+            queue.save(update_fields=['queue_number'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('walkin', '0003_location_time_zone_walkinqueue_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueueCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Ngày')),
+                ('last_number', models.PositiveIntegerField(default=0, verbose_name='Số đã cấp gần nhất')),
+                ('desk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='queue_counters', to='walkin.desk', verbose_name='Bàn phục vụ')),
+            ],
+            options={
+                'verbose_name': 'Bộ đếm số thứ tự',
+                'verbose_name_plural': 'Bộ đếm số thứ tự',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='queuecounter',
+            constraint=models.UniqueConstraint(fields=('desk', 'day'), name='walkin_counter_desk_day_uniq'),
+        ),
+        migrations.AddField(
+            model_name='walkinqueue',
+            name='queue_date',
+            field=models.DateField(null=True, verbose_name='Ngày lấy số'),
+        ),
+        migrations.RunPython(backfill_queue_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='walkinqueue',
+            name='queue_date',
+            field=models.DateField(help_text='Ngày làm việc (theo giờ địa phương) mà số thứ tự thuộc về', verbose_name='Ngày lấy số'),
+        ),
+        migrations.RunPython(renumber_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='walkinqueue',
+            constraint=models.UniqueConstraint(fields=('desk', 'queue_date', 'queue_number'), name='walkin_queue_desk_day_number_uniq'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.25 on 2026-10-16 22:44
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('walkin', '0004_queue_counter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='walkinqueue',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Giờ vào hàng'),
+        ),
+    ]
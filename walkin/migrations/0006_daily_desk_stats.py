@@ -0,0 +1,52 @@
+# Generated by Django 4.2.25 on 2026-10-16 22:49
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('walkin', '0005_walkinqueue_created_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyDeskStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Ngày')),
+                ('total', models.PositiveIntegerField(default=0, verbose_name='Tổng số khách')),
+                ('waiting', models.PositiveIntegerField(default=0, verbose_name='Đang chờ')),
+                ('in_progress', models.PositiveIntegerField(default=0, verbose_name='Đang xử lý')),
+                ('completed', models.PositiveIntegerField(default=0, verbose_name='Hoàn thành')),
+                ('cancelled', models.PositiveIntegerField(default=0, verbose_name='Đã huỷ')),
+                ('priority', models.PositiveIntegerField(default=0, verbose_name='Khách ưu tiên')),
+                ('wait_count', models.PositiveIntegerField(default=0, verbose_name='Số lượt có thời gian chờ')),
+                ('wait_sum', models.FloatField(default=0, verbose_name='Tổng thời gian chờ')),
+                ('wait_min', models.FloatField(blank=True, null=True, verbose_name='Chờ ngắn nhất')),
+                ('wait_max', models.FloatField(blank=True, null=True, verbose_name='Chờ lâu nhất')),
+                ('wait_p50', models.FloatField(blank=True, null=True, verbose_name='Trung vị thời gian chờ')),
+                ('wait_p90', models.FloatField(blank=True, null=True, verbose_name='P90 thời gian chờ')),
+                ('service_count', models.PositiveIntegerField(default=0, verbose_name='Số lượt có thời gian phục vụ')),
+                ('service_sum', models.FloatField(default=0, verbose_name='Tổng thời gian phục vụ')),
+                ('service_min', models.FloatField(blank=True, null=True, verbose_name='Phục vụ ngắn nhất')),
+                ('service_max', models.FloatField(blank=True, null=True, verbose_name='Phục vụ lâu nhất')),
+                ('service_p50', models.FloatField(blank=True, null=True, verbose_name='Trung vị thời gian phục vụ')),
+                ('service_p90', models.FloatField(blank=True, null=True, verbose_name='P90 thời gian phục vụ')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('desk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='walkin.desk', verbose_name='Bàn phục vụ')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='walkin.location', verbose_name='Địa điểm')),
+            ],
+            options={
+                'verbose_name': 'Thống kê ngày',
+                'verbose_name_plural': 'Thống kê ngày',
+                'ordering': ['day', 'desk'],
+                'indexes': [models.Index(fields=['location', 'day'], name='walkin_daily_loc_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailydeskstats',
+            constraint=models.UniqueConstraint(fields=('desk', 'day'), name='walkin_daily_desk_day_uniq'),
+        ),
+    ]
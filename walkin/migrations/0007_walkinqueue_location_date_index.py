@@ -0,0 +1,17 @@
+# Generated by Django 4.2.25 on 2026-10-16 22:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('walkin', '0006_daily_desk_stats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='walkinqueue',
+            index=models.Index(fields=['location', 'queue_date'], name='walkin_queue_loc_date_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.25 on 2026-10-16 22:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('walkin', '0007_walkinqueue_location_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WalkInQueueArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('queue_number', models.CharField(max_length=20, verbose_name='Số thứ tự')),
+                ('queue_date', models.DateField(verbose_name='Ngày lấy số')),
+                ('customer_name', models.CharField(max_length=200, verbose_name='Tên khách hàng')),
+                ('customer_phone', models.CharField(blank=True, max_length=20, verbose_name='Số điện thoại')),
+                ('service_type', models.CharField(max_length=100, verbose_name='Loại dịch vụ')),
+                ('notes', models.TextField(blank=True, verbose_name='Ghi chú')),
+                ('status', models.CharField(choices=[('waiting', 'Đang chờ'), ('in_progress', 'Đang xử lý'), ('completed', 'Hoàn thành'), ('cancelled', 'Đã huỷ')], max_length=20, verbose_name='Trạng thái')),
+                ('is_priority', models.BooleanField(default=False, verbose_name='Ưu tiên')),
+                ('created_at', models.DateTimeField(verbose_name='Giờ vào hàng')),
+                ('called_at', models.DateTimeField(blank=True, null=True, verbose_name='Giờ gọi')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Giờ bắt đầu phục vụ')),
+                ('completed_at', models.DateTimeField(blank=True, null=True, verbose_name='Giờ hoàn thành')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Giờ lưu trữ')),
+                ('desk', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_queues', to='walkin.desk', verbose_name='Bàn phục vụ')),
+                ('handled_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Nhân viên xử lý')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_queues', to='walkin.location', verbose_name='Địa điểm')),
+            ],
+            options={
+                'verbose_name': 'Hàng đợi đã lưu trữ',
+                'verbose_name_plural': 'Hàng đợi đã lưu trữ',
+                'ordering': ['queue_date', 'id'],
+                'indexes': [models.Index(fields=['location', 'queue_date'], name='walkin_archive_loc_date_idx'), models.Index(fields=['desk', 'queue_date'], name='walkin_archive_desk_date_idx')],
+            },
+        ),
+    ]
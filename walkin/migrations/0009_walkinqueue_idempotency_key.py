@@ -0,0 +1,18 @@
+# Generated by Django 4.2.25 on 2026-10-16 23:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('walkin', '0008_walkinqueue_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='walkinqueue',
+            name='idempotency_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True, verbose_name='Khoá chống trùng'),
+        ),
+    ]
@@ -1,10 +1,30 @@
 # walkin/models.py - COPY TOÀN BỘ FILE NÀY
 
-from django.db import models
+import logging
+import re
+import zoneinfo
+
+from django.db import models, transaction, IntegrityError
+from django.db.models import F
 from django.contrib.auth.models import AbstractUser
+from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
 from django.utils import timezone
-from datetime import date
+
+from .db import immediate_atomic
+from .signals import queue_changed, queue_changing
+from .utils import local_today, today_filter
+
+
+logger = logging.getLogger(__name__)
+
+
+def validate_time_zone(value):
+    """Validate an IANA time zone name such as 'Asia/Ho_Chi_Minh'"""
+    try:
+        zoneinfo.ZoneInfo(value)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f"'{value}' is not a valid time zone")
 
 
 class Location(models.Model):
@@ -34,6 +54,12 @@ class Location(models.Model):
         default=True,
         help_text="Whether this location is currently operational"
     )
+    time_zone = models.CharField(
+        max_length=64,
+        default='Asia/Ho_Chi_Minh',
+        validators=[validate_time_zone],
+        help_text="IANA time zone used to determine the location's business day"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -92,16 +118,17 @@ class User(AbstractUser):
         return f"{self.username} ({self.get_role_display()})"
 
     def can_access_location(self, location):
-        """Check if user can access data from a specific location"""
+        """Check if user can access data from a specific location (instance or id)"""
         if self.is_superuser:
             return True
-        return self.location == location
+        location_id = getattr(location, 'pk', location)
+        return location_id is not None and location_id == self.location_id
 
     def get_accessible_locations(self):
         """Get all locations this user can access"""
         if self.is_superuser:
             return Location.objects.filter(active=True)
-        return Location.objects.filter(id=self.location.id, active=True) if self.location else Location.objects.none()
+        return Location.objects.filter(id=self.location_id, active=True) if self.location_id else Location.objects.none()
     
     def is_admin_role(self):
         """Kiểm tra có phải admin không"""
@@ -148,31 +175,40 @@ class Desk(models.Model):
     def __str__(self):
         return f"{self.desk_number} - {self.desk_name}"
 
+    def get_service_types(self):
+        """Các loại dịch vụ của bàn, mỗi loại cách nhau bởi dấu phẩy, chấm phẩy hoặc xuống dòng"""
+        return [name.strip() for name in re.split(r'[,;\n]', self.service_type) if name.strip()]
+
+    def covers(self, service_type):
+        """Bàn có phục vụ loại dịch vụ này không (không phân biệt hoa thường)"""
+        wanted = service_type.strip().casefold()
+        return any(name.casefold() == wanted for name in self.get_service_types())
+
     def get_waiting_count(self):
         """Số khách đang chờ"""
         return self.queues.filter(
             status='waiting',
-            created_at__date=date.today()
+            **today_filter(self.location)
         ).count()
 
     def get_serving_count(self):
         """Số khách đang được phục vụ"""
         return self.queues.filter(
             status='in_progress',
-            created_at__date=date.today()
+            **today_filter(self.location)
         ).count()
 
     def get_today_total(self):
         """Tổng số khách hôm nay"""
         return self.queues.filter(
-            created_at__date=date.today()
+            **today_filter(self.location)
         ).count()
 
     def get_current_serving(self):
         """Khách đang được phục vụ"""
         return self.queues.filter(
             status='in_progress',
-            created_at__date=date.today()
+            **today_filter(self.location)
         ).first()
 
 
@@ -203,6 +239,10 @@ class WalkInQueue(models.Model):
         max_length=20,
         verbose_name='Số thứ tự'
     )
+    queue_date = models.DateField(
+        verbose_name='Ngày lấy số',
+        help_text='Ngày làm việc (theo giờ địa phương) mà số thứ tự thuộc về'
+    )
     customer_name = models.CharField(
         max_length=200,
         verbose_name='Tên khách hàng'
@@ -235,8 +275,10 @@ class WalkInQueue(models.Model):
     )
 
     # Thời gian
+    # Không dùng auto_now_add để có thể nạp dữ liệu lịch sử (xem synthetic.py)
     created_at = models.DateTimeField(
-        auto_now_add=True,
+        default=timezone.now,
+        editable=False,
         verbose_name='Giờ vào hàng'
     )
     called_at = models.DateTimeField(
@@ -264,36 +306,135 @@ class WalkInQueue(models.Model):
         verbose_name='Nhân viên xử lý'
     )
 
+    # Khoá do kiosk tạo cho mỗi số khi lấy số ngoại tuyến (xem ingest.py):
+    # gửi lại cùng một lô không tạo thêm số
+    idempotency_key = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        unique=True,
+        editable=False,
+        verbose_name='Khoá chống trùng'
+    )
+
     class Meta:
         ordering = ['-is_priority', 'created_at']
         verbose_name = 'Hàng đợi'
         verbose_name_plural = 'Hàng đợi'
+        indexes = [
+            # Hàng đợi của bàn theo trạng thái trong ngày (chi tiết bàn)
+            models.Index(fields=['desk', 'status', 'created_at'], name='walkin_queue_desk_status_idx'),
+            # Thống kê theo địa điểm và trạng thái trong ngày
+            models.Index(fields=['location', 'status', 'created_at'], name='walkin_queue_loc_status_idx'),
+            # Tổng số khách trong ngày của bàn
+            models.Index(fields=['desk', 'created_at'], name='walkin_queue_desk_created_idx'),
+            # Báo cáo và xuất dữ liệu theo địa điểm trong một khoảng ngày
+            models.Index(fields=['location', 'queue_date'], name='walkin_queue_loc_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['desk', 'queue_date', 'queue_number'],
+                name='walkin_queue_desk_day_number_uniq'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.queue_number} - {self.customer_name}"
 
+    def save(self, *args, **kwargs):
+        if self.queue_date is None:
+            self.queue_date = local_today(self.location)
+        super().save(*args, **kwargs)
+
+    @staticmethod
+    def make_queue_number(desk, number):
+        """Định dạng số thứ tự hiển thị, ví dụ 'Bàn 1' + 7 -> '1007'"""
+        return f"{desk.desk_number.replace('Bàn ', '')}{number:03d}"
+
+    @classmethod
+    def enqueue(cls, desk, **fields):
+        """Thêm khách vào hàng đợi của bàn, số thứ tự được cấp nguyên tử"""
+        day = local_today(desk.location)
+        with immediate_atomic():
+            number = QueueCounter.allocate(desk, day)
+            queue = cls.objects.create(
+                location=desk.location,
+                desk=desk,
+                queue_date=day,
+                queue_number=cls.make_queue_number(desk, number),
+                **fields
+            )
+            queue.notify('enqueued')
+        return queue
+
+    def notify(self, event, previous_status=None, batch=False):
+        """
+        Phát tín hiệu queue_changing ngay (trong transaction hiện tại) và
+        queue_changed sau khi transaction commit
+
+        Lỗi của receiver queue_changing làm rollback thay đổi. Lỗi của receiver
+        queue_changed chỉ được ghi log: thay đổi đã commit, các receiver khác
+        vẫn chạy và view không trả về lỗi cho một thao tác đã thành công.
+        """
+        kwargs = dict(queue=self, event=event, status=self.status, previous_status=previous_status, batch=batch)
+        queue_changing.send(sender=WalkInQueue, **kwargs)
+        transaction.on_commit(lambda: _send_queue_changed(**kwargs))
+
+    @classmethod
+    def claim(cls, queue_id, user, desk=None):
+        """
+        Gọi và bắt đầu phục vụ một khách đang chờ bằng một UPDATE có điều kiện
+
+        Chỉ một nhân viên giành được khách: UPDATE ... WHERE status='waiting'
+        trả về 0 dòng cho người đến sau. Trả về dòng vừa giành được, hoặc
+        None nếu khách không còn chờ (hoặc không thuộc `desk`).
+        """
+        queues = cls.objects.filter(id=queue_id, status='waiting')
+        if desk is not None:
+            queues = queues.filter(desk=desk)
+        now = timezone.now()
+        with transaction.atomic():
+            if not queues.update(status='in_progress', called_at=now, started_at=now, handled_by=user):
+                return None
+            queue = cls.objects.select_related('desk', 'location').get(id=queue_id)
+            # Một lần chuyển trạng thái waiting -> in_progress: chỉ một sự kiện
+            queue.notify('started', 'waiting')
+        return queue
+
+    def _transition(self, event, allowed, **changes):
+        """
+        Ghi các trường thay đổi bằng một UPDATE có điều kiện trên trạng thái
+
+        Trả về False (không ghi gì) nếu trạng thái trong cơ sở dữ liệu không
+        còn thuộc `allowed`, ví dụ khách đã được nhân viên khác xử lý.
+        """
+        previous_status = self.status
+        with transaction.atomic():
+            if not WalkInQueue.objects.filter(pk=self.pk, status__in=allowed).update(**changes):
+                return False
+            for field, value in changes.items():
+                setattr(self, field, value)
+            self.notify(event, previous_status)
+        return True
+
     def call(self):
         """Gọi khách hàng"""
-        self.called_at = timezone.now()
-        self.save()
+        return self._transition('called', ['waiting'], called_at=timezone.now())
 
     def start_serving(self, user):
         """Bắt đầu phục vụ"""
-        self.status = 'in_progress'
-        self.started_at = timezone.now()
-        self.handled_by = user
-        self.save()
+        return self._transition(
+            'started', ['waiting'],
+            status='in_progress', started_at=timezone.now(), handled_by=user,
+        )
 
     def complete(self):
         """Hoàn thành phục vụ"""
-        self.status = 'completed'
-        self.completed_at = timezone.now()
-        self.save()
+        return self._transition('completed', ['in_progress'], status='completed', completed_at=timezone.now())
 
     def cancel(self):
         """Huỷ"""
-        self.status = 'cancelled'
-        self.save()
+        return self._transition('cancelled', ['waiting', 'in_progress'], status='cancelled')
 
     def get_waiting_time(self):
         """Thời gian chờ (phút)"""
@@ -310,4 +451,187 @@ class WalkInQueue(models.Model):
         if self.completed_at and self.started_at:
             delta = self.completed_at - self.started_at
             return int(delta.total_seconds() / 60)
-        return 0
\ No newline at end of file
+        return 0
+
+
+def _send_queue_changed(**kwargs):
+    """Phát queue_changed tới mọi receiver, ghi log receiver nào bị lỗi"""
+    for receiver, result in queue_changed.send_robust(sender=WalkInQueue, **kwargs):
+        if isinstance(result, Exception):
+            logger.error(
+                'queue_changed receiver %s failed for queue %s (%s)',
+                getattr(receiver, '__qualname__', receiver), kwargs['queue'].pk, kwargs['event'],
+                exc_info=result,
+            )
+
+
+class WalkInQueueArchive(models.Model):
+    """
+    Hàng đợi của các ngày đã quá hạn lưu trữ (xem archive.py)
+
+    Giữ nguyên id và các trường của WalkInQueue để vẫn tra cứu và xuất báo
+    cáo được, trong khi bảng WalkInQueue chỉ còn dữ liệu gần đây.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.CASCADE,
+        related_name='archived_queues',
+        verbose_name='Địa điểm'
+    )
+    desk = models.ForeignKey(
+        Desk,
+        on_delete=models.CASCADE,
+        related_name='archived_queues',
+        verbose_name='Bàn phục vụ'
+    )
+    queue_number = models.CharField(max_length=20, verbose_name='Số thứ tự')
+    queue_date = models.DateField(verbose_name='Ngày lấy số')
+    customer_name = models.CharField(max_length=200, verbose_name='Tên khách hàng')
+    customer_phone = models.CharField(max_length=20, blank=True, verbose_name='Số điện thoại')
+    service_type = models.CharField(max_length=100, verbose_name='Loại dịch vụ')
+    notes = models.TextField(blank=True, verbose_name='Ghi chú')
+    status = models.CharField(
+        max_length=20,
+        choices=WalkInQueue.STATUS_CHOICES,
+        verbose_name='Trạng thái'
+    )
+    is_priority = models.BooleanField(default=False, verbose_name='Ưu tiên')
+    created_at = models.DateTimeField(verbose_name='Giờ vào hàng')
+    called_at = models.DateTimeField(null=True, blank=True, verbose_name='Giờ gọi')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Giờ bắt đầu phục vụ')
+    completed_at = models.DateTimeField(null=True, blank=True, verbose_name='Giờ hoàn thành')
+    handled_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Nhân viên xử lý'
+    )
+    archived_at = models.DateTimeField(default=timezone.now, verbose_name='Giờ lưu trữ')
+
+    class Meta:
+        ordering = ['queue_date', 'id']
+        verbose_name = 'Hàng đợi đã lưu trữ'
+        verbose_name_plural = 'Hàng đợi đã lưu trữ'
+        indexes = [
+            models.Index(fields=['location', 'queue_date'], name='walkin_archive_loc_date_idx'),
+            models.Index(fields=['desk', 'queue_date'], name='walkin_archive_desk_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.queue_number} - {self.customer_name} ({self.queue_date})"
+
+
+class QueueCounter(models.Model):
+    """Bộ đếm số thứ tự theo bàn và theo ngày"""
+    desk = models.ForeignKey(
+        Desk,
+        on_delete=models.CASCADE,
+        related_name='queue_counters',
+        verbose_name='Bàn phục vụ'
+    )
+    day = models.DateField(
+        verbose_name='Ngày'
+    )
+    last_number = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Số đã cấp gần nhất'
+    )
+
+    class Meta:
+        verbose_name = 'Bộ đếm số thứ tự'
+        verbose_name_plural = 'Bộ đếm số thứ tự'
+        constraints = [
+            models.UniqueConstraint(fields=['desk', 'day'], name='walkin_counter_desk_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.desk} - {self.day}: {self.last_number}"
+
+    @classmethod
+    def allocate(cls, desk, day, count=1):
+        """
+        Cấp `count` số liên tiếp cho bàn trong ngày, trả về số lớn nhất
+
+        Phải được gọi trong transaction: câu UPDATE khoá dòng bộ đếm (hoặc
+        khoá ghi của SQLite) cho tới khi transaction kết thúc, nên hai nhân
+        viên thêm khách cùng lúc không bao giờ nhận trùng số.
+        """
+        counter = cls.objects.filter(desk=desk, day=day)
+        if not counter.update(last_number=F('last_number') + count):
+            # Lần cấp số đầu tiên trong ngày: tiếp nối các số đã có (nếu có)
+            existing = WalkInQueue.objects.filter(desk=desk, queue_date=day).count()
+            try:
+                with transaction.atomic():
+                    cls.objects.create(desk=desk, day=day, last_number=existing + count)
+                return existing + count
+            except IntegrityError:
+                counter.update(last_number=F('last_number') + count)
+        return counter.values_list('last_number', flat=True).get()
+
+
+class DailyDeskStats(models.Model):
+    """
+    Thống kê tổng hợp của một bàn trong một ngày
+
+    Được làm mới sau mỗi thay đổi trạng thái hàng đợi (xem rollups.py) nên
+    báo cáo lịch sử chỉ cần đọc bảng này thay vì toàn bộ WalkInQueue. Thời
+    gian chờ và thời gian phục vụ tính bằng giây.
+    """
+    location = models.ForeignKey(
+        Location,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name='Địa điểm'
+    )
+    desk = models.ForeignKey(
+        Desk,
+        on_delete=models.CASCADE,
+        related_name='daily_stats',
+        verbose_name='Bàn phục vụ'
+    )
+    day = models.DateField(
+        verbose_name='Ngày'
+    )
+
+    # Số lượng theo trạng thái
+    total = models.PositiveIntegerField(default=0, verbose_name='Tổng số khách')
+    waiting = models.PositiveIntegerField(default=0, verbose_name='Đang chờ')
+    in_progress = models.PositiveIntegerField(default=0, verbose_name='Đang xử lý')
+    completed = models.PositiveIntegerField(default=0, verbose_name='Hoàn thành')
+    cancelled = models.PositiveIntegerField(default=0, verbose_name='Đã huỷ')
+    priority = models.PositiveIntegerField(default=0, verbose_name='Khách ưu tiên')
+
+    # Thời gian chờ (created_at -> started_at)
+    wait_count = models.PositiveIntegerField(default=0, verbose_name='Số lượt có thời gian chờ')
+    wait_sum = models.FloatField(default=0, verbose_name='Tổng thời gian chờ')
+    wait_min = models.FloatField(null=True, blank=True, verbose_name='Chờ ngắn nhất')
+    wait_max = models.FloatField(null=True, blank=True, verbose_name='Chờ lâu nhất')
+    wait_p50 = models.FloatField(null=True, blank=True, verbose_name='Trung vị thời gian chờ')
+    wait_p90 = models.FloatField(null=True, blank=True, verbose_name='P90 thời gian chờ')
+
+    # Thời gian phục vụ (started_at -> completed_at)
+    service_count = models.PositiveIntegerField(default=0, verbose_name='Số lượt có thời gian phục vụ')
+    service_sum = models.FloatField(default=0, verbose_name='Tổng thời gian phục vụ')
+    service_min = models.FloatField(null=True, blank=True, verbose_name='Phục vụ ngắn nhất')
+    service_max = models.FloatField(null=True, blank=True, verbose_name='Phục vụ lâu nhất')
+    service_p50 = models.FloatField(null=True, blank=True, verbose_name='Trung vị thời gian phục vụ')
+    service_p90 = models.FloatField(null=True, blank=True, verbose_name='P90 thời gian phục vụ')
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['day', 'desk']
+        verbose_name = 'Thống kê ngày'
+        verbose_name_plural = 'Thống kê ngày'
+        indexes = [
+            models.Index(fields=['location', 'day'], name='walkin_daily_loc_day_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['desk', 'day'], name='walkin_daily_desk_day_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.desk} - {self.day}"
@@ -0,0 +1,93 @@
+# walkin/parallel.py
+"""
+Chạy song song các truy vấn đọc độc lập trong view async
+
+Async ORM của Django 4.2 chuyển mọi truy vấn của một request sang cùng một
+thread (sync_to_async thread_sensitive), nên asyncio.gather(qs.acount(), ...)
+vẫn chạy lần lượt. run_parallel() chạy mỗi hàm trên một thread của một pool
+giới hạn, mỗi thread có kết nối cơ sở dữ liệu riêng, nên các truy vấn thật
+sự chạy đồng thời và tổng thời gian chờ bằng truy vấn chậm nhất.
+
+Kết nối của các thread trong pool được kiểm tra trước và sau mỗi lần gọi
+như một request (close_old_connections), nên số kết nối thêm không vượt quá
+kích thước pool. Các thread không thấy dữ liệu chưa commit của request: khi
+request đang ở trong transaction (ví dụ ATOMIC_REQUESTS, hoặc TestCase) các
+hàm được chạy lần lượt trên thread của request.
+
+Các execute wrapper đang cài trên kết nối của request (ví dụ
+QueryInstrumentationMiddleware đếm truy vấn) được cài lại trên kết nối của
+thread trong pool trong lúc gọi hàm, nên truy vấn chạy song song vẫn được
+đếm như khi chạy trên thread của request.
+"""
+
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connection, connections
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.WALKIN_PARALLEL_QUERY_THREADS,
+            thread_name_prefix='walkin-query',
+        )
+    return _executor
+
+
+def _call(function, wrappers):
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            for alias, alias_wrappers in wrappers.items():
+                pool_connection = connections[alias]
+                for wrapper in alias_wrappers:
+                    # Wrapper cài qua connection_created đã có sẵn trên kết nối này
+                    if wrapper not in pool_connection.execute_wrappers:
+                        stack.enter_context(pool_connection.execute_wrapper(wrapper))
+            return function()
+    finally:
+        close_old_connections()
+
+
+@sync_to_async
+def _sequential(functions):
+    """
+    Trả về (kết quả, None) sau khi chạy các hàm lần lượt trên thread của
+    request nếu request đang trong transaction hoặc pool bị tắt
+    (WALKIN_PARALLEL_QUERY_THREADS = 0), nếu không (None, các execute wrapper
+    của request theo alias)
+    """
+    if connection.in_atomic_block or not settings.WALKIN_PARALLEL_QUERY_THREADS:
+        return [function() for function in functions], None
+    wrappers = {
+        alias: list(connections[alias].execute_wrappers)
+        for alias in connections
+        if connections[alias].execute_wrappers
+    }
+    return None, wrappers
+
+
+async def run_parallel(*functions):
+    """
+    Gọi các hàm đồng bộ (không tham số) đồng thời, trả về kết quả theo thứ tự
+
+    Các hàm chỉ được đọc: chúng chạy ngoài transaction của request. Biến
+    ngữ cảnh (ví dụ read_from_replica) được chuyển sang từng thread.
+    """
+    results, wrappers = await _sequential(functions)
+    if results is not None:
+        return results
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    return await asyncio.gather(*(
+        loop.run_in_executor(executor, contextvars.copy_context().run, _call, function, wrappers)
+        for function in functions
+    ))
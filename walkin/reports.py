@@ -0,0 +1,148 @@
+# walkin/reports.py
+"""Báo cáo lịch sử theo địa điểm và bàn, đọc từ bảng DailyDeskStats"""
+
+from datetime import date
+
+from django.db.models import Max, Sum
+from django.http import Http404
+from django.utils import timezone
+
+from .models import DailyDeskStats, Desk, WalkInQueue, WalkInQueueArchive
+from .stats import minutes
+from .utils import local_today, location_timezone
+
+# Các cột được cộng dồn khi gộp nhiều ngày
+SUMMED_FIELDS = ('total', 'completed', 'cancelled', 'priority', 'wait_count', 'wait_sum', 'service_count', 'service_sum')
+
+EXPORT_HEADER = [
+    'Địa điểm', 'Bàn', 'Ngày', 'Số thứ tự', 'Khách hàng', 'Số điện thoại', 'Loại dịch vụ',
+    'Ưu tiên', 'Trạng thái', 'Giờ vào hàng', 'Giờ gọi', 'Giờ bắt đầu', 'Giờ hoàn thành', 'Nhân viên',
+]
+EXPORT_FIELDS = [
+    'location_id', 'location__name', 'desk__desk_number', 'queue_date', 'queue_number', 'customer_name',
+    'customer_phone', 'service_type', 'is_priority', 'status', 'created_at', 'called_at', 'started_at',
+    'completed_at', 'handled_by__username',
+]
+# Vị trí các cột thời gian trong EXPORT_FIELDS, được đổi sang giờ địa phương
+TIME_COLUMNS = (10, 11, 12, 13)
+
+
+class ReportFilters:
+    """Bộ lọc của báo cáo, luôn giới hạn trong các địa điểm người dùng được xem"""
+
+    def __init__(self, user, params):
+        self.locations = user.get_accessible_locations()
+        self.location = None
+        self.desk = None
+
+        location_id = params.get('location')
+        if location_id:
+            self.location = self.locations.filter(id=location_id).first()
+            if self.location is None:
+                raise Http404
+        elif user.location_id and not user.is_superuser:
+            self.location = self.locations.filter(id=user.location_id).first()
+
+        desk_id = params.get('desk')
+        if desk_id:
+            desks = Desk.objects.filter(location__in=self.locations)
+            if self.location is not None:
+                desks = desks.filter(location=self.location)
+            self.desk = desks.filter(id=desk_id).first()
+            if self.desk is None:
+                raise Http404
+
+        today = local_today(self.location or user.location)
+        self.start = self._date(params.get('start')) or today.replace(day=1)
+        self.end = self._date(params.get('end')) or today
+        if self.start > self.end:
+            self.start, self.end = self.end, self.start
+
+    @staticmethod
+    def _date(value):
+        try:
+            return date.fromisoformat(value) if value else None
+        except ValueError:
+            return None
+
+    def apply(self, queryset, day_field):
+        """Lọc theo địa điểm, bàn và khoảng ngày"""
+        queryset = queryset.filter(**{f'{day_field}__range': (self.start, self.end)})
+        if self.desk is not None:
+            return queryset.filter(desk=self.desk)
+        if self.location is not None:
+            return queryset.filter(location=self.location)
+        return queryset.filter(location__in=self.locations)
+
+    def as_query(self):
+        params = {'start': self.start.isoformat(), 'end': self.end.isoformat()}
+        if self.location is not None:
+            params['location'] = self.location.id
+        if self.desk is not None:
+            params['desk'] = self.desk.id
+        return params
+
+
+def _with_averages(row):
+    """Thêm thời gian chờ/phục vụ trung bình (phút) vào một dòng đã cộng dồn"""
+    row['avg_wait'] = minutes(row['wait_sum'] / row['wait_count']) if row['wait_count'] else 0
+    row['avg_service'] = minutes(row['service_sum'] / row['service_count']) if row['service_count'] else 0
+    if 'wait_max' in row:
+        row['wait_max'] = minutes(row['wait_max'])
+    return row
+
+
+def throughput_report(filters):
+    """Tổng theo bàn, theo ngày và toàn kỳ, từ vài trăm dòng DailyDeskStats"""
+    rollups = filters.apply(DailyDeskStats.objects.all(), 'day')
+    sums = {field: Sum(field) for field in SUMMED_FIELDS}
+
+    by_desk = [
+        _with_averages(row) for row in
+        rollups.values('location__name', 'desk_id', 'desk__desk_number', 'desk__desk_name')
+        .annotate(**sums, wait_max=Max('wait_max'))
+        .order_by('location__name', 'desk__desk_number')
+    ]
+    by_day = [
+        _with_averages(row) for row in
+        rollups.values('day').annotate(**sums).order_by('day')
+    ]
+    totals = _with_averages({
+        field: sum(row[field] or 0 for row in by_day) for field in SUMMED_FIELDS
+    })
+
+    peak = max((row['total'] for row in by_day), default=0)
+    for row in by_day:
+        row['percent'] = round(row['total'] * 100 / peak) if peak else 0
+
+    return {'by_desk': by_desk, 'by_day': by_day, 'totals': totals}
+
+
+def export_rows(filters, using=None, chunk_size=2000):
+    """
+    Các dòng hàng đợi của báo cáo, đọc bằng iterator theo lô
+
+    Các ngày đã lưu trữ được đọc từ WalkInQueueArchive trước, sau đó tới
+    WalkInQueue. Thời gian được đổi sang múi giờ của từng địa điểm.
+    """
+    zones = {location.id: location_timezone(location) for location in filters.locations}
+    statuses = dict(WalkInQueue.STATUS_CHOICES)
+    for model in (WalkInQueueArchive, WalkInQueue):
+        queues = filters.apply(model.objects.using(using), 'queue_date')
+        rows = (
+            queues.order_by('queue_date', 'id')
+            .values_list(*EXPORT_FIELDS)
+            .iterator(chunk_size=chunk_size)
+        )
+        yield from _export_values(rows, zones, statuses)
+
+
+def _export_values(rows, zones, statuses):
+    for row in rows:
+        row = list(row)
+        tz = zones.get(row[0])
+        for column in TIME_COLUMNS:
+            if row[column] is not None:
+                row[column] = timezone.localtime(row[column], tz)
+        row[9] = statuses.get(row[9], row[9])
+        yield row[1:]
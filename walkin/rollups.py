@@ -0,0 +1,176 @@
+# walkin/rollups.py
+"""
+Bảng tổng hợp DailyDeskStats: cộng dồn theo từng thay đổi và dựng lại theo khoảng ngày
+
+Mỗi thay đổi trạng thái chỉ cộng/trừ các trường đếm và tổng thời gian bằng
+một UPDATE ... SET field = field + n trong cùng transaction với dòng hàng
+đợi (tín hiệu queue_changing), không đọc lại các dòng hàng đợi. Các trường
+min/max/phân vị cần đọc lại cả ngày của bàn nên chỉ được tính lại sau khi
+khách rời hàng đợi (hoàn thành hoặc huỷ).
+"""
+
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .db import immediate_atomic
+from .models import DailyDeskStats, WalkInQueue, WalkInQueueArchive
+from .signals import queue_changed, queue_changing
+from .stats import daily_stats_aggregates
+
+
+def refresh_desk_day(desk, day):
+    """
+    Tính lại thống kê của một bàn trong một ngày
+
+    Chỉ đọc các dòng hàng đợi của đúng bàn và ngày đó (chỉ mục
+    desk, queue_date, queue_number) nên chi phí không phụ thuộc độ dài lịch sử.
+    """
+    return _recompute(desk.id, desk.location_id, day)
+
+
+def _recompute(desk_id, location_id, day):
+    # Khoá ghi ngay từ đầu: đọc rồi mới ghi trong transaction thường sẽ
+    # gặp "database is locked" trên SQLite khi nhiều nhân viên thao tác
+    with immediate_atomic():
+        values = WalkInQueue.objects.filter(desk_id=desk_id, queue_date=day).aggregate(**daily_stats_aggregates())
+        if not values['total']:
+            DailyDeskStats.objects.filter(desk_id=desk_id, day=day).delete()
+            return None
+        stats, _ = DailyDeskStats.objects.update_or_create(
+            desk_id=desk_id, day=day, defaults=dict(values, location_id=location_id),
+        )
+    return stats
+
+
+# Sự kiện làm thay đổi DailyDeskStats ('called' chỉ ghi called_at)
+ROLLUP_EVENTS = ('enqueued', 'started', 'completed', 'cancelled')
+
+# Các trường phải đọc lại các dòng hàng đợi để tính
+DISTRIBUTION_FIELDS = (
+    'wait_min', 'wait_max', 'wait_p50', 'wait_p90',
+    'service_min', 'service_max', 'service_p50', 'service_p90',
+)
+
+
+def add_to_desk_day(desk_id, location_id, day, **deltas):
+    """
+    Cộng `deltas` (tên trường -> số cộng thêm) vào thống kê của một bàn trong một ngày
+
+    Phải được gọi trong transaction đã ghi thay đổi: nếu chưa có dòng thống
+    kê, hoặc dòng không còn khớp với hàng đợi (số đếm sắp âm, ví dụ số được
+    ghi không qua tín hiệu), cả ngày được tính lại và phần tính lại đã gồm
+    thay đổi đó. Các UPDATE cộng dồn không ghi đè lẫn nhau.
+    """
+    changes = {field: F(field) + delta for field, delta in deltas.items() if delta}
+    changes['updated_at'] = timezone.now()
+    try:
+        with transaction.atomic():
+            updated = DailyDeskStats.objects.filter(desk_id=desk_id, day=day).update(**changes)
+    except IntegrityError:
+        updated = 0
+    if not updated:
+        _recompute(desk_id, location_id, day)
+
+
+def refresh_distribution(desk_id, day):
+    """Tính lại min/max/phân vị thời gian chờ và phục vụ của một bàn trong một ngày"""
+    aggregates = {
+        field: expression for field, expression in daily_stats_aggregates().items()
+        if field in DISTRIBUTION_FIELDS
+    }
+    with immediate_atomic():
+        values = WalkInQueue.objects.filter(desk_id=desk_id, queue_date=day).aggregate(**aggregates)
+        DailyDeskStats.objects.filter(desk_id=desk_id, day=day).update(**values)
+
+
+def _seconds(end, start):
+    return (end - start).total_seconds()
+
+
+@receiver(queue_changing)
+def add_queue_change_to_rollup(sender, queue, event, status, previous_status=None, batch=False, **kwargs):
+    # Lô nhập (ingest.py) được cộng một lần cho cả lô
+    if batch or event not in ROLLUP_EVENTS:
+        return
+    deltas = {status: 1}
+    if previous_status:
+        deltas[previous_status] = -1
+    if event == 'enqueued':
+        deltas.update(total=1, priority=int(queue.is_priority))
+    elif event == 'started' and queue.started_at:
+        deltas.update(wait_count=1, wait_sum=_seconds(queue.started_at, queue.created_at))
+    elif event == 'completed' and queue.started_at and queue.completed_at:
+        deltas.update(service_count=1, service_sum=_seconds(queue.completed_at, queue.started_at))
+    add_to_desk_day(queue.desk_id, queue.location_id, queue.queue_date, **deltas)
+
+
+@receiver(queue_changed)
+def refresh_rollup_on_queue_change(sender, queue, event, batch=False, **kwargs):
+    if not batch and event in ('completed', 'cancelled'):
+        refresh_distribution(queue.desk_id, queue.queue_date)
+
+
+def _merge_rows(row, other):
+    """
+    Gộp hai dòng tổng hợp của cùng một bàn, cùng một ngày
+
+    Chỉ xảy ra khi một ngày đang được lưu trữ dở (một phần ở WalkInQueue,
+    một phần ở WalkInQueueArchive). Các phân vị lấy theo phần có nhiều dòng hơn.
+    """
+    for prefix in ('wait', 'service'):
+        larger = row if row[f'{prefix}_count'] >= other[f'{prefix}_count'] else other
+        for field in (f'{prefix}_p50', f'{prefix}_p90'):
+            row[field] = larger[field]
+        for field, pick in ((f'{prefix}_min', min), (f'{prefix}_max', max)):
+            values = [value for value in (row[field], other[field]) if value is not None]
+            row[field] = pick(values) if values else None
+    for field in ('total', 'waiting', 'in_progress', 'completed', 'cancelled', 'priority',
+                  'wait_count', 'wait_sum', 'service_count', 'service_sum'):
+        row[field] += other[field]
+    return row
+
+
+def rebuild_daily_stats(start, end, locations=None, days_per_batch=31):
+    """
+    Dựng lại DailyDeskStats cho các ngày trong [start, end]
+
+    Mỗi lô days_per_batch ngày dùng một truy vấn GROUP BY (bàn, ngày) trên
+    WalkInQueue và một trên WalkInQueueArchive (để ngày đã lưu trữ không bị
+    mất thống kê), rồi được thay thế trong một transaction. Trả về số dòng
+    tổng hợp đã ghi.
+    """
+    sources = [WalkInQueue.objects.all(), WalkInQueueArchive.objects.all()]
+    rollups = DailyDeskStats.objects.all()
+    if locations is not None:
+        sources = [queryset.filter(location__in=locations) for queryset in sources]
+        rollups = rollups.filter(location__in=locations)
+
+    written = 0
+    batch_start = start
+    while batch_start <= end:
+        batch_end = min(batch_start + timedelta(days=days_per_batch - 1), end)
+        grouped = {}
+        for queryset in sources:
+            rows = (
+                queryset.filter(queue_date__range=(batch_start, batch_end))
+                .values('location_id', 'desk_id', 'queue_date')
+                .annotate(**daily_stats_aggregates())
+                .order_by()
+            )
+            for row in rows:
+                key = (row['desk_id'], row['queue_date'])
+                grouped[key] = _merge_rows(grouped[key], row) if key in grouped else row
+        objects = [
+            DailyDeskStats(day=row.pop('queue_date'), **row)
+            for row in grouped.values()
+        ]
+        with immediate_atomic():
+            rollups.filter(day__range=(batch_start, batch_end)).delete()
+            DailyDeskStats.objects.bulk_create(objects, batch_size=1000)
+        written += len(objects)
+        batch_start = batch_end + timedelta(days=1)
+    return written
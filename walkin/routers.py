@@ -0,0 +1,68 @@
+# walkin/routers.py
+"""Định tuyến truy vấn đọc của các trang chỉ xem sang bản sao (replica)"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+_use_replica = ContextVar('walkin_use_replica', default=False)
+
+
+@contextmanager
+def read_from_replica():
+    """Trong khối này, truy vấn đọc dữ liệu hàng đợi đi tới replica"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def replica_view(view_func):
+    """Decorator cho view chỉ đọc: đọc dữ liệu hàng đợi từ replica"""
+    if asyncio.iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            with read_from_replica():
+                return await view_func(request, *args, **kwargs)
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        with read_from_replica():
+            return view_func(request, *args, **kwargs)
+    return wrapper
+
+
+class PrimaryReplicaRouter:
+    """
+    Ghi luôn vào 'default'; đọc từ WALKIN_DB_READ_REPLICA khi đang trong
+    một view chỉ đọc
+
+    Chỉ các model nghiệp vụ của app walkin được đọc từ replica. Người dùng,
+    session và các app khác luôn đọc từ primary để không bị đăng xuất vì
+    độ trễ sao chép.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = settings.WALKIN_DB_READ_REPLICA
+        if not replica or not _use_replica.get():
+            return None
+        if model._meta.app_label != 'walkin' or model._meta.label == settings.AUTH_USER_MODEL:
+            return None
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Primary và replica chứa cùng dữ liệu
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == settings.WALKIN_DB_READ_REPLICA:
+            return False
+        return None
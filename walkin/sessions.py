@@ -0,0 +1,32 @@
+# walkin/sessions.py
+"""Phiên đăng nhập trượt, chỉ ghi lại khi thời hạn đã dịch chuyển đáng kể"""
+
+import time
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+
+
+class SlidingSessionMiddleware(SessionMiddleware):
+    """
+    Thay thế SESSION_SAVE_EVERY_REQUEST = True
+
+    Thời hạn SESSION_COOKIE_AGE vẫn được gia hạn theo hoạt động của người
+    dùng, nhưng phiên chỉ được lưu lại (và cookie được gửi lại) khi lần lưu
+    trước đã cách quá WALKIN_SESSION_REFRESH_INTERVAL giây, thay vì một câu
+    UPDATE django_session cho mỗi trang.
+    """
+
+    # Khoá trong session lưu thời điểm ghi gần nhất (giây, kiểu epoch)
+    refreshed_key = '_walkin_refreshed_at'
+    clock = staticmethod(time.time)
+
+    def process_response(self, request, response):
+        session = getattr(request, 'session', None)
+        if session is not None and session.accessed and not session.is_empty():
+            now = int(self.clock())
+            interval = getattr(settings, 'WALKIN_SESSION_REFRESH_INTERVAL', 300)
+            last = session.get(self.refreshed_key, 0)
+            if session.modified or now - last >= interval:
+                session[self.refreshed_key] = now
+        return super().process_response(request, response)
@@ -0,0 +1,22 @@
+# walkin/signals.py
+"""Tín hiệu phát ra khi hàng đợi thay đổi trạng thái"""
+
+from django.dispatch import Signal
+
+
+# Gửi sau khi transaction được commit, với các tham số:
+#   queue: đối tượng WalkInQueue vừa thay đổi
+#   event: 'enqueued', 'called', 'started', 'completed' hoặc 'cancelled'
+#   status: trạng thái ngay sau thay đổi (queue.status có thể đã thay đổi
+#           tiếp trong cùng transaction)
+#   previous_status: trạng thái trước khi thay đổi (None với 'enqueued')
+#   batch: True nếu thay đổi thuộc một lô nhập cùng lúc (ingest.py); phần
+#          tổng hợp theo bàn và ngày được cộng một lần cho cả lô
+# Được gửi bằng send_robust(): lỗi của một receiver được ghi log và không
+# chặn các receiver còn lại.
+queue_changed = Signal()
+
+# Gửi ngay khi thay đổi được ghi, bên trong transaction của nó (trước
+# queue_changed), cùng các tham số. Dành cho receiver ghi vào cơ sở dữ liệu
+# những gì phải được commit hoặc rollback cùng dòng hàng đợi (rollups.py).
+queue_changing = Signal()
@@ -0,0 +1,183 @@
+# walkin/stats.py
+"""Thống kê hàng đợi theo bàn và theo địa điểm"""
+
+from django.db.models import Aggregate, Avg, Count, FilteredRelation, FloatField, Func, Max, Min, Q, Sum
+
+from .utils import today_window
+
+
+# Các số liệu được gắn vào mỗi bàn bởi annotate_desk_stats()
+DESK_STAT_FIELDS = ('waiting_count', 'serving_count', 'completed_count', 'today_total')
+
+
+def annotate_desk_stats(desks, location=None):
+    """
+    Gắn số liệu hôm nay vào từng bàn bằng một truy vấn duy nhất
+
+    Điều kiện ngày (theo múi giờ của `location`) nằm trong mệnh đề JOIN nên
+    chỉ các dòng hàng đợi của ngày đó được gom nhóm, các đếm theo trạng thái
+    dùng COUNT có điều kiện.
+    """
+    start, end = today_window(location)
+    return desks.annotate(
+        today_queues=FilteredRelation(
+            'queues',
+            condition=Q(queues__created_at__gte=start, queues__created_at__lt=end),
+        ),
+    ).annotate(
+        waiting_count=Count('today_queues', filter=Q(today_queues__status='waiting')),
+        serving_count=Count('today_queues', filter=Q(today_queues__status='in_progress')),
+        completed_count=Count('today_queues', filter=Q(today_queues__status='completed')),
+        today_total=Count('today_queues'),
+    )
+
+
+def location_totals(desks, location_id):
+    """
+    Cộng dồn số liệu của các bàn thuộc một địa điểm
+
+    `desks` phải là queryset đã qua annotate_desk_stats(); kết quả được lấy
+    từ bộ nhớ đệm của queryset nên không phát sinh thêm truy vấn.
+    """
+    totals = dict.fromkeys(DESK_STAT_FIELDS, 0)
+    if location_id is None:
+        return totals
+    for desk in desks:
+        if desk.location_id != location_id:
+            continue
+        for field in DESK_STAT_FIELDS:
+            totals[field] += getattr(desk, field)
+    return totals
+
+
+class DurationSeconds(Func):
+    """Số giây từ `start` tới `end`, NULL nếu một trong hai là NULL"""
+    arity = 2
+    output_field = FloatField()
+
+    def __init__(self, end, start, **extra):
+        super().__init__(end, start, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='((julianday(%(expressions)s)) * 86400.0)',
+            arg_joiner=') - julianday(',
+            **extra_context
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template='EXTRACT(EPOCH FROM (%(expressions)s))',
+            arg_joiner=' - ',
+            **extra_context
+        )
+
+
+def percentile(values, fraction):
+    """
+    Phân vị nội suy tuyến tính của một dãy số, fraction trong [0, 1]
+
+    Cùng cách tính với Percentile (PERCENTILE_CONT); hàm walkin_percentile
+    của backend SQLite cũng dùng hàm này. Dãy rỗng cho 0.0.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class Percentile(Aggregate):
+    """
+    Phân vị liên tục (nội suy tuyến tính) của một biểu thức
+
+    PostgreSQL dùng PERCENTILE_CONT, SQLite dùng hàm walkin_percentile do
+    backend walkin.backends.sqlite3 đăng ký.
+    """
+    name = 'Percentile'
+    output_field = FloatField()
+
+    def __init__(self, expression, fraction, **extra):
+        self.fraction = float(fraction)
+        super().__init__(expression, **extra)
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template=f'walkin_percentile(%(expressions)s, {self.fraction!r})',
+            **extra_context
+        )
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection,
+            template=f'PERCENTILE_CONT({self.fraction!r}) WITHIN GROUP (ORDER BY %(expressions)s)',
+            **extra_context
+        )
+
+
+def queue_time_metrics(queues):
+    """
+    Số lượng theo trạng thái cùng trung bình, trung vị (p50) và p90 của
+    thời gian chờ (created_at -> started_at) và thời gian phục vụ
+    (started_at -> completed_at), tính bằng giây, trong một truy vấn
+
+    Giá trị thời gian là None khi chưa có khách nào đủ dữ liệu.
+    """
+    wait = DurationSeconds('started_at', 'created_at')
+    service = DurationSeconds('completed_at', 'started_at')
+    return queues.aggregate(
+        total=Count('id'),
+        waiting=Count('id', filter=Q(status='waiting')),
+        in_progress=Count('id', filter=Q(status='in_progress')),
+        completed=Count('id', filter=Q(status='completed')),
+        cancelled=Count('id', filter=Q(status='cancelled')),
+        avg_wait=Avg(wait),
+        p50_wait=Percentile(wait, 0.5),
+        p90_wait=Percentile(wait, 0.9),
+        avg_service=Avg(service),
+        p50_service=Percentile(service, 0.5),
+        p90_service=Percentile(service, 0.9),
+    )
+
+
+def daily_stats_aggregates():
+    """
+    Các biểu thức tổng hợp cho DailyDeskStats, tên khoá trùng tên trường
+
+    Dùng được cả với aggregate() (một bàn, một ngày) lẫn annotate() sau
+    values('desk_id', 'queue_date') khi dựng lại nhiều ngày một lúc.
+    """
+    wait = DurationSeconds('started_at', 'created_at')
+    service = DurationSeconds('completed_at', 'started_at')
+    has_wait = Q(started_at__isnull=False)
+    has_service = Q(started_at__isnull=False, completed_at__isnull=False)
+    return {
+        'total': Count('id'),
+        'waiting': Count('id', filter=Q(status='waiting')),
+        'in_progress': Count('id', filter=Q(status='in_progress')),
+        'completed': Count('id', filter=Q(status='completed')),
+        'cancelled': Count('id', filter=Q(status='cancelled')),
+        'priority': Count('id', filter=Q(is_priority=True)),
+        'wait_count': Count('id', filter=has_wait),
+        'wait_sum': Sum(wait, default=0.0),
+        'wait_min': Min(wait),
+        'wait_max': Max(wait),
+        'wait_p50': Percentile(wait, 0.5),
+        'wait_p90': Percentile(wait, 0.9),
+        'service_count': Count('id', filter=has_service),
+        'service_sum': Sum(service, default=0.0),
+        'service_min': Min(service),
+        'service_max': Max(service),
+        'service_p50': Percentile(service, 0.5),
+        'service_p90': Percentile(service, 0.9),
+    }
+
+
+def minutes(seconds):
+    """Đổi số giây (có thể là None) sang số phút nguyên để hiển thị"""
+    return int(round(seconds) // 60) if seconds else 0
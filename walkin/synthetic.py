@@ -0,0 +1,195 @@
+# walkin/synthetic.py
+"""
+Sinh dữ liệu giả lập cho benchmark và kiểm thử với lịch sử lớn
+
+Kết quả chỉ phụ thuộc vào seed và các tham số: mỗi bàn trong mỗi ngày dùng
+một bộ sinh số ngẫu nhiên riêng, nên cùng tham số luôn cho cùng dữ liệu.
+
+Các dòng được ghi theo lô bằng một câu INSERT dựng sẵn (executemany) thay vì
+khởi tạo model và bulk_create: với hàng chục triệu dòng, phần biên dịch SQL
+cho từng giá trị của ORM chiếm phần lớn thời gian.
+"""
+
+import heapq
+import random
+from datetime import datetime, time, timedelta
+from types import SimpleNamespace
+
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from .models import Location, Desk, WalkInQueue
+from .utils import location_timezone
+
+SERVICE_TYPES = ['Hộ tịch', 'Đất đai', 'Kinh doanh', 'Cư trú', 'Chứng thực']
+FIRST_NAMES = ['An', 'Bình', 'Chi', 'Dũng', 'Hà', 'Hùng', 'Lan', 'Minh', 'Nam', 'Thảo']
+LAST_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Võ', 'Đặng', 'Bùi']
+
+OPENING = time(8, 0)
+CLOSING = time(17, 0)
+
+PRIORITY_RATE = 0.08
+CANCEL_RATE = 0.05
+MEAN_SERVICE = 8 * 60  # giây
+
+
+def create_locations(count, desks_per_location, prefix='Synthetic'):
+    """Tạo các địa điểm và bàn phục vụ"""
+    locations = []
+    for index in range(1, count + 1):
+        location = Location.objects.create(
+            name=f'{prefix} {index}', address=f'{index} Lê Lợi', state='HCM',
+        )
+        Desk.objects.bulk_create([
+            Desk(
+                location=location,
+                desk_number=f'Bàn {number}',
+                desk_name=f'Bàn số {number}',
+                service_type=SERVICE_TYPES[(number - 1) % len(SERVICE_TYPES)],
+            )
+            for number in range(1, desks_per_location + 1)
+        ])
+        locations.append(location)
+    return locations
+
+
+def desk_day(desk, day, per_day, seed, now=None, priority_rate=PRIORITY_RATE, cancel_rate=CANCEL_RATE):
+    """
+    Các lượt khách của một bàn trong một ngày (chưa lưu), mỗi lượt có các
+    thuộc tính theo attname của WalkInQueue
+
+    Khách đến ngẫu nhiên trong giờ làm việc và được phục vụ lần lượt, khách
+    ưu tiên được gọi trước. Với ngày hôm nay, các mốc thời gian sau `now`
+    chưa xảy ra nên khách tương ứng còn đang chờ hoặc đang được phục vụ.
+    """
+    rng = random.Random(f'{seed}:{desk.location.name}:{desk.desk_number}:{day.isoformat()}')
+    tz = location_timezone(desk.location)
+    opening = datetime.combine(day, OPENING, tzinfo=tz)
+    span = (datetime.combine(day, CLOSING, tzinfo=tz) - opening).total_seconds()
+    count = rng.randint(int(per_day * 0.7), int(per_day * 1.3))
+    arrivals = sorted(opening + timedelta(seconds=rng.uniform(0, span)) for _ in range(count))
+
+    queues = []
+    for number, created_at in enumerate(arrivals, start=1):
+        queues.append(SimpleNamespace(
+            location_id=desk.location_id,
+            desk_id=desk.id,
+            queue_date=day,
+            queue_number=WalkInQueue.make_queue_number(desk, number),
+            customer_name=f'{rng.choice(LAST_NAMES)} {rng.choice(FIRST_NAMES)}',
+            customer_phone=f'09{rng.randrange(10 ** 8):08d}',
+            service_type=desk.service_type,
+            is_priority=rng.random() < priority_rate,
+            status='waiting',
+            created_at=created_at,
+            called_at=None,
+            started_at=None,
+            completed_at=None,
+        ))
+
+    # Mô phỏng một nhân viên phục vụ: ưu tiên trước, sau đó theo giờ đến
+    free_at = opening
+    ready = []
+    arrived = 0
+    for _ in range(len(queues)):
+        if not ready:
+            # Không còn ai chờ: nhân viên rảnh tới khi khách tiếp theo đến
+            free_at = max(free_at, queues[arrived].created_at)
+        while arrived < len(queues) and queues[arrived].created_at <= free_at:
+            queue = queues[arrived]
+            heapq.heappush(ready, (not queue.is_priority, queue.created_at, arrived))
+            arrived += 1
+        queue = queues[heapq.heappop(ready)[2]]
+        if rng.random() < cancel_rate:
+            queue.status = 'cancelled'
+            continue
+        called_at = free_at
+        started_at = called_at + timedelta(seconds=rng.uniform(10, 90))
+        completed_at = started_at + timedelta(seconds=rng.lognormvariate(0, 0.5) * MEAN_SERVICE)
+        free_at = completed_at
+        if now is not None and called_at > now:
+            continue
+        queue.called_at = called_at
+        if now is not None and started_at > now:
+            continue
+        queue.status = 'in_progress'
+        queue.started_at = started_at
+        if now is not None and completed_at > now:
+            continue
+        queue.status = 'completed'
+        queue.completed_at = completed_at
+
+    if now is not None:
+        queues = [queue for queue in queues if queue.created_at <= now]
+    return queues
+
+
+class RowWriter:
+    """Ghi các lượt khách vào bảng WalkInQueue bằng executemany"""
+
+    def __init__(self):
+        fields = [field for field in WalkInQueue._meta.concrete_fields if not field.primary_key]
+        table = connection.ops.quote_name(WalkInQueue._meta.db_table)
+        columns = ', '.join(connection.ops.quote_name(field.column) for field in fields)
+        placeholders = ', '.join(['%s'] * len(fields))
+        self.sql = f'INSERT INTO {table} ({columns}) VALUES ({placeholders})'
+        self.fields = [(field.attname, field.get_default(), self._adapter(field)) for field in fields]
+
+    @staticmethod
+    def _adapter(field):
+        if isinstance(field, models.DateTimeField):
+            return connection.ops.adapt_datetimefield_value
+        if isinstance(field, models.DateField):
+            return connection.ops.adapt_datefield_value
+        return None
+
+    def params(self, row):
+        values = []
+        for attname, default, adapt in self.fields:
+            value = getattr(row, attname, default)
+            values.append(adapt(value) if adapt is not None and value is not None else value)
+        return values
+
+    def write(self, rows):
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(self.sql, [self.params(row) for row in rows])
+
+
+def generate(locations=2, desks=4, days=30, per_day=40, seed=0, chunk_size=10000, now=None,
+             prefix='Synthetic', priority_rate=PRIORITY_RATE, cancel_rate=CANCEL_RATE, progress=None):
+    """
+    Tạo địa điểm, bàn và `days` ngày lịch sử hàng đợi tính đến hôm nay
+
+    Mỗi lô chunk_size dòng được ghi trong một transaction riêng,
+    progress(created) được gọi sau mỗi lô. Trả về số dòng đã tạo.
+    """
+    now = now or timezone.now()
+    writer = RowWriter()
+    created = 0
+    batch = []
+
+    def flush():
+        nonlocal created
+        writer.write(batch)
+        created += len(batch)
+        batch.clear()
+        if progress is not None:
+            progress(created)
+
+    for location in create_locations(locations, desks, prefix):
+        location_desks = list(location.desks.select_related('location'))
+        today = timezone.localdate(now, timezone=location_timezone(location))
+        for offset in range(days - 1, -1, -1):
+            day = today - timedelta(days=offset)
+            for desk in location_desks:
+                batch.extend(desk_day(
+                    desk, day, per_day, seed,
+                    now=now if offset == 0 else None,
+                    priority_rate=priority_rate,
+                    cancel_rate=cancel_rate,
+                ))
+                if len(batch) >= chunk_size:
+                    flush()
+    if batch:
+        flush()
+    return created
@@ -1,3 +1,1569 @@
-from django.test import TestCase
+import asyncio
+import codecs
+import io
+import itertools
+import json
+import re
+import sys
+import tempfile
+import threading
+import zipfile
+from io import StringIO
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import F
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .backends.sqlite3.base import DatabaseWrapper
+from .db import immediate_atomic
+from .eta import ServiceTimes, ewma_update, record_service, schedule
+from .events import InProcessBroker, get_broker, desk_channel
+from .instrumentation import QueryInstrumentationMiddleware, registry
+from .access import get_access, locations
+from .archive import archive_batch, archive_horizon, archive_queues
+from .assignment import choose_desk
+from .cache import bump_version, get_version
+from .metrics import render_metrics
+from .models import Location, User, Desk, WalkInQueue, WalkInQueueArchive, QueueCounter, DailyDeskStats
+from .parallel import run_parallel
+from .rollups import rebuild_daily_stats, refresh_desk_day
+from .routers import read_from_replica
+from .sessions import SlidingSessionMiddleware
+from .stats import queue_time_metrics
+from .synthetic import desk_day, generate
+from .signals import queue_changed
+from .utils import day_window, local_today, today_window
+from .waitlist import DeskWaitlist, registry as waitlists
+
+
+def clear_caches():
+    """Xoá cache chính và cache bộ đếm (phiên bản, /metrics, ETA)"""
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+class WalkInTestMixin:
+    """Dữ liệu dùng chung cho các test"""
+    numbers = itertools.count(1)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.location = Location.objects.create(name='Trung Tâm A', address='1 Lê Lợi', state='HCM')
+        cls.admin = User.objects.create_user('clerk', password='pw', location=cls.location, role='admin')
+
+    @classmethod
+    def make_desk(cls, number, location=None):
+        return Desk.objects.create(
+            location=location or cls.location,
+            desk_number=f'Bàn {number}',
+            desk_name=f'Bàn số {number}',
+            service_type='Hộ tịch',
+        )
+
+    @classmethod
+    def make_queue(cls, desk, status='waiting', **kwargs):
+        return WalkInQueue.objects.create(
+            location=desk.location,
+            desk=desk,
+            queue_number=kwargs.pop('queue_number', f'{next(cls.numbers):03d}'),
+            customer_name=kwargs.pop('customer_name', 'Nguyễn Văn A'),
+            service_type=kwargs.pop('service_type', 'Hộ tịch'),
+            status=status,
+            **kwargs
+        )
+
+
+class DashboardStatsTests(WalkInTestMixin, TestCase):
+
+    def count_dashboard_queries(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        return response, len(ctx.captured_queries)
+
+    def test_counters(self):
+        desk_1 = self.make_desk(1)
+        desk_2 = self.make_desk(2)
+        for status in ['waiting', 'waiting', 'in_progress', 'completed']:
+            self.make_queue(desk_1, status)
+        self.make_queue(desk_2, 'cancelled')
+
+        response, _ = self.count_dashboard_queries()
+
+        desks = {desk.id: desk for desk in response.context['desks']}
+        self.assertEqual(desks[desk_1.id].waiting_count, 2)
+        self.assertEqual(desks[desk_1.id].serving_count, 1)
+        self.assertEqual(desks[desk_1.id].today_total, 4)
+        self.assertEqual(desks[desk_2.id].today_total, 1)
+        self.assertEqual(response.context['today_total'], 5)
+        self.assertEqual(response.context['waiting'], 2)
+        self.assertEqual(response.context['in_progress'], 1)
+        self.assertEqual(response.context['completed'], 1)
+
+    def test_query_count_does_not_grow_with_desks(self):
+        desk = self.make_desk(1)
+        self.make_queue(desk)
+        self.count_dashboard_queries()  # lần đầu có thêm truy vấn ghi session
+        _, baseline = self.count_dashboard_queries()
+
+        for number in range(2, 21):
+            self.make_queue(self.make_desk(number), 'in_progress')
+        _, with_many_desks = self.count_dashboard_queries()
+
+        self.assertEqual(with_many_desks, baseline)
+
+
+class TodayWindowTests(WalkInTestMixin, TestCase):
+
+    def test_day_window_uses_location_time_zone(self):
+        start, end = day_window(date(2025, 10, 5), self.location)
+        self.assertEqual(start.isoformat(), '2025-10-05T00:00:00+07:00')
+        self.assertEqual(end - start, timedelta(days=1))
+
+    def test_rows_before_local_midnight_are_excluded(self):
+        desk = self.make_desk(1)
+        start, _ = today_window(self.location)
+        yesterday = self.make_queue(desk)
+        today = self.make_queue(desk)
+        WalkInQueue.objects.filter(pk=yesterday.pk).update(created_at=start - timedelta(minutes=1))
+        WalkInQueue.objects.filter(pk=today.pk).update(created_at=start + timedelta(minutes=1))
+
+        self.assertEqual(desk.get_waiting_count(), 1)
+        self.assertEqual(desk.get_today_total(), 1)
+
+
+class QueueNumberTests(WalkInTestMixin, TestCase):
+
+    def test_numbers_are_sequential_per_desk(self):
+        desk_1 = self.make_desk(1)
+        desk_2 = self.make_desk(2)
+        numbers = [
+            WalkInQueue.enqueue(desk, customer_name='A', service_type='Hộ tịch').queue_number
+            for desk in [desk_1, desk_1, desk_2, desk_1]
+        ]
+        self.assertEqual(numbers, ['1001', '1002', '2001', '1003'])
+
+    def test_counter_continues_after_existing_rows(self):
+        desk = self.make_desk(1)
+        self.make_queue(desk, queue_number='1001')
+        self.make_queue(desk, queue_number='1002')
+
+        queue = WalkInQueue.enqueue(desk, customer_name='A', service_type='Hộ tịch')
+
+        self.assertEqual(queue.queue_number, '1003')
+        self.assertEqual(QueueCounter.objects.get(desk=desk).last_number, 3)
+
+    def test_add_to_queue_view(self):
+        desk = self.make_desk(1)
+        self.client.force_login(self.admin)
+        url = reverse('add_to_queue', args=[desk.id])
+        for name in ['A', 'B']:
+            self.client.post(url, {'customer_name': name, 'service_type': 'Hộ tịch'})
+
+        self.assertQuerysetEqual(
+            desk.queues.order_by('queue_number').values_list('queue_number', flat=True),
+            ['1001', '1002'],
+        )
+
+
+class ConcurrentEnqueueTests(TransactionTestCase):
+
+    def test_parallel_enqueues_get_distinct_numbers(self):
+        location = Location.objects.create(name='Trung Tâm B', address='2 Lê Lợi', state='HCM')
+        desk = Desk.objects.create(location=location, desk_number='Bàn 1', desk_name='Bàn số 1', service_type='Hộ tịch')
+        threads, per_thread = 8, 10
+        errors = []
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(per_thread):
+                    WalkInQueue.enqueue(desk, customer_name='A', service_type='Hộ tịch')
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        numbers = list(desk.queues.values_list('queue_number', flat=True))
+        self.assertEqual(len(numbers), threads * per_thread)
+        self.assertEqual(len(set(numbers)), threads * per_thread)
+        self.assertEqual(QueueCounter.objects.get(desk=desk).last_number, threads * per_thread)
+
+
+class QueueEventTests(WalkInTestMixin, TestCase):
+
+    def setUp(self):
+        self.events = []
+        self.previous = []
+
+        def receiver(sender, queue, event, previous_status=None, **kwargs):
+            self.events.append(event)
+            self.previous.append(previous_status)
+
+        queue_changed.connect(receiver, weak=False, dispatch_uid='test-events')
+        self.addCleanup(queue_changed.disconnect, dispatch_uid='test-events')
+
+    def test_transitions_send_events_on_commit(self):
+        desk = self.make_desk(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            queue = WalkInQueue.enqueue(desk, customer_name='A', service_type='Hộ tịch')
+            queue.call()
+            queue.start_serving(self.admin)
+            queue.complete()
+        self.assertEqual(self.events, ['enqueued', 'called', 'started', 'completed'])
+
+    def test_claim_sends_one_event(self):
+        queue = self.make_queue(self.make_desk(1))
+        with self.captureOnCommitCallbacks(execute=True):
+            WalkInQueue.claim(queue.id, self.admin)
+        self.assertEqual((self.events, self.previous), (['started'], ['waiting']))
+
+    def test_events_are_not_sent_before_commit(self):
+        desk = self.make_desk(1)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.make_queue(desk).cancel()
+        self.assertEqual(self.events, [])
+        self.assertEqual(len(callbacks), 1)
+
+    def test_failing_receiver_is_logged_and_others_still_run(self):
+        def failing(sender, **kwargs):
+            raise RuntimeError('broker down')
+
+        queue_changed.connect(failing, weak=False, dispatch_uid='test-failing')
+        self.addCleanup(queue_changed.disconnect, dispatch_uid='test-failing')
+        queue = self.make_queue(self.make_desk(1))
+        with self.assertLogs('walkin.models', 'ERROR') as logs:
+            with self.captureOnCommitCallbacks(execute=True):
+                queue.cancel()
+        self.assertIn('broker down', logs.output[0])
+        self.assertEqual(self.events, ['cancelled'])
+
+    async def test_broker_delivers_across_threads(self):
+        broker = InProcessBroker()
+        subscription = broker.subscribe('desk:1')
+        await asyncio.to_thread(broker.publish, 'desk:1', {'event': 'called'})
+        await asyncio.to_thread(broker.publish, 'desk:2', {'event': 'other'})
+        self.assertEqual(await subscription.get(timeout=1), {'event': 'called'})
+        self.assertIsNone(await subscription.get(timeout=0.01))
+        await subscription.close()
+
+    async def test_desk_stream(self):
+        desk = await sync_to_async(self.make_desk)(1)
+        await sync_to_async(self.async_client.force_login)(self.admin)
+        response = await self.async_client.get(reverse('desk_events', args=[desk.id]))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = response.streaming_content
+        self.assertEqual(await stream.__anext__(), b'retry: 3000\n\n')
+        pending = asyncio.ensure_future(stream.__anext__())
+        await asyncio.sleep(0)
+        get_broker().publish(desk_channel(desk.id), {'event': 'called'})
+        chunk = await asyncio.wait_for(pending, 1)
+        self.assertEqual(json.loads(chunk.decode()[len('data: '):]), {'event': 'called'})
+        await stream.aclose()
+
+    def test_stream_requires_access(self):
+        other = Location.objects.create(name='Trung Tâm B', address='2 Lê Lợi', state='HCM')
+        desk = self.make_desk(1, location=other)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('desk_events', args=[desk.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+class DeskDetailTests(WalkInTestMixin, TestCase):
+
+    def test_page_lists_queues(self):
+        desk = self.make_desk(1)
+        self.make_queue(desk, queue_number='1001')
+        self.make_queue(desk, 'in_progress', queue_number='1002')
+        self.client.force_login(self.admin)
+
+        response = self.client.get(reverse('desk_detail', args=[desk.id]))
+
+        self.assertContains(response, '1001')
+        self.assertContains(response, '1002')
+        self.assertContains(response, reverse('desk_events', args=[desk.id]))
+
+
+class DisplayBoardTests(WalkInTestMixin, TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.desk = self.make_desk(1)
+        self.serving = self.make_queue(self.desk, 'in_progress', queue_number='1001')
+        self.waiting = self.make_queue(self.desk, queue_number='1002')
+        self.url = reverse('display_board_data', args=[self.location.id])
+
+    def test_board_is_public_and_hides_customer_names(self):
+        response = self.client.get(reverse('display_board', args=[self.location.id]))
+        self.assertContains(response, '1001')
+        self.assertNotContains(response, 'Nguyễn Văn A')
+
+        desk = self.client.get(self.url).json()['desks'][0]
+        self.assertEqual(desk['serving'], '1001')
+        self.assertEqual(desk['next'], ['1002'])
+
+    def test_cached_board_needs_no_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_transition_invalidates_board(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.serving.complete()
+        desk = self.client.get(self.url).json()['desks'][0]
+        self.assertIsNone(desk['serving'])
+
+
+    def test_desk_change_invalidates_board_after_commit(self):
+        version = get_version('location', self.location.id)
+        self.desk.desk_name = 'Bàn hồ sơ'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.desk.save()
+            self.assertEqual(get_version('location', self.location.id), version)
+        self.assertGreater(get_version('location', self.location.id), version)
+
+class SlidingSessionTests(WalkInTestMixin, TestCase):
+
+    def session_writes(self, requests):
+        def wrapper(execute, sql, params, many, context):
+            if '"django_session"' in sql and sql.startswith(('INSERT', 'UPDATE')):
+                writes.append(sql)
+            return execute(sql, params, many, context)
+
+        writes = []
+        with connection.execute_wrapper(wrapper):
+            for _ in range(requests):
+                self.client.get(reverse('dashboard'))
+        return len(writes)
+
+    def test_session_is_written_once_per_interval(self):
+        clock = mock.Mock(return_value=1_000_000)
+        with mock.patch.object(SlidingSessionMiddleware, 'clock', clock):
+            self.client.login(username='clerk', password='pw')
+            self.assertEqual(self.session_writes(10), 1)
+
+            clock.return_value += 200
+            self.assertEqual(self.session_writes(10), 0)
+
+            clock.return_value += 301
+            self.assertEqual(self.session_writes(10), 1)
+
+    def test_refresh_extends_cookie(self):
+        clock = mock.Mock(return_value=1_000_000)
+        with mock.patch.object(SlidingSessionMiddleware, 'clock', clock):
+            self.client.login(username='clerk', password='pw')
+            clock.return_value += 301
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.cookies['sessionid']['max-age'], 28800)
+
+
+class SQLiteProfileTests(TransactionTestCase):
+
+    def test_pragmas_run_on_new_connections(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = dict(connection.settings_dict, NAME=f'{directory}/db.sqlite3', OPTIONS={
+                'pragmas': {'journal_mode': 'WAL', 'busy_timeout': 1234},
+            })
+            wrapper = DatabaseWrapper(settings_dict, alias='pragma-test')
+            try:
+                with wrapper.cursor() as cursor:
+                    cursor.execute('PRAGMA journal_mode')
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute('PRAGMA busy_timeout')
+                    self.assertEqual(cursor.fetchone()[0], 1234)
+            finally:
+                wrapper.close()
+
+    def test_immediate_atomic_begins_immediate_transaction(self):
+        statements = []
+
+        def wrapper(execute, sql, params, many, context):
+            statements.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(wrapper):
+            with immediate_atomic():
+                Location.objects.create(name='Trung Tâm C', address='3 Lê Lợi', state='HCM')
+            with immediate_atomic():
+                with immediate_atomic():
+                    pass
+
+        self.assertEqual(statements[0], 'BEGIN IMMEDIATE')
+        self.assertEqual(statements.count('BEGIN IMMEDIATE'), 2)
+        self.assertNotIn('BEGIN', statements)
+
+
+# Truy vấn chạy trên thread của request để CaptureQueriesContext ghi lại được
+@override_settings(WALKIN_DB_READ_REPLICA='replica', WALKIN_PARALLEL_QUERY_THREADS=0)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Hai alias SQLite trỏ tới cùng một file đóng vai primary và replica"""
+
+    def setUp(self):
+        connections.settings['replica'] = dict(connections['default'].settings_dict)
+        self.addCleanup(self.remove_replica)
+        self.location = Location.objects.create(name='Trung Tâm A', address='1 Lê Lợi', state='HCM')
+        self.admin = User.objects.create_user('clerk', password='pw', location=self.location, role='admin')
+        self.desk = Desk.objects.create(location=self.location, desk_number='Bàn 1', desk_name='Bàn 1', service_type='-')
+        self.client.force_login(self.admin)
+
+    def remove_replica(self):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    def capture(self, method, url, data=None):
+        with CaptureQueriesContext(connections['default']) as primary:
+            with CaptureQueriesContext(connections['replica']) as replica:
+                getattr(self.client, method)(url, data)
+        tables = lambda ctx: ' '.join(query['sql'] for query in ctx.captured_queries)
+        return tables(primary), tables(replica)
+
+    def test_read_only_views_read_from_replica(self):
+        for url in [reverse('dashboard'), reverse('desk_detail', args=[self.desk.id]), reverse('desk_management')]:
+            primary, replica = self.capture('get', url)
+            self.assertIn('"walkin_desk"', replica)
+            self.assertNotIn('"walkin_desk"', primary)
+            # Người dùng và session luôn đọc từ primary
+            self.assertIn('"walkin_user"', primary)
+            self.assertNotIn('"walkin_user"', replica)
+
+    def test_waitlist_is_built_from_primary(self):
+        WalkInQueue.enqueue(self.desk, customer_name='A', service_type='-')
+        waitlists.invalidate(self.desk.id)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            with read_from_replica():
+                self.assertEqual(len(waitlists.get(self.desk)), 1)
+        self.assertNotIn('"walkin_walkinqueue"', ' '.join(query['sql'] for query in replica.captured_queries))
+
+    def test_mutations_stay_on_primary(self):
+        primary, replica = self.capture('post', reverse('add_to_queue', args=[self.desk.id]), {
+            'customer_name': 'A', 'service_type': '-',
+        })
+        self.assertIn('INSERT INTO "walkin_walkinqueue"', primary)
+        self.assertEqual(replica, '')
+
+
+class QueueTimeMetricsTests(WalkInTestMixin, TestCase):
+
+    def make_served(self, desk, wait, service=None):
+        created = timezone.now() - timedelta(hours=1)
+        started = created + timedelta(seconds=wait)
+        completed = started + timedelta(seconds=service) if service is not None else None
+        queue = self.make_queue(desk, 'completed' if completed else 'in_progress')
+        WalkInQueue.objects.filter(pk=queue.pk).update(
+            created_at=created, started_at=started, completed_at=completed,
+        )
+
+    def test_averages_and_percentiles(self):
+        desk = self.make_desk(1)
+        for wait, service in [(60, 300), (120, 600), (180, 900), (240, 1200), (300, None)]:
+            self.make_served(desk, wait, service)
+        self.make_queue(desk)
+
+        metrics = queue_time_metrics(desk.queues.all())
+
+        self.assertEqual(metrics['total'], 6)
+        self.assertEqual(metrics['completed'], 4)
+        self.assertEqual(metrics['waiting'], 1)
+        self.assertAlmostEqual(metrics['avg_wait'], 180, places=1)
+        self.assertAlmostEqual(metrics['p50_wait'], 180, places=1)
+        self.assertAlmostEqual(metrics['p90_wait'], 276, places=1)
+        self.assertAlmostEqual(metrics['avg_service'], 750, places=1)
+        self.assertAlmostEqual(metrics['p50_service'], 750, places=1)
+
+    def test_empty(self):
+        metrics = queue_time_metrics(WalkInQueue.objects.none())
+        self.assertIsNone(metrics['avg_service'])
+
+    def test_desk_detail_queries_do_not_grow_with_completions(self):
+        desk = self.make_desk(1)
+        self.client.force_login(self.admin)
+        url = reverse('desk_detail', args=[desk.id])
+        self.client.get(url)
+        self.make_served(desk, 60, 300)
+        with CaptureQueriesContext(connection) as few:
+            response = self.client.get(url)
+        self.assertEqual(response.context['avg_service_time'], 5)
+
+        for _ in range(30):
+            self.make_served(desk, 60, 300)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(url)
+        self.assertEqual(len(many), len(few))
+
+
+@override_settings(
+    WALKIN_INSTRUMENTATION=True,
+    MIDDLEWARE=['walkin.instrumentation.QueryInstrumentationMiddleware'] + settings.MIDDLEWARE,
+    TEMPLATES=[dict(settings.TEMPLATES[0], BACKEND='walkin.instrumentation.InstrumentedDjangoTemplates')],
+)
+class InstrumentationTests(WalkInTestMixin, TestCase):
+
+    def setUp(self):
+        registry.reset()
+        self.client.force_login(self.admin)
+
+    def test_headers(self):
+        self.make_queue(self.make_desk(1))
+        response = self.client.get(reverse('dashboard'))
+        self.assertGreater(int(response['X-Query-Count']), 0)
+        self.assertEqual(response['X-Duplicate-Queries'], '0')
+        timing = response['Server-Timing']
+        self.assertIn('sql;dur=', timing)
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_rolling_percentiles_per_url_name(self):
+        desk = self.make_desk(1)
+        for _ in range(3):
+            self.client.get(reverse('desk_detail', args=[desk.id]))
+
+        data = self.client.get(reverse('perf_stats')).json()
+        self.assertTrue(data['enabled'])
+        stats = data['views']['desk_detail']
+        self.assertEqual(stats['count'], 3)
+        self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+        self.assertGreater(stats['avg_template_ms'], 0)
+
+    def test_duplicate_queries(self):
+        desk = self.make_desk(1)
+
+        def n_plus_one(request):
+            for _ in range(3):
+                Desk.objects.filter(pk=desk.pk).first()
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        request.resolver_match = None
+        response = QueryInstrumentationMiddleware(n_plus_one)(request)
+        self.assertEqual(response['X-Query-Count'], '3')
+        self.assertEqual(response['X-Duplicate-Queries'], '2')
+
+    def test_admin_only(self):
+        user = User.objects.create_user('staff', password='pw', location=self.location)
+        self.client.force_login(user)
+        response = self.client.get(reverse('perf_stats'))
+        self.assertEqual(response.status_code, 302)
+
+
+class MetricsTests(WalkInTestMixin, TestCase):
+
+    def setUp(self):
+        clear_caches()
+
+    def scrape(self):
+        return {
+            line.rsplit(' ', 1)[0]: float(line.rsplit(' ', 1)[1])
+            for line in render_metrics().splitlines() if not line.startswith('#')
+        }
+
+    def test_depth_is_seeded_then_maintained_by_transitions(self):
+        desk = self.make_desk(1)
+        self.make_queue(desk)
+        self.make_queue(desk, 'in_progress')
+        depth = f'walkin_desk_queue_depth{{location="{self.location.id}",desk="{desk.id}",status="waiting"}}'
+        serving = f'walkin_location_queue_depth{{location="{self.location.id}",status="in_progress"}}'
+        self.assertEqual(self.scrape()[depth], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            queue = WalkInQueue.enqueue(desk, customer_name='A', service_type='Hộ tịch')
+        self.assertEqual(self.scrape()[depth], 2)
+
+        # Sau khi đã nạp, gauge không được đếm lại từ bảng
+        with CaptureQueriesContext(connection) as ctx:
+            self.scrape()
+        self.assertFalse(any('walkin_walkinqueue' in query['sql'] for query in ctx.captured_queries))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.call()
+            queue.start_serving(self.admin)
+        metrics = self.scrape()
+        self.assertEqual(metrics[depth], 1)
+        self.assertEqual(metrics[serving], 2)
+        self.assertEqual(metrics[f'walkin_queue_events_total{{location="{self.location.id}",event="started"}}'], 1)
+        self.assertEqual(metrics[f'walkin_queue_wait_seconds_count{{location="{self.location.id}"}}'], 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.complete()
+        self.assertEqual(self.scrape()[serving], 1)
+
+    def test_counters_survive_culling_of_the_main_cache(self):
+        desk = self.make_desk(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            WalkInQueue.enqueue(desk, customer_name='A', service_type='Hộ tịch')
+        enqueued = f'walkin_queue_events_total{{location="{self.location.id}",event="enqueued"}}'
+        self.assertEqual(self.scrape()[enqueued], 1)
+        version = get_version('desk', desk.id)
+
+        # Session, fragment và bảng hiển thị lấp đầy cache chính quá MAX_ENTRIES
+        for index in range(1000):
+            cache.set(f'filler:{index}', index)
+        self.assertIsNone(cache.get('filler:0'))
+        self.assertEqual(get_version('desk', desk.id), version)
+        self.assertEqual(self.scrape()[enqueued], 1)
+
+    def test_http_requests_and_latency(self):
+        self.client.force_login(self.admin)
+        self.client.get(reverse('dashboard'))
+        self.client.get(reverse('dashboard'))
+        metrics = self.scrape()
+        self.assertEqual(metrics['walkin_http_requests_total{view="dashboard",method="GET",code="2xx"}'], 2)
+        self.assertEqual(metrics['walkin_http_request_duration_seconds_count{view="dashboard"}'], 2)
+        self.assertEqual(metrics['walkin_http_request_duration_seconds_bucket{view="dashboard",le="+Inf"}'], 2)
+
+    @override_settings(WALKIN_METRICS_TOKEN='secret')
+    def test_token(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+
+class SyntheticDataTests(WalkInTestMixin, TestCase):
+
+    def test_desk_day_is_deterministic(self):
+        desk = self.make_desk(1)
+        day = date(2025, 3, 3)
+        first = desk_day(desk, day, 40, seed=1)
+        second = desk_day(desk, day, 40, seed=1)
+        self.assertEqual(
+            [(q.queue_number, q.created_at, q.started_at, q.status) for q in first],
+            [(q.queue_number, q.created_at, q.started_at, q.status) for q in second],
+        )
+        self.assertNotEqual(
+            [q.created_at for q in first], [q.created_at for q in desk_day(desk, day, 40, seed=2)],
+        )
+        for queue in first:
+            if queue.status == 'completed':
+                self.assertLessEqual(queue.created_at, queue.started_at)
+                self.assertLess(queue.started_at, queue.completed_at)
+
+    def test_generate_keeps_history_timestamps(self):
+        rows = generate(locations=1, desks=2, days=3, per_day=10, seed=0)
+        self.assertEqual(WalkInQueue.objects.count(), rows)
+        oldest = WalkInQueue.objects.select_related('location').order_by('created_at').first()
+        start, end = day_window(oldest.queue_date, oldest.location)
+        self.assertEqual(oldest.queue_date, local_today(oldest.location) - timedelta(days=2))
+        self.assertTrue(start <= oldest.created_at < end)
+
+    def test_generate_walkins_command(self):
+        out = StringIO()
+        call_command('generate_walkins', locations=2, desks=3, days=20, per_day=30, chunk_size=500, stdout=out)
+        self.assertEqual(Location.objects.filter(name__startswith='Synthetic ').count(), 2)
+        self.assertEqual(Desk.objects.filter(location__name__startswith='Synthetic ').count(), 6)
+        queues = WalkInQueue.objects.all()
+        self.assertTrue(queues.filter(is_priority=True).exists())
+        self.assertTrue(queues.filter(status='cancelled', started_at__isnull=True).exists())
+        completed = queues.filter(status='completed')
+        self.assertFalse(completed.filter(started_at__lt=F('called_at')).exists())
+        self.assertFalse(completed.filter(completed_at__lt=F('started_at')).exists())
+        self.assertIn(f'{queues.count():,}', out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command('generate_walkins', locations=1, desks=1, days=1, stdout=StringIO())
+
+
+class DailyRollupTests(WalkInTestMixin, TestCase):
+
+    def test_transitions_refresh_the_desk_day(self):
+        desk = self.make_desk(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = WalkInQueue.enqueue(desk, customer_name='A', service_type='Hộ tịch', is_priority=True)
+            second = WalkInQueue.enqueue(desk, customer_name='B', service_type='Hộ tịch')
+        stats = DailyDeskStats.objects.get(desk=desk, day=first.queue_date)
+        self.assertEqual((stats.total, stats.waiting, stats.priority), (2, 2, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.call()
+            first.start_serving(self.admin)
+            first.complete()
+            second.cancel()
+        stats.refresh_from_db()
+        self.assertEqual((stats.waiting, stats.completed, stats.cancelled), (0, 1, 1))
+        self.assertEqual(stats.location_id, self.location.id)
+        self.assertEqual(stats.wait_count, 1)
+        self.assertEqual(stats.service_count, 1)
+        self.assertIsNotNone(stats.service_p50)
+
+    def test_increments_match_a_full_recompute(self):
+        desk = self.make_desk(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            queues = [
+                WalkInQueue.enqueue(desk, customer_name=name, service_type='Hộ tịch', is_priority=name == 'C')
+                for name in 'ABCD'
+            ]
+        with self.captureOnCommitCallbacks(execute=True):
+            WalkInQueue.claim(queues[0].id, self.admin).complete()
+            queues[1].start_serving(self.admin)
+            queues[1].cancel()
+            queues[2].cancel()
+        stats = DailyDeskStats.objects.get(desk=desk)
+
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                queues[3].call()
+        self.assertFalse([query for query in ctx.captured_queries if 'walkin_dailydeskstats' in query['sql']])
+
+        recomputed = refresh_desk_day(desk, stats.day)
+        for field in ['total', 'waiting', 'in_progress', 'completed', 'cancelled', 'priority',
+                      'wait_count', 'service_count', 'wait_p50', 'service_max']:
+            self.assertEqual(getattr(stats, field), getattr(recomputed, field), field)
+        # julianday() của SQLite chỉ chính xác tới mili giây
+        self.assertAlmostEqual(stats.wait_sum, recomputed.wait_sum, delta=0.01)
+
+    def test_rows_out_of_step_are_recomputed(self):
+        desk = self.make_desk(1)
+        first = self.make_queue(desk)
+        self.make_queue(desk)
+        # Dòng thống kê chưa có (số được ghi không qua tín hiệu): tính lại cả ngày
+        with self.captureOnCommitCallbacks(execute=True):
+            first.cancel()
+        self.assertEqual(DailyDeskStats.objects.get(desk=desk).waiting, 1)
+
+        DailyDeskStats.objects.filter(desk=desk).update(waiting=0)
+        with self.captureOnCommitCallbacks(execute=True):
+            WalkInQueue.objects.get(status='waiting').cancel()
+        stats = DailyDeskStats.objects.get(desk=desk)
+        self.assertEqual((stats.waiting, stats.cancelled), (0, 2))
+
+    def test_rebuild_matches_incremental_refresh(self):
+        generate(locations=1, desks=2, days=5, per_day=15, seed=3)
+        today = local_today()
+        written = rebuild_daily_stats(today - timedelta(days=10), today, days_per_batch=2)
+        self.assertEqual(written, DailyDeskStats.objects.count())
+        self.assertEqual(
+            sum(DailyDeskStats.objects.values_list('total', flat=True)), WalkInQueue.objects.count(),
+        )
+
+        fields = ['total', 'completed', 'cancelled', 'priority', 'wait_count', 'service_count']
+        rebuilt = {
+            (row.desk_id, row.day): row for row in DailyDeskStats.objects.all()
+        }
+        for (desk_id, day), row in rebuilt.items():
+            refreshed = refresh_desk_day(Desk.objects.get(pk=desk_id), day)
+            for field in fields:
+                self.assertEqual(getattr(refreshed, field), getattr(row, field))
+            self.assertAlmostEqual(refreshed.wait_sum, row.wait_sum, places=3)
+            self.assertAlmostEqual(refreshed.service_max, row.service_max, places=3)
+
+    def test_rebuild_command(self):
+        desk = self.make_desk(1)
+        self.make_queue(desk)
+        self.make_queue(desk, 'completed')
+        call_command('rebuild_daily_stats', stdout=StringIO())
+        self.assertEqual(DailyDeskStats.objects.get(desk=desk).total, 2)
+
+
+class ReportTests(WalkInTestMixin, TestCase):
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_report_reads_rollups_within_accessible_locations(self):
+        desk = self.make_desk(1)
+        other = Location.objects.create(name='Trung Tâm B', address='2 Lê Lợi', state='HCM')
+        other_desk = self.make_desk(1, location=other)
+        for queue_desk in [desk, desk, other_desk]:
+            self.make_queue(queue_desk, 'completed')
+        today = local_today(self.location)
+        rebuild_daily_stats(today - timedelta(days=1), today)
+
+        response = self.client.get(reverse('reports'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['totals']['total'], 2)
+        self.assertEqual([row['desk_id'] for row in response.context['by_desk']], [desk.id])
+
+        response = self.client.get(reverse('reports'), {'location': other.id})
+        self.assertEqual(response.status_code, 404)
+
+    def test_csv_export_streams_rows(self):
+        desk = self.make_desk(1)
+        for _ in range(3):
+            self.make_queue(desk, customer_name='Nguyễn Văn Á')
+        response = self.client.get(reverse('export_report', args=['csv']))
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(codecs.BOM_UTF8))
+        lines = content.decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertIn('Nguyễn Văn Á', lines[1])
+        self.assertIn('Đang chờ', lines[1])
+
+    async def test_export_streams_asynchronously_under_asgi(self):
+        desk = await sync_to_async(self.make_desk)(1)
+        for _ in range(3):
+            await sync_to_async(self.make_queue)(desk, customer_name='Nguyễn Văn Á')
+        await sync_to_async(self.async_client.force_login)(self.admin)
+        with mock.patch('walkin.exports.ROWS_PER_CHUNK', 1):
+            response = await self.async_client.get(reverse('export_report', args=['csv']))
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(len(b''.join(chunks).decode('utf-8-sig').splitlines()), 4)
+
+    def test_xlsx_export_is_a_valid_workbook(self):
+        desk = self.make_desk(1)
+        self.make_queue(desk, customer_name='<Khách & Co>')
+        response = self.client.get(reverse('export_report', args=['xlsx']))
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 2)
+        self.assertIn('&lt;Khách &amp; Co&gt;', sheet)
+        self.assertEqual(self.client.get(reverse('export_report', args=['pdf'])).status_code, 404)
+
+
+class ArchiveTests(WalkInTestMixin, TestCase):
+
+    def make_history(self):
+        generate(locations=1, desks=2, days=6, per_day=10, seed=5)
+        today = local_today(self.location)
+        rebuild_daily_stats(today - timedelta(days=10), today)
+        return today
+
+    def test_archive_moves_old_rows_in_batches(self):
+        today = self.make_history()
+        before = today - timedelta(days=2)
+        old = set(WalkInQueue.objects.filter(queue_date__lt=before).values_list('id', 'queue_number', 'status'))
+        kept = WalkInQueue.objects.filter(queue_date__gte=before).count()
+        rollups = DailyDeskStats.objects.count()
+
+        self.assertEqual(archive_batch(before, batch_size=7), 7)
+        moved = archive_queues(before, batch_size=7)
+        self.assertEqual(moved + 7, len(old))
+        self.assertEqual(archive_batch(before), 0)
+
+        self.assertEqual(WalkInQueue.objects.count(), kept)
+        self.assertFalse(WalkInQueue.objects.filter(queue_date__lt=before).exists())
+        self.assertEqual(set(WalkInQueueArchive.objects.values_list('id', 'queue_number', 'status')), old)
+        self.assertFalse(QueueCounter.objects.filter(day__lt=before).exists())
+        self.assertEqual(DailyDeskStats.objects.count(), rollups)
+
+        with self.assertRaises(ValueError):
+            archive_queues(today + timedelta(days=1))
+
+    def test_rebuild_and_export_read_the_archive(self):
+        today = self.make_history()
+        totals = dict(DailyDeskStats.objects.values_list('id', 'total'))
+        start = today - timedelta(days=5)
+
+        # Một phần ngày cũ nhất còn ở bảng chính: thống kê vẫn phải gộp đủ
+        archive_batch(today, batch_size=5)
+        archive_queues(start + timedelta(days=1))
+        rebuild_daily_stats(today - timedelta(days=10), today)
+        self.assertEqual(sorted(DailyDeskStats.objects.values_list('total', flat=True)), sorted(totals.values()))
+
+        self.client.force_login(User.objects.create_superuser('root', password='pw'))
+        response = self.client.get(reverse('export_report', args=['csv']), {
+            'start': start.isoformat(), 'end': today.isoformat(),
+        })
+        lines = b''.join(response.streaming_content).decode('utf-8-sig').splitlines()
+        self.assertEqual(len(lines) - 1, WalkInQueue.objects.count() + WalkInQueueArchive.objects.count())
+
+    def test_archive_walkins_command(self):
+        desk = self.make_desk(1)
+        old_day = local_today() - timedelta(days=40)
+        self.make_queue(desk, 'completed', queue_date=old_day)
+        self.make_queue(desk)
+
+        out = StringIO()
+        call_command('archive_walkins', days=30, dry_run=True, stdout=out)
+        self.assertIn('1 dòng', out.getvalue())
+        self.assertEqual(WalkInQueueArchive.objects.count(), 0)
+
+        call_command('archive_walkins', days=30, stdout=StringIO())
+        self.assertEqual(WalkInQueueArchive.objects.get().queue_date, old_day)
+        self.assertEqual(WalkInQueue.objects.count(), 1)
+        with self.assertRaises(CommandError):
+            call_command('archive_walkins', days=0, stdout=StringIO())
+
+    def test_horizon_follows_each_location_date(self):
+        # 20:00 UTC ngày 10/1: đã là 11/1 tại Hồ Chí Minh, vẫn là 10/1 tại Pago Pago
+        moment = datetime(2026, 1, 10, 20, tzinfo=dt_timezone.utc)
+        west = Location.objects.create(name='Trung Tâm B', address='2 Lê Lợi', state='HCM', time_zone='Pacific/Pago_Pago')
+        day = date(2026, 1, 1)
+        east_queue = self.make_queue(self.make_desk(1), 'completed', queue_date=day)
+        west_queue = self.make_queue(self.make_desk(2, location=west), 'completed', queue_date=day)
+
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            self.assertEqual(archive_horizon(9, self.location), date(2026, 1, 2))
+            self.assertEqual(archive_horizon(9, west), day)
+            with self.assertRaises(ValueError):
+                archive_queues(date(2026, 1, 11))
+            call_command('archive_walkins', days=9, stdout=StringIO())
+        self.assertEqual(set(WalkInQueueArchive.objects.values_list('id', flat=True)), {east_queue.id})
+        self.assertTrue(WalkInQueue.objects.filter(id=west_queue.id).exists())
+
+
+@override_settings(WALKIN_WAITLIST_HEAP=True)
+class WaitlistTests(WalkInTestMixin, TestCase):
+
+    def test_heap_orders_priority_then_arrival(self):
+        now = timezone.now()
+        waitlist = DeskWaitlist(local_today(), [
+            (1, False, now - timedelta(minutes=30), 'Hộ tịch'),
+            (2, False, now - timedelta(minutes=20), 'Cư trú'),
+        ])
+        waitlist.push(3, True, now, 'Đất đai')
+        waitlist.push(4, False, now - timedelta(minutes=40), 'Hộ tịch')
+        self.assertEqual(waitlist.peek(), 3)
+        self.assertEqual(waitlist.ordered(), [3, 4, 1, 2])
+        self.assertEqual(waitlist.position(1), 3)
+        self.assertEqual(waitlist.ahead_of(is_priority=True), ['Đất đai'])
+        self.assertEqual(waitlist.ahead_of(is_priority=False), ['Đất đai', 'Hộ tịch', 'Hộ tịch', 'Cư trú'])
+
+        waitlist.remove(3)
+        waitlist.remove(4)
+        self.assertEqual(waitlist.peek(), 1)
+        self.assertEqual((len(waitlist), waitlist.position(4)), (2, None))
+
+    def test_reads_are_consistent_while_another_thread_updates(self):
+        now = timezone.now()
+        waitlist = DeskWaitlist(local_today(), [(n, n % 3 == 0, now, f'Loại {n}') for n in range(200)])
+        stop = threading.Event()
+
+        def churn():
+            number = 200
+            while not stop.is_set():
+                waitlist.push(number, number % 3 == 0, now, f'Loại {number}')
+                waitlist.remove(number - 200)
+                number += 1
+
+        # Đổi thread thường xuyên để hai bên xen kẽ trong một phép đọc
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        thread = threading.Thread(target=churn)
+        thread.start()
+        try:
+            for _ in range(300):
+                ordered = waitlist.ordered()
+                self.assertEqual(len(ordered), len(set(ordered)))
+                waitlist.ahead_of(is_priority=False)
+                waitlist.position(ordered[-1])
+        finally:
+            stop.set()
+            thread.join()
+
+    def test_call_next_follows_the_waitlist(self):
+        desk = self.make_desk(1)
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            first = WalkInQueue.enqueue(desk, customer_name='A', service_type='Hộ tịch')
+            second = WalkInQueue.enqueue(desk, customer_name='B', service_type='Hộ tịch')
+        response = self.client.get(reverse('desk_detail', args=[desk.id]))
+        self.assertEqual([queue.id for queue in response.context['waiting_queue']], [first.id, second.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            urgent = WalkInQueue.enqueue(desk, customer_name='C', service_type='Hộ tịch', is_priority=True)
+        self.assertEqual(waitlists.get(desk).peek(), urgent.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('call_next', args=[desk.id]))
+        urgent.refresh_from_db()
+        self.assertEqual((urgent.status, urgent.handled_by), ('in_progress', self.admin))
+        self.assertEqual(waitlists.get(desk).ordered(), [first.id, second.id])
+
+    @override_settings(WALKIN_WAITLIST_HEAP=False)
+    def test_without_shared_versions_the_database_is_read(self):
+        desk = self.make_desk(1)
+        self.client.force_login(self.admin)
+        self.assertEqual(waitlists.get(desk).ordered(), [])
+        # Số do một worker khác thêm: phiên bản của tiến trình này không đổi
+        queue = self.make_queue(desk)
+        response = self.client.get(reverse('desk_detail', args=[desk.id]))
+        self.assertEqual(response.context['waiting_queue'], [queue])
+        self.client.post(reverse('call_next', args=[desk.id]))
+        self.assertEqual(WalkInQueue.objects.get(id=queue.id).handled_by, self.admin)
+
+    def test_changes_from_other_workers_rebuild_the_heap(self):
+        desk = self.make_desk(1)
+        queue = self.make_queue(desk)
+        self.assertEqual(waitlists.get(desk).ordered(), [queue.id])
+
+        # Một worker khác đã phục vụ khách này: chỉ phiên bản trong cache thay đổi
+        WalkInQueue.objects.filter(id=queue.id).update(status='in_progress')
+        bump_version('desk', desk.id)
+        self.client.force_login(self.admin)
+        self.client.post(reverse('call_next', args=[desk.id]))
+        self.assertIsNone(waitlists.get(desk).peek())
+        self.assertEqual(WalkInQueue.objects.get(id=queue.id).handled_by, None)
+
+
+class QueueTransitionTests(WalkInTestMixin, TestCase):
+
+    def test_only_one_clerk_claims_a_ticket(self):
+        desk = self.make_desk(1)
+        queue = self.make_queue(desk)
+        other = User.objects.create_user('clerk2', password='pw', location=self.location, role='admin')
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            claimed = WalkInQueue.claim(queue.id, self.admin, desk=desk)
+        self.assertEqual((claimed.status, claimed.handled_by), ('in_progress', self.admin))
+        self.assertEqual(claimed.called_at, claimed.started_at)
+        self.assertEqual(len(callbacks), 1)
+        self.assertIsNone(WalkInQueue.claim(queue.id, other))
+
+        waiting = self.make_queue(desk)
+        self.assertIsNone(WalkInQueue.claim(waiting.id, self.admin, desk=self.make_desk(2)))
+
+    def test_transitions_update_changed_fields_only(self):
+        queue = self.make_queue(self.make_desk(1))
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertTrue(queue.cancel())
+        updates = [query['sql'] for query in ctx.captured_queries if query['sql'].startswith('UPDATE "walkin_walkinqueue"')]
+        self.assertEqual(len(updates), 1)
+        sql = updates[0]
+        self.assertNotIn('customer_name', sql)
+        self.assertIn('status', sql)
+
+        # Khách đã huỷ không thể được phục vụ hay hoàn thành
+        stale = WalkInQueue.objects.get(id=queue.id)
+        stale.status = 'waiting'
+        self.assertFalse(stale.start_serving(self.admin))
+        self.assertFalse(queue.complete())
+        self.assertEqual(WalkInQueue.objects.get(id=queue.id).status, 'cancelled')
+
+    def test_second_call_reports_the_ticket_is_taken(self):
+        desk = self.make_desk(1)
+        queue = self.make_queue(desk)
+        self.client.force_login(self.admin)
+        self.client.post(reverse('call_queue', args=[queue.id]))
+        response = self.client.post(reverse('call_queue', args=[queue.id]), follow=True)
+        self.assertContains(response, 'đã được gọi')
+        self.assertEqual(WalkInQueue.objects.get(id=queue.id).status, 'in_progress')
+
+
+class EtaTests(WalkInTestMixin, TestCase):
+
+    def setUp(self):
+        clear_caches()
+
+    def complete(self, desk, minutes, service_type='Hộ tịch'):
+        started = timezone.now() - timedelta(minutes=minutes)
+        queue = self.make_queue(
+            desk, 'completed', service_type=service_type,
+            started_at=started, completed_at=started + timedelta(minutes=minutes),
+        )
+        record_service(queue)
+
+    def test_service_times_are_averaged_incrementally(self):
+        stats = None
+        for value in [100, 200, 300]:
+            stats = ewma_update(stats, value, alpha=0.2)
+        self.assertEqual(stats[1], 3)
+        self.assertAlmostEqual(stats[0], 200)
+
+        desk = self.make_desk(1)
+        for minutes in [4, 6, 5]:
+            self.complete(desk, minutes, 'Công chứng')
+        self.complete(desk, 20)
+        times = ServiceTimes([desk.id], ['Công chứng', 'Hộ tịch'])
+        self.assertAlmostEqual(times.expected(desk.id, 'Công chứng'), 300)
+        # Chưa đủ mẫu của loại dịch vụ: dùng số liệu chung của bàn
+        self.assertEqual(times.expected(desk.id, 'Hộ tịch'), times.expected(desk.id))
+
+    def test_schedule_adds_up_the_line(self):
+        desk = self.make_desk(1)
+        self.complete(desk, 10)
+        now = timezone.now()
+        times = ServiceTimes([desk.id])
+        starts = schedule(times, desk.id, ['Hộ tịch'] * 2, ('Hộ tịch', now - timedelta(minutes=4)), now=now)
+        self.assertEqual([round((start - now).total_seconds() / 60) for start in starts], [6, 16, 26])
+        starts = schedule(times, desk.id, ['Hộ tịch'] * 2, now=now, servers=2)
+        self.assertEqual([round((start - now).total_seconds() / 60) for start in starts], [0, 5, 10])
+
+        # Bàn chưa có lịch sử: khởi tạo từ DailyDeskStats hoặc giá trị mặc định
+        other = self.make_desk(2)
+        self.assertEqual(ServiceTimes([other.id]).expected(other.id), settings.WALKIN_ETA_DEFAULT_SERVICE_MINUTES * 60)
+
+    def test_seed_window_follows_the_desk_location(self):
+        location = Location.objects.create(name='Trung Tâm B', address='2 Lê Lợi', state='HCM', time_zone='Asia/Ho_Chi_Minh')
+        desk = self.make_desk(1, location=location)
+        # 20:00 UTC ngày 10/1 đã là ngày 11/1 tại Hồ Chí Minh
+        moment = datetime(2026, 1, 10, 20, tzinfo=dt_timezone.utc)
+        for day, seconds in [(date(2025, 12, 11), 3000), (date(2025, 12, 12), 600)]:
+            DailyDeskStats.objects.create(location=location, desk=desk, day=day, service_count=1, service_sum=seconds)
+        with mock.patch('django.utils.timezone.now', return_value=moment):
+            self.assertEqual(ServiceTimes([desk.id]).expected(desk.id), 600)
+
+    def test_estimates_in_json_board_and_desk_page(self):
+        desk = self.make_desk(1)
+        with self.captureOnCommitCallbacks(execute=True):
+            for name in ['A', 'B']:
+                WalkInQueue.enqueue(desk, customer_name=name, service_type='Hộ tịch')
+        self.client.force_login(self.admin)
+
+        data = self.client.get(reverse('desk_eta_data', args=[desk.id])).json()
+        self.assertEqual([ticket['position'] for ticket in data['tickets']], [1, 2])
+        self.assertEqual([ticket['estimated_wait'] for ticket in data['tickets']], [0, 10])
+        self.assertEqual(data['estimated_wait'], 20)
+
+        response = self.client.get(reverse('desk_detail', args=[desk.id]))
+        self.assertEqual([queue.estimated_wait for queue in response.context['waiting_queue']], [0, 10])
+        board = self.client.get(reverse('display_board_data', args=[self.location.id])).json()
+        self.assertEqual(board['desks'][0]['estimated_wait'], 20)
+
+
+class ConcurrentServiceTimeTests(TransactionTestCase):
+
+    def setUp(self):
+        clear_caches()
+
+    def test_parallel_completions_keep_every_sample(self):
+        location = Location.objects.create(name='Trung Tâm B', address='2 Lê Lợi', state='HCM')
+        desk = Desk.objects.create(location=location, desk_number='Bàn 1', desk_name='Bàn số 1', service_type='Hộ tịch')
+        started = timezone.now() - timedelta(minutes=5)
+        queue = WalkInQueue.objects.create(
+            location=location, desk=desk, queue_number='001', customer_name='A',
+            service_type='Hộ tịch', status='completed', started_at=started, completed_at=timezone.now(),
+        )
+        threads, per_thread = 8, 50
+        errors = []
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            try:
+                barrier.wait()
+                for _ in range(per_thread):
+                    record_service(queue)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections.close_all()
+
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        workers = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        times = ServiceTimes([desk.id], ['Hộ tịch'])
+        # Số mẫu của bàn và của loại dịch vụ
+        self.assertEqual([count for _, count in times.stats.values()], [threads * per_thread] * 2)
+
+
+class AssignmentTests(WalkInTestMixin, TestCase):
+
+    def setUp(self):
+        clear_caches()
+
+    def test_desk_service_types(self):
+        desk = Desk(service_type='Hộ tịch, Cư trú;\nĐất đai')
+        self.assertEqual(desk.get_service_types(), ['Hộ tịch', 'Cư trú', 'Đất đai'])
+        self.assertTrue(desk.covers('cư trú '))
+        self.assertFalse(desk.covers('Kinh doanh'))
+
+    def test_choose_desk_picks_the_soonest_covering_desk(self):
+        busy = self.make_desk(1)
+        idle = self.make_desk(2)
+        closed = self.make_desk(3)
+        Desk.objects.filter(id=closed.id).update(is_active=False)
+        other = Desk.objects.create(location=self.location, desk_number='Bàn 4', desk_name='-', service_type='Đất đai')
+        for _ in range(2):
+            self.make_queue(busy)
+        self.assertEqual(choose_desk(self.location, 'Hộ tịch'), idle)
+        self.assertEqual(choose_desk(self.location, 'đất đai'), other)
+        self.assertIsNone(choose_desk(self.location, 'Kinh doanh'))
+
+        # Khách ưu tiên chỉ đứng sau các khách ưu tiên khác
+        self.make_queue(idle, 'in_progress', started_at=timezone.now())
+        self.make_queue(idle)
+        waitlists.invalidate()
+        self.assertEqual(choose_desk(self.location, 'Hộ tịch'), idle)
+        self.make_queue(idle, is_priority=True)
+        waitlists.invalidate()
+        self.assertEqual(choose_desk(self.location, 'Hộ tịch', is_priority=True), busy)
+
+    def test_location_enqueue_view(self):
+        busy = self.make_desk(1)
+        idle = self.make_desk(2)
+        self.make_queue(busy)
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['service_types'], ['Hộ tịch'])
+
+        url = reverse('add_to_location_queue', args=[self.location.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'customer_name': 'B', 'service_type': 'Hộ tịch'})
+        self.assertEqual(WalkInQueue.objects.get(customer_name='B').desk, idle)
+
+        response = self.client.post(url, {'customer_name': 'C', 'service_type': 'Kinh doanh'}, follow=True)
+        self.assertContains(response, 'Không có bàn nào')
+        self.assertFalse(WalkInQueue.objects.filter(customer_name='C').exists())
+
+
+class AccessContextTests(WalkInTestMixin, TestCase):
+
+    def location_queries(self, method, url):
+        self.client.force_login(self.admin)
+        getattr(self.client, method)(url)
+        with CaptureQueriesContext(connection) as ctx:
+            getattr(self.client, method)(url)
+        return [query['sql'] for query in ctx.captured_queries if 'FROM "walkin_location"' in query['sql']]
+
+    def test_hot_views_do_not_load_locations(self):
+        desk = self.make_desk(1)
+        self.assertEqual(self.location_queries('get', reverse('desk_detail', args=[desk.id])), [])
+        queue = self.make_queue(desk)
+        self.assertEqual(self.location_queries('post', reverse('cancel_queue', args=[queue.id])), [])
+
+    def test_context_is_resolved_once_per_request(self):
+        other = Location.objects.create(name='Trung Tâm B', address='2 Lê Lợi', state='HCM')
+        request = RequestFactory().get('/')
+        request.user = User.objects.select_related('location').get(id=self.admin.id)
+        access = get_access(request)
+        self.assertIs(get_access(request), access)
+        self.assertTrue(access.can_access(self.location.id))
+        self.assertFalse(access.can_access(other.id))
+        self.assertEqual(access.location_ids, {self.location.id})
+
+        request.user = User.objects.create_superuser('root', password='pw')
+        self.assertTrue(get_access(request).can_access(other.id))
+        self.assertEqual(get_access(request).location_ids, {self.location.id, other.id})
+
+    def test_location_cache_is_invalidated_on_save(self):
+        self.assertEqual(locations.get(self.location.id).name, 'Trung Tâm A')
+        Location.objects.filter(id=self.location.id).update(name='Cũ')
+        self.assertEqual(locations.get(self.location.id).name, 'Trung Tâm A')
+        location = Location.objects.get(id=self.location.id)
+        location.name = 'Trung Tâm Mới'
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                location.save()
+                # Chưa commit: phiên bản chưa đổi, bản trong bộ nhớ vẫn được dùng
+                self.assertEqual(locations.get(self.location.id).name, 'Trung Tâm A')
+            self.assertEqual(locations.get(self.location.id).name, 'Trung Tâm A')
+        self.assertEqual(locations.get(self.location.id).name, 'Trung Tâm Mới')
+
+
+class DeskFragmentCacheTests(WalkInTestMixin, TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(self.admin)
+        self.desk = self.make_desk(1)
+
+    def test_desk_card_is_reused_until_desk_changes(self):
+        self.assertContains(self.client.get(reverse('dashboard')), 'Bàn số 1')
+        # Cập nhật không qua save(): fragment cũ vẫn được dùng
+        Desk.objects.filter(id=self.desk.id).update(desk_name='Không thấy')
+        self.assertNotContains(self.client.get(reverse('dashboard')), 'Không thấy')
+
+        self.desk.refresh_from_db()
+        self.desk.desk_name = 'Bàn hồ sơ'
+        self.desk.save()
+        self.assertContains(self.client.get(reverse('dashboard')), 'Bàn hồ sơ')
+        self.assertContains(self.client.get(reverse('desk_management')), 'Bàn hồ sơ')
+
+    def card_waiting_count(self):
+        content = self.client.get(reverse('dashboard')).content.decode()
+        return int(re.search(r'desk-stat-value">(\d+)</div>\s*<div class="desk-stat-label">Đang chờ', content).group(1))
+
+    def test_desk_card_follows_queue_transitions(self):
+        queue = self.make_queue(self.desk)
+        self.assertEqual(self.card_waiting_count(), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            queue.cancel()
+        self.assertEqual(self.card_waiting_count(), 0)
+
+    def test_desk_card_keys_on_the_counts_it_renders(self):
+        queue = self.make_queue(self.desk)
+        self.assertEqual(self.card_waiting_count(), 1)
+        # Không qua notify() (không có tín hiệu, không tăng phiên bản nào):
+        # số liệu khác nên khoá fragment cũng khác
+        WalkInQueue.objects.filter(id=queue.id).update(status='cancelled')
+        self.assertEqual(self.card_waiting_count(), 0)
+
+    def test_management_row_follows_location_rename(self):
+        self.assertContains(self.client.get(reverse('desk_management')), 'Trung Tâm A')
+        self.location.name = 'Trung Tâm Mới'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.location.save()
+        self.assertContains(self.client.get(reverse('desk_management')), 'Trung Tâm Mới')
+
+
+class ApiTests(WalkInTestMixin, TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(self.admin)
+        self.desk = self.make_desk(1)
+
+    def test_tickets_are_paged_by_cursor(self):
+        moment = timezone.now()
+        ids = [self.make_queue(self.desk, created_at=moment).id for _ in range(5)]
+        seen, cursor = [], None
+        with CaptureQueriesContext(connection) as ctx:
+            while True:
+                params = {'limit': 2, 'fields': 'id,queue_number'}
+                if cursor:
+                    params['cursor'] = cursor
+                data = self.client.get(reverse('api_tickets'), params).json()
+                seen += [row['id'] for row in data['results']]
+                cursor = data['next']
+                if cursor is None:
+                    break
+        self.assertEqual(seen, ids)
+        self.assertFalse(any('OFFSET' in query['sql'] for query in ctx.captured_queries))
+
+    def test_fields_are_selectable(self):
+        self.make_queue(self.desk)
+        row = self.client.get(reverse('api_tickets'), {'fields': 'queue_number,status'}).json()['results'][0]
+        self.assertEqual(set(row), {'queue_number', 'status'})
+        response = self.client.get(reverse('api_tickets'), {'fields': 'password'})
+        self.assertEqual(response.status_code, 400)
+        desks = self.client.get(reverse('api_desks'), {'fields': 'desk_number'}).json()['results']
+        self.assertEqual(desks, [{'desk_number': 'Bàn 1'}])
+
+    def test_access_checks(self):
+        other = Location.objects.create(name='Trung Tâm B', address='2 Lê Lợi', state='HCM')
+        queue = self.make_queue(self.make_desk(2, location=other))
+        self.assertEqual(self.client.get(reverse('api_ticket', args=[queue.id])).status_code, 403)
+        self.assertEqual(self.client.get(reverse('api_tickets')).json()['results'], [])
+
+        User.objects.create_user('staff', password='pw', location=self.location, role='user')
+        self.client.login(username='staff', password='pw')
+        response = self.client.post(
+            reverse('api_tickets'), {'desk': self.desk.id, 'customer_name': 'A', 'service_type': 'Hộ tịch'}
+        )
+        self.assertEqual(response.status_code, 403)
+
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('api_desks')).status_code, 401)
+
+    def test_enqueue_and_transition(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('api_tickets'),
+                json.dumps({'desk': self.desk.id, 'customer_name': 'Trần Thị B', 'service_type': 'Hộ tịch'}),
+                content_type='application/json',
+            )
+        self.assertEqual(response.status_code, 201)
+        ticket = response.json()
+        self.assertEqual(ticket['status'], 'waiting')
+
+        detail = self.client.get(reverse('api_ticket', args=[ticket['id']])).json()
+        self.assertEqual(detail['position'], 1)
+        queue = self.client.get(reverse('api_desk_queue', args=[self.desk.id])).json()
+        self.assertEqual([row['id'] for row in queue['results']], [ticket['id']])
+
+        call = reverse('api_ticket_action', args=[ticket['id'], 'call'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post(call).json()['status'], 'in_progress')
+        self.assertEqual(self.client.post(call).status_code, 409)
+        complete = reverse('api_ticket_action', args=[ticket['id'], 'complete'])
+        self.assertEqual(self.client.post(complete).json()['status'], 'completed')
+        self.assertEqual(self.client.post(reverse('api_desk_call_next', args=[self.desk.id])).status_code, 409)
+
+
+class IngestTests(WalkInTestMixin, TestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.client.force_login(self.admin)
+        self.desk = self.make_desk(1)
+
+    def batch(self, count, start=0, **extra):
+        return [
+            dict({
+                'idempotency_key': f'kiosk-1-{index}',
+                'desk': self.desk.id,
+                'customer_name': f'Khách {index}',
+                'service_type': 'Hộ tịch',
+            }, **extra)
+            for index in range(start, start + count)
+        ]
+
+    def post(self, tickets):
+        return self.client.post(
+            reverse('api_ticket_batch'), json.dumps({'tickets': tickets}), content_type='application/json'
+        )
+
+    def test_batch_is_inserted_once(self):
+        self.make_queue(self.desk, queue_number='1001')
+        with CaptureQueriesContext(connection) as ctx:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.post(self.batch(50))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 50)
+        inserts = [query for query in ctx.captured_queries if query['sql'].startswith('INSERT INTO "walkin_walkinqueue"')]
+        self.assertEqual(len(inserts), 1)
+        numbers = [row['queue_number'] for row in response.json()['results']]
+        self.assertEqual(numbers[:2], ['1002', '1003'])
+        self.assertEqual(len(set(numbers)), 50)
+        self.assertEqual(DailyDeskStats.objects.get(desk=self.desk).waiting, 51)
+        self.assertEqual(len(waitlists.get(self.desk)), 51)
+
+        # Gửi lại cùng lô, thêm vài số mới: chỉ các số mới được tạo
+        with self.captureOnCommitCallbacks(execute=True):
+            retry = self.post(self.batch(55)).json()
+        self.assertEqual((retry['created'], retry['duplicates']), (5, 50))
+        self.assertEqual(retry['results'][0]['queue_number'], numbers[0])
+        self.assertEqual(WalkInQueue.objects.filter(desk=self.desk).count(), 56)
+
+    def test_invalid_batch_writes_nothing(self):
+        other = Location.objects.create(name='Trung Tâm B', address='2 Lê Lợi', state='HCM')
+        tickets = self.batch(3)
+        tickets[1]['customer_name'] = ''
+        tickets[2]['desk'] = self.make_desk(2, location=other).id
+        response = self.post(tickets)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([error['index'] for error in response.json()['errors']], [1, 2])
+        self.assertFalse(WalkInQueue.objects.exists())
+
+    def test_offline_tickets_keep_their_time(self):
+        issued = timezone.now() - timedelta(minutes=30)
+        tickets = self.batch(1, created_at=issued.isoformat())
+        tickets[0]['is_priority'] = True
+        self.post(tickets)
+        queue = WalkInQueue.objects.get(idempotency_key='kiosk-1-0')
+        self.assertEqual(queue.created_at, issued)
+        self.assertTrue(queue.is_priority)
+
+
+class ParallelQueryTests(TransactionTestCase):
+
+    def setUp(self):
+        clear_caches()
+        self.location = Location.objects.create(name='Trung Tâm A', address='1 Lê Lợi', state='HCM')
+        self.desk = Desk.objects.create(location=self.location, desk_number='Bàn 1', desk_name='Bàn 1', service_type='-')
+
+    def test_queries_run_concurrently_on_pool_threads(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def count():
+            # Chỉ qua được barrier khi cả hai hàm chạy cùng lúc
+            barrier.wait()
+            return threading.current_thread().name, Desk.objects.count()
+
+        first, second = async_to_sync(run_parallel)(count, count)
+        self.assertNotEqual(first[0], second[0])
+        self.assertEqual((first[1], second[1]), (1, 1))
+
+    @override_settings(WALKIN_DB_READ_REPLICA='replica')
+    def test_replica_routing_follows_into_threads(self):
+        with read_from_replica():
+            [alias] = async_to_sync(run_parallel)(lambda: router.db_for_read(Desk))
+        self.assertEqual(alias, 'replica')
+
+    def test_request_transaction_is_read_on_its_own_thread(self):
+        with transaction.atomic():
+            Desk.objects.create(location=self.location, desk_number='Bàn 2', desk_name='Bàn 2', service_type='-')
+            [count] = async_to_sync(run_parallel)(Desk.objects.count)
+        self.assertEqual(count, 2)
+
+    def test_execute_wrappers_follow_into_threads(self):
+        seen = []
+
+        def wrapper(execute, sql, params, many, context):
+            seen.append(threading.current_thread().name)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(wrapper):
+            async_to_sync(run_parallel)(Desk.objects.count, Location.objects.count)
+        self.assertEqual(len(seen), 2)
+        self.assertTrue(all(name.startswith('walkin-query') for name in seen))
+        Desk.objects.count()
+        self.assertEqual(len(seen), 2)
+
+    @override_settings(MIDDLEWARE=['walkin.instrumentation.QueryInstrumentationMiddleware'] + settings.MIDDLEWARE)
+    def test_instrumentation_counts_parallel_queries(self):
+        admin = User.objects.create_user('clerk', password='pw', location=self.location, role='admin')
+        WalkInQueue.enqueue(self.desk, customer_name='Nguyễn Văn A', service_type='-')
+        self.client.force_login(admin)
+        for name, args in (('dashboard', []), ('desk_detail', [self.desk.id])):
+            url = reverse(name, args=args)
+            self.client.get(url)
+            counts = []
+            for threads in (0, 4):
+                with self.settings(WALKIN_PARALLEL_QUERY_THREADS=threads):
+                    counts.append(int(self.client.get(url)['X-Query-Count']))
+            self.assertEqual(counts[1], counts[0], name)
+            self.assertGreater(counts[1], 1, name)
+
+    def test_async_desk_detail(self):
+        admin = User.objects.create_user('clerk', password='pw', location=self.location, role='admin')
+        queue = WalkInQueue.enqueue(self.desk, customer_name='Nguyễn Văn A', service_type='-')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('desk_detail', args=[self.desk.id]))
+        self.assertContains(response, queue.queue_number)
+        self.assertEqual(response.context['waiting_queue'], [queue])
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse('desk_detail', args=[self.desk.id])).status_code, 302)
+
+
+class QueueCounterMigrationTests(TransactionTestCase):
+    """Dữ liệu cũ có số trùng trong cùng một ngày làm việc vẫn chuyển đổi được"""
+
+    migrate_from = [('walkin', '0003_location_time_zone_walkinqueue_indexes')]
+    migrate_to = [('walkin', '0004_queue_counter')]
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_duplicate_numbers_are_renumbered(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_from)
+        apps = executor.loader.project_state(self.migrate_from).apps
+        OldLocation = apps.get_model('walkin', 'Location')
+        OldDesk = apps.get_model('walkin', 'Desk')
+        OldQueue = apps.get_model('walkin', 'WalkInQueue')
+        location = OldLocation.objects.create(name='A', address='-', state='-', time_zone='Asia/Ho_Chi_Minh')
+        desk = OldDesk.objects.create(location=location, desk_number='Bàn 1', desk_name='Bàn 1', service_type='-')
+        # 23:00 và 01:00 UTC cùng thuộc ngày 2 tại Hồ Chí Minh (UTC+7)
+        moments = [
+            timezone.datetime(2026, 3, 1, 23, 0, tzinfo=timezone.utc),
+            timezone.datetime(2026, 3, 2, 1, 0, tzinfo=timezone.utc),
+            timezone.datetime(2026, 3, 2, 2, 0, tzinfo=timezone.utc),
+        ]
+        for number, moment in zip(['1001', '1001', '1002'], moments):
+            queue = OldQueue.objects.create(
+                location=location, desk=desk, queue_number=number, customer_name='A', service_type='-'
+            )
+            OldQueue.objects.filter(id=queue.id).update(created_at=moment)
+
+        executor = MigrationExecutor(connection)
+        executor.migrate(self.migrate_to)
+        apps = executor.loader.project_state(self.migrate_to).apps
+        rows = apps.get_model('walkin', 'WalkInQueue').objects.order_by('created_at')
+        self.assertEqual(
+            [(row.queue_date, row.queue_number) for row in rows],
+            [(date(2026, 3, 2), '1001'), (date(2026, 3, 2), '1002'), (date(2026, 3, 2), '1003')],
+        )
+
+
+class AsyncViewTests(WalkInTestMixin, TestCase):
+
+    def test_dashboard_with_model_backend_session(self):
+        # Phiên cũ do ModelBackend xác thực: user.location chưa được nạp sẵn
+        self.client.force_login(self.admin, backend='django.contrib.auth.backends.ModelBackend')
+        response = self.client.get(reverse('dashboard'))
+        self.assertContains(response, 'Trung Tâm A')
+        self.assertEqual(response.context['user'].location, self.location)
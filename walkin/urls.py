@@ -1,6 +1,17 @@
 # walkin/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, views
+
+# Các trang chỉ đọc dùng bản async khi chạy dưới ASGI (WALKIN_ASYNC_VIEWS)
+if settings.WALKIN_ASYNC_VIEWS:
+    dashboard_view = views.adashboard_view
+    desk_detail_view = views.adesk_detail_view
+    desk_management_view = views.adesk_management_view
+else:
+    dashboard_view = views.dashboard_view
+    desk_detail_view = views.desk_detail_view
+    desk_management_view = views.desk_management_view
 
 urlpatterns = [
     # Authentication
@@ -9,22 +20,52 @@ urlpatterns = [
     path('logout/', views.logout_view, name='logout'),
     
     # Dashboard
-    path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('dashboard/', dashboard_view, name='dashboard'),
     
     # Profile
     path('profile/', views.profile_view, name='profile'),
     
     # Desk Detail (Cả admin và user đều xem được)
-    path('desks/<int:desk_id>/', views.desk_detail_view, name='desk_detail'),
+    path('desks/<int:desk_id>/', desk_detail_view, name='desk_detail'),
+    path('desks/<int:desk_id>/eta/', views.desk_eta_data, name='desk_eta_data'),
     
     # Desk Management (Chỉ admin)
-    path('desks/management/', views.desk_management_view, name='desk_management'),
+    path('desks/management/', desk_management_view, name='desk_management'),
     path('desks/create/', views.create_desk, name='create_desk'),
     path('desks/<int:desk_id>/delete/', views.delete_desk, name='delete_desk'),
     
     # Queue Management (Chỉ admin)
     path('queue/add/<int:desk_id>/', views.add_to_queue, name='add_to_queue'),
+    path('queue/add/location/<int:location_id>/', views.add_to_location_queue, name='add_to_location_queue'),
     path('queue/<int:queue_id>/call/', views.call_queue, name='call_queue'),
+    path('desks/<int:desk_id>/call-next/', views.call_next, name='call_next'),
     path('queue/<int:queue_id>/complete/', views.complete_queue, name='complete_queue'),
     path('queue/<int:queue_id>/cancel/', views.cancel_queue, name='cancel_queue'),
+    
+    # Bảng hiển thị tại sảnh chờ (công khai)
+    path('display/<int:location_id>/', views.display_board_view, name='display_board'),
+    path('display/<int:location_id>/data/', views.display_board_data, name='display_board_data'),
+    
+    # Sự kiện thời gian thực (Server-Sent Events)
+    path('events/desks/<int:desk_id>/', views.desk_events, name='desk_events'),
+    path('events/locations/<int:location_id>/', views.location_events, name='location_events'),
+    
+    # Báo cáo lịch sử
+    path('reports/', views.reports_view, name='reports'),
+    path('reports/export/<str:file_format>/', views.export_report, name='export_report'),
+    
+    # Số liệu vận hành cho Prometheus
+    path('metrics', views.metrics_view, name='metrics'),
+    
+    # Thống kê hiệu năng theo view (Chỉ admin)
+    path('ops/perf/', views.perf_stats_view, name='perf_stats'),
+    
+    # JSON API v1 cho kiosk và ứng dụng di động
+    path('api/v1/desks/', api.desk_list, name='api_desks'),
+    path('api/v1/desks/<int:desk_id>/queue/', api.desk_queue, name='api_desk_queue'),
+    path('api/v1/desks/<int:desk_id>/call-next/', api.desk_call_next, name='api_desk_call_next'),
+    path('api/v1/tickets/', api.ticket_list, name='api_tickets'),
+    path('api/v1/tickets/batch/', api.ticket_batch, name='api_ticket_batch'),
+    path('api/v1/tickets/<int:ticket_id>/', api.ticket_detail, name='api_ticket'),
+    path('api/v1/tickets/<int:ticket_id>/<str:action>/', api.ticket_action, name='api_ticket_action'),
 ]
\ No newline at end of file
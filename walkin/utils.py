@@ -0,0 +1,49 @@
+# walkin/utils.py
+"""Tiện ích ngày giờ theo múi giờ của từng địa điểm"""
+
+import zoneinfo
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def location_timezone(location=None):
+    """Múi giờ của địa điểm, mặc định là múi giờ của hệ thống"""
+    if location is not None and location.time_zone:
+        try:
+            return zoneinfo.ZoneInfo(location.time_zone)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            pass
+    return timezone.get_current_timezone()
+
+
+def local_today(location=None):
+    """Ngày hiện tại tại địa điểm"""
+    return timezone.localdate(timezone=location_timezone(location))
+
+
+def day_window(day, location=None):
+    """
+    Khoảng [start, end) của một ngày theo giờ địa phương
+
+    Lọc theo khoảng trên cột created_at thay vì created_at__date để
+    cơ sở dữ liệu có thể dùng chỉ mục.
+    """
+    tz = location_timezone(location)
+    start = datetime.combine(day, time.min, tzinfo=tz)
+    end = datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+    return start, end
+
+
+def today_window(location=None):
+    """Khoảng [start, end) của ngày hôm nay tại địa điểm"""
+    return day_window(local_today(location), location)
+
+
+def today_filter(location=None, prefix=''):
+    """Tham số lọc hàng đợi trong ngày hôm nay, dùng cho filter(**...)"""
+    start, end = today_window(location)
+    return {
+        f'{prefix}created_at__gte': start,
+        f'{prefix}created_at__lt': end,
+    }
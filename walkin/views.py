@@ -1,29 +1,91 @@
 # walkin/views.py - COPY TOÀN BỘ FILE NÀY
 
+import asyncio
+
+from django.conf import settings
+from django.db import router
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib import messages
 from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_protect
-from django.http import JsonResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden, StreamingHttpResponse, Http404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from asgiref.sync import sync_to_async
 from functools import wraps
-from datetime import date
+from urllib.parse import urlencode
+from .access import get_access, locations
+from .assignment import choose_desk, service_type_choices
+from .board import get_board
+from .db import immediate_atomic
+from .eta import ServiceTimes, desk_estimates, schedule, wait_minutes
+from .events import desk_channel, location_channel, event_stream
+from .exports import aiter_chunks, stream_csv, stream_xlsx
+from .instrumentation import registry
+from .metrics import render_metrics
+from .parallel import run_parallel
 from .models import Location, User, Desk, WalkInQueue
+from .reports import EXPORT_HEADER, ReportFilters, export_rows, throughput_report
+from .routers import replica_view
+from .stats import annotate_desk_stats, location_totals, minutes, queue_time_metrics
+from .utils import local_today, today_filter
+from .waitlist import claim_next, registry as waitlists
 
 
 # Decorator kiểm tra quyền admin
 def admin_required(view_func):
     """Chỉ admin mới được truy cập"""
+    if asyncio.iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def async_wrapper(request, *args, **kwargs):
+            access, _ = await _aget_access(request)
+            if not access.is_admin:
+                messages.error(request, 'Bạn không có quyền truy cập tính năng này. Chỉ người quản trị mới được phép.')
+                return redirect('dashboard')
+            return await view_func(request, *args, **kwargs)
+        return async_wrapper
+    
     @wraps(view_func)
     def wrapper(request, *args, **kwargs):
-        if not request.user.is_admin_role():
+        if not get_access(request).is_admin:
             messages.error(request, 'Bạn không có quyền truy cập tính năng này. Chỉ người quản trị mới được phép.')
             return redirect('dashboard')
         return view_func(request, *args, **kwargs)
     return wrapper
 
 
+# login_required của Django 4.2 chưa hỗ trợ view async
+def alogin_required(view_func):
+    """Như login_required, người dùng được nạp từ session ở thread đồng bộ"""
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+@sync_to_async
+def _aget_access(request):
+    """
+    AccessContext và các địa điểm được xem, cho view async
+
+    user.location được gắn sẵn từ bộ nhớ đệm địa điểm để template không nạp
+    khoá ngoại trong vòng lặp sự kiện (phiên do ModelBackend xác thực không
+    select_related địa điểm).
+    """
+    access = get_access(request)
+    user = request.user
+    if access.location is not None and not User.location.is_cached(user):
+        user.location = access.location
+    return access, access.accessible_locations()
+
+
 @csrf_protect
 @never_cache
 def login_view(request):
@@ -81,147 +143,237 @@ def logout_view(request):
     return redirect('login')
 
 
-@login_required
-def dashboard_view(request):
-    """
-    Main dashboard view - shows location-specific data with desk list
-    """
-    user = request.user
-    
-    # Get accessible locations for the user
-    accessible_locations = user.get_accessible_locations()
-    
-    # Get desks
+def _dashboard_desks(user, access):
+    """Danh sách bàn kèm số liệu hôm nay (một truy vấn cho toàn bộ danh sách)"""
     if user.is_superuser:
         desks = Desk.objects.all()
     else:
-        desks = Desk.objects.filter(location=user.location)
-    
-    # Thống kê tổng quan
-    if user.location:
-        today_total = WalkInQueue.objects.filter(
-            location=user.location,
-            created_at__date=date.today()
-        ).count()
-        
-        in_progress = WalkInQueue.objects.filter(
-            location=user.location,
-            status='in_progress',
-            created_at__date=date.today()
-        ).count()
-        
-        completed = WalkInQueue.objects.filter(
-            location=user.location,
-            status='completed',
-            created_at__date=date.today()
-        ).count()
-        
-        waiting = WalkInQueue.objects.filter(
-            location=user.location,
-            status='waiting',
-            created_at__date=date.today()
-        ).count()
-    else:
-        today_total = in_progress = completed = waiting = 0
+        desks = Desk.objects.filter(location_id=user.location_id)
+    return list(annotate_desk_stats(desks, access.location))
+
+
+def _location_metrics(access):
+    """Thời gian chờ/phục vụ trung bình của địa điểm hôm nay"""
+    if not access.location:
+        return {'avg_wait': None, 'avg_service': None}
+    return queue_time_metrics(WalkInQueue.objects.filter(
+        location_id=access.location_id,
+        **today_filter(access.location)
+    ))
+
+
+def _dashboard_context(user, access, accessible_locations, desks, metrics):
+    # Thống kê tổng quan của địa điểm, cộng dồn từ số liệu các bàn
+    totals = location_totals(desks, user.location_id)
     
-    context = {
+    # Loại dịch vụ để lấy số tự động, lấy từ danh sách bàn đã tải
+    service_types = service_type_choices(
+        desk for desk in desks if desk.location_id == user.location_id
+    ) if user.location_id else []
+    
+    return {
         'user': user,
-        'location': user.location,
+        'location': access.location,
         'accessible_locations': accessible_locations,
+        'service_types': service_types,
         'is_superadmin': user.is_superuser,
         'desks': desks,
-        'today_total': today_total,
-        'in_progress': in_progress,
-        'completed': completed,
-        'waiting': waiting,
-        'is_admin': user.is_admin_role(),
+        'today': local_today(access.location),
+        'today_total': totals['today_total'],
+        'in_progress': totals['serving_count'],
+        'completed': totals['completed_count'],
+        'waiting': totals['waiting_count'],
+        'avg_wait_time': minutes(metrics['avg_wait']),
+        'avg_service_time': minutes(metrics['avg_service']),
+        'is_admin': access.is_admin,
     }
+
+
+@login_required
+@replica_view
+def dashboard_view(request):
+    """
+    Main dashboard view - shows location-specific data with desk list
+    """
+    user = request.user
+    access = get_access(request)
+    
+    desks = _dashboard_desks(user, access)
+    metrics = _location_metrics(access)
     
+    context = _dashboard_context(user, access, access.accessible_locations(), desks, metrics)
     return render(request, 'dashboard/index.html', context)
 
 
-@login_required
-def desk_detail_view(request, desk_id):
-    """Chi tiết bàn và hàng đợi - CẢ ADMIN VÀ USER ĐỀU XEM ĐƯỢC"""
+@alogin_required
+@replica_view
+async def adashboard_view(request):
+    """Bản async của dashboard_view: số liệu bàn và của địa điểm được đọc song song"""
+    access, accessible_locations = await _aget_access(request)
     user = request.user
-    desk = get_object_or_404(Desk, id=desk_id)
     
-    # Kiểm tra quyền truy cập
-    if not user.is_superuser and desk.location != user.location:
-        messages.error(request, 'Bạn không có quyền truy cập bàn này.')
-        return redirect('dashboard')
+    desks, metrics = await run_parallel(
+        lambda: _dashboard_desks(user, access),
+        lambda: _location_metrics(access),
+    )
     
-    # Khách đang được phục vụ
-    current_serving = desk.queues.filter(
+    context = _dashboard_context(user, access, accessible_locations, desks, metrics)
+    return render(request, 'dashboard/index.html', context)
+
+
+def _current_serving(desk):
+    """Khách đang được phục vụ"""
+    return desk.queues.filter(
         status='in_progress',
-        created_at__date=date.today()
+        **today_filter(desk.location)
     ).first()
-    
-    # Hàng đợi
-    waiting_queue = desk.queues.filter(
-        status='waiting',
-        created_at__date=date.today()
-    ).order_by('-is_priority', 'created_at')
-    
-    # Đã hoàn thành hôm nay
-    completed_today = desk.queues.filter(
+
+
+def _waiting_queue(desk):
+    """
+    Hàng đợi theo thứ tự của hàng chờ trong bộ nhớ (không cần ORDER BY),
+    kèm thời gian phục vụ dự kiến để tính giờ gọi
+    """
+    waiting_ids = waitlists.get(desk).ordered()
+    waiting_rows = desk.queues.in_bulk(waiting_ids)
+    waiting_queue = [waiting_rows[queue_id] for queue_id in waiting_ids if queue_id in waiting_rows]
+    times = ServiceTimes([desk.id], {queue.service_type for queue in waiting_queue})
+    return waiting_queue, times
+
+
+def _completed_today(desk):
+    """10 khách hoàn thành gần nhất hôm nay"""
+    return list(desk.queues.filter(
         status='completed',
-        created_at__date=date.today()
-    ).order_by('-completed_at')
-    
-    # Thống kê
-    total_today = desk.get_today_total()
+        **today_filter(desk.location)
+    ).order_by('-completed_at')[:10])
+
+
+def _desk_metrics(desk):
+    """Thống kê và thời gian chờ/phục vụ, tính trong một truy vấn tổng hợp"""
+    return queue_time_metrics(desk.queues.filter(**today_filter(desk.location)))
+
+
+def _desk_detail_context(user, access, desk, current_serving, waiting, completed_today, metrics):
+    waiting_queue, times = waiting
     
-    # Thời gian phục vụ trung bình
-    completed_queues = desk.queues.filter(
-        status='completed',
-        created_at__date=date.today()
+    # Giờ bắt đầu dự kiến của từng khách đang chờ
+    starts = schedule(
+        times, desk.id, [queue.service_type for queue in waiting_queue],
+        (current_serving.service_type, current_serving.started_at) if current_serving else None,
     )
+    for queue, start in zip(waiting_queue, starts):
+        queue.estimated_start = start
+        queue.estimated_wait = wait_minutes(start)
     
-    avg_service_time = 0
-    if completed_queues.exists():
-        total_time = sum([q.get_service_time() for q in completed_queues])
-        avg_service_time = total_time // completed_queues.count() if completed_queues.count() > 0 else 0
-    
-    context = {
+    return {
         'user': user,
         'desk': desk,
         'current_serving': current_serving,
         'waiting_queue': waiting_queue,
-        'completed_today': completed_today[:10],
-        'total_today': total_today,
-        'avg_service_time': avg_service_time,
-        'waiting_count': waiting_queue.count(),
-        'is_admin': user.is_admin_role(),
+        'completed_today': completed_today,
+        'total_today': metrics['total'],
+        'avg_service_time': minutes(metrics['avg_service']),
+        'avg_wait_time': minutes(metrics['avg_wait']),
+        'p90_wait_time': minutes(metrics['p90_wait']),
+        'waiting_count': metrics['waiting'],
+        'estimated_wait': wait_minutes(starts[-1]),
+        'is_admin': access.is_admin,
     }
+
+
+@login_required
+@replica_view
+def desk_detail_view(request, desk_id):
+    """Chi tiết bàn và hàng đợi - CẢ ADMIN VÀ USER ĐỀU XEM ĐƯỢC"""
+    user = request.user
+    access = get_access(request)
+    desk = get_object_or_404(Desk.objects.select_related('location'), id=desk_id)
+    
+    # Kiểm tra quyền truy cập
+    if not access.can_access(desk.location_id):
+        messages.error(request, 'Bạn không có quyền truy cập bàn này.')
+        return redirect('dashboard')
     
+    context = _desk_detail_context(
+        user, access, desk,
+        _current_serving(desk),
+        _waiting_queue(desk),
+        _completed_today(desk),
+        _desk_metrics(desk),
+    )
     return render(request, 'queue/desk_detail.html', context)
 
 
+@alogin_required
+@replica_view
+async def adesk_detail_view(request, desk_id):
+    """
+    Bản async của desk_detail_view
+
+    Khách đang phục vụ, hàng chờ, khách đã xong và thống kê của bàn là bốn
+    truy vấn độc lập nên được đọc song song.
+    """
+    access, _ = await _aget_access(request)
+    desk = await Desk.objects.select_related('location').filter(id=desk_id).afirst()
+    if desk is None:
+        raise Http404
+    
+    # Kiểm tra quyền truy cập
+    if not access.can_access(desk.location_id):
+        messages.error(request, 'Bạn không có quyền truy cập bàn này.')
+        return redirect('dashboard')
+    
+    current_serving, waiting, completed_today, metrics = await run_parallel(
+        lambda: _current_serving(desk),
+        lambda: _waiting_queue(desk),
+        lambda: _completed_today(desk),
+        lambda: _desk_metrics(desk),
+    )
+    
+    context = _desk_detail_context(
+        request.user, access, desk, current_serving, waiting, completed_today, metrics
+    )
+    return render(request, 'queue/desk_detail.html', context)
+
+
+@login_required
+@require_GET
+def desk_eta_data(request, desk_id):
+    """Thời gian chờ dự kiến của các khách đang chờ tại bàn (JSON)"""
+    desk = get_object_or_404(Desk.objects.select_related('location'), id=desk_id)
+    
+    # Kiểm tra quyền truy cập
+    if not get_access(request).can_access(desk.location_id):
+        return JsonResponse({'error': 'Không có quyền'}, status=403)
+    
+    tickets, next_start = desk_estimates(desk, waitlists.get(desk).ordered())
+    return JsonResponse({
+        'desk': desk.id,
+        'is_active': desk.is_active,
+        'tickets': [
+            dict(ticket, estimated_start=ticket['estimated_start'].isoformat())
+            for ticket in tickets
+        ],
+        'estimated_wait': wait_minutes(next_start) if next_start else None,
+    })
+
+
 @login_required
 @admin_required
+@immediate_atomic()
 def add_to_queue(request, desk_id):
     """Thêm khách vào hàng đợi - CHỈ ADMIN"""
     if request.method == 'POST':
-        desk = get_object_or_404(Desk, id=desk_id)
+        desk = get_object_or_404(Desk.objects.select_related('location'), id=desk_id)
         
         # Kiểm tra quyền
-        if not request.user.is_superuser and desk.location != request.user.location:
+        if not get_access(request).can_access(desk.location_id):
             return JsonResponse({'success': False, 'error': 'Không có quyền'})
         
-        # Tạo số thứ tự tự động
-        today_count = WalkInQueue.objects.filter(
-            desk=desk,
-            created_at__date=date.today()
-        ).count()
-        
-        queue_number = f"{desk.desk_number.replace('Bàn ', '')}{today_count + 1:03d}"
-        
-        # Tạo hàng đợi mới
-        queue = WalkInQueue.objects.create(
-            location=desk.location,
-            desk=desk,
-            queue_number=queue_number,
+        # Tạo hàng đợi mới, số thứ tự được cấp tự động theo bàn và ngày
+        queue = WalkInQueue.enqueue(
+            desk,
             customer_name=request.POST.get('customer_name'),
             customer_phone=request.POST.get('customer_phone', ''),
             service_type=request.POST.get('service_type'),
@@ -229,7 +381,7 @@ def add_to_queue(request, desk_id):
             is_priority=request.POST.get('is_priority') == 'on',
         )
         
-        messages.success(request, f'Đã thêm {queue.customer_name} vào hàng đợi với số {queue_number}')
+        messages.success(request, f'Đã thêm {queue.customer_name} vào hàng đợi với số {queue.queue_number}')
         return redirect('desk_detail', desk_id=desk.id)
     
     return redirect('dashboard')
@@ -237,66 +389,156 @@ def add_to_queue(request, desk_id):
 
 @login_required
 @admin_required
+@immediate_atomic()
+def add_to_location_queue(request, location_id):
+    """Lấy số theo loại dịch vụ, hệ thống tự chọn bàn gọi sớm nhất - CHỈ ADMIN"""
+    if request.method != 'POST':
+        return redirect('dashboard')
+    
+    location = locations.get(location_id)
+    if location is None:
+        raise Http404
+    
+    # Kiểm tra quyền
+    if not get_access(request).can_access(location.id):
+        messages.error(request, 'Không có quyền')
+        return redirect('dashboard')
+    
+    service_type = request.POST.get('service_type', '').strip()
+    is_priority = request.POST.get('is_priority') == 'on'
+    desk = choose_desk(location, service_type, is_priority) if service_type else None
+    if desk is None:
+        messages.error(request, f'Không có bàn nào đang mở phục vụ "{service_type}"')
+        return redirect('dashboard')
+    
+    queue = WalkInQueue.enqueue(
+        desk,
+        customer_name=request.POST.get('customer_name'),
+        customer_phone=request.POST.get('customer_phone', ''),
+        service_type=service_type,
+        notes=request.POST.get('notes', ''),
+        is_priority=is_priority,
+    )
+    
+    messages.success(
+        request,
+        f'Đã thêm {queue.customer_name} vào hàng đợi {desk.desk_number} với số {queue.queue_number}'
+    )
+    return redirect('dashboard')
+
+
+@login_required
+@admin_required
+@immediate_atomic()
 def call_queue(request, queue_id):
     """Gọi khách hàng - CHỈ ADMIN"""
     queue = get_object_or_404(WalkInQueue, id=queue_id)
     
     # Kiểm tra quyền
-    if not request.user.is_superuser and queue.location != request.user.location:
+    if not get_access(request).can_access(queue.location_id):
         messages.error(request, 'Không có quyền')
         return redirect('dashboard')
     
-    queue.call()
-    queue.start_serving(request.user)
+    # Gọi và bắt đầu phục vụ trong một UPDATE, chỉ khi khách vẫn đang chờ
+    claimed = WalkInQueue.claim(queue.id, request.user)
+    if claimed is None:
+        messages.error(request, f'Số {queue.queue_number} đã được gọi hoặc không còn trong hàng đợi')
+    else:
+        messages.success(request, f'Đã gọi số {claimed.queue_number} - {claimed.customer_name}')
+    return redirect('desk_detail', desk_id=queue.desk_id)
+
+
+@login_required
+@admin_required
+@immediate_atomic()
+def call_next(request, desk_id):
+    """Gọi khách kế tiếp theo thứ tự ưu tiên - CHỈ ADMIN"""
+    if request.method != 'POST':
+        return redirect('desk_detail', desk_id=desk_id)
+    
+    desk = get_object_or_404(Desk.objects.select_related('location'), id=desk_id)
+    
+    # Kiểm tra quyền
+    if not get_access(request).can_access(desk.location_id):
+        messages.error(request, 'Không có quyền')
+        return redirect('dashboard')
+    
+    queue = claim_next(desk, request.user)
+    if queue is None:
+        messages.info(request, 'Không còn khách nào đang chờ')
+        return redirect('desk_detail', desk_id=desk.id)
     
     messages.success(request, f'Đã gọi số {queue.queue_number} - {queue.customer_name}')
-    return redirect('desk_detail', desk_id=queue.desk.id)
+    return redirect('desk_detail', desk_id=desk.id)
 
 
 @login_required
 @admin_required
+@immediate_atomic()
 def complete_queue(request, queue_id):
     """Hoàn thành phục vụ - CHỈ ADMIN"""
     queue = get_object_or_404(WalkInQueue, id=queue_id)
     
     # Kiểm tra quyền
-    if not request.user.is_superuser and queue.location != request.user.location:
+    if not get_access(request).can_access(queue.location_id):
         messages.error(request, 'Không có quyền')
         return redirect('dashboard')
     
-    queue.complete()
-    
-    messages.success(request, f'Đã hoàn thành phục vụ {queue.queue_number} - {queue.customer_name}')
-    return redirect('desk_detail', desk_id=queue.desk.id)
+    if queue.complete():
+        messages.success(request, f'Đã hoàn thành phục vụ {queue.queue_number} - {queue.customer_name}')
+    else:
+        messages.error(request, f'Số {queue.queue_number} không còn đang được phục vụ')
+    return redirect('desk_detail', desk_id=queue.desk_id)
 
 
 @login_required
 @admin_required
+@immediate_atomic()
 def cancel_queue(request, queue_id):
     """Huỷ hàng đợi - CHỈ ADMIN"""
     queue = get_object_or_404(WalkInQueue, id=queue_id)
     
     # Kiểm tra quyền
-    if not request.user.is_superuser and queue.location != request.user.location:
+    if not get_access(request).can_access(queue.location_id):
         messages.error(request, 'Không có quyền')
         return redirect('dashboard')
     
-    queue.cancel()
-    
-    messages.success(request, f'Đã huỷ {queue.queue_number} - {queue.customer_name}')
-    return redirect('desk_detail', desk_id=queue.desk.id)
+    if queue.cancel():
+        messages.success(request, f'Đã huỷ {queue.queue_number} - {queue.customer_name}')
+    else:
+        messages.error(request, f'Số {queue.queue_number} đã được xử lý xong')
+    return redirect('desk_detail', desk_id=queue.desk_id)
+
+
+def _managed_desks(user):
+    if user.is_superuser:
+        return Desk.objects.select_related('location')
+    return Desk.objects.select_related('location').filter(location_id=user.location_id)
 
 
 @login_required
 @admin_required
+@replica_view
 def desk_management_view(request):
     """Quản lý bàn - CHỈ ADMIN"""
     user = request.user
+    desks = list(_managed_desks(user))
     
-    if user.is_superuser:
-        desks = Desk.objects.all()
-    else:
-        desks = Desk.objects.filter(location=user.location)
+    context = {
+        'user': user,
+        'desks': desks,
+    }
+    
+    return render(request, 'queue/desk_management.html', context)
+
+
+@alogin_required
+@admin_required
+@replica_view
+async def adesk_management_view(request):
+    """Bản async của desk_management_view"""
+    user = request.user
+    desks = [desk async for desk in _managed_desks(user)]
     
     context = {
         'user': user,
@@ -334,7 +576,7 @@ def delete_desk(request, desk_id):
     desk = get_object_or_404(Desk, id=desk_id)
     
     # Kiểm tra quyền
-    if not request.user.is_superuser and desk.location != request.user.location:
+    if not get_access(request).can_access(desk.location_id):
         messages.error(request, 'Không có quyền xoá bàn này.')
         return redirect('desk_management')
     
@@ -353,20 +595,133 @@ def profile_view(request):
     }
     return render(request, 'accounts/profile.html', context)
 
-@login_required
-@admin_required
-def desk_management_view(request):
-    """Quản lý bàn - CHỈ ADMIN"""
+
+
+
+@sync_to_async
+def _can_follow(request, location_id):
+    """Kiểm tra người dùng đã đăng nhập và được xem địa điểm"""
     user = request.user
-    
-    if user.is_superuser:
-        desks = Desk.objects.all()
-    else:
-        desks = Desk.objects.filter(location=user.location)
+    if not user.is_authenticated:
+        return False
+    return user.is_superuser or user.location_id == location_id
+
+
+def _event_response(request, channel):
+    """Phản hồi text/event-stream cho một kênh sự kiện"""
+    if not isinstance(request, ASGIRequest):
+        # Dưới WSGI luồng sự kiện sẽ giữ worker cho tới khi hết hạn,
+        # nên chỉ báo trình duyệt thử lại sau
+        return HttpResponse('retry: 60000\n\n', content_type='text/event-stream')
+    response = StreamingHttpResponse(event_stream(channel), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def desk_events(request, desk_id):
+    """Luồng sự kiện của một bàn (Server-Sent Events)"""
+    desk = await Desk.objects.filter(id=desk_id).values('location_id').afirst()
+    if desk is None or not await _can_follow(request, desk['location_id']):
+        return HttpResponseForbidden()
+    return _event_response(request, desk_channel(desk_id))
+
+
+async def location_events(request, location_id):
+    """Luồng sự kiện của một địa điểm (Server-Sent Events)"""
+    if not await _can_follow(request, location_id):
+        return HttpResponseForbidden()
+    return _event_response(request, location_channel(location_id))
+
+
+@require_GET
+def display_board_view(request, location_id):
+    """Bảng hiển thị số thứ tự cho TV ở sảnh chờ - KHÔNG CẦN ĐĂNG NHẬP"""
+    cached = get_board(location_id)
+    if cached is None:
+        raise Http404
+    board, _ = cached
+    return render(request, 'display/board.html', {'board': board})
+
+
+@require_GET
+def display_board_data(request, location_id):
+    """Dữ liệu bảng hiển thị (JSON), hỗ trợ ETag/304"""
+    cached = get_board(location_id)
+    if cached is None:
+        raise Http404
+    board, etag = cached
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(board)
+    response['ETag'] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+@login_required
+@replica_view
+def reports_view(request):
+    """Báo cáo lượt phục vụ theo địa điểm/bàn trong một khoảng ngày"""
+    filters = ReportFilters(request.user, request.GET)
+    report = throughput_report(filters)
     
     context = {
-        'user': user,
-        'desks': desks,
+        'filters': filters,
+        'locations': filters.locations,
+        'desks': Desk.objects.filter(location__in=filters.locations).select_related('location'),
+        'by_desk': report['by_desk'],
+        'by_day': report['by_day'],
+        'totals': report['totals'],
+        'query': urlencode(filters.as_query()),
     }
-    
-    return render(request, 'queue/desk_management.html', context)
\ No newline at end of file
+    return render(request, 'reports/index.html', context)
+
+
+EXPORT_FORMATS = {
+    'csv': (stream_csv, 'text/csv; charset=utf-8'),
+    'xlsx': (stream_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+@login_required
+@replica_view
+@require_GET
+def export_report(request, file_format):
+    """Xuất chi tiết hàng đợi của báo cáo (CSV/XLSX), gửi dần từng khối"""
+    if file_format not in EXPORT_FORMATS:
+        raise Http404
+    filters = ReportFilters(request.user, request.GET)
+    writer, content_type = EXPORT_FORMATS[file_format]
+    
+    # Dữ liệu được đọc sau khi view trả về nên phải chọn sẵn cơ sở dữ liệu
+    rows = export_rows(filters, using=router.db_for_read(WalkInQueue))
+    content = writer(EXPORT_HEADER, rows)
+    if isinstance(request, ASGIRequest):
+        content = aiter_chunks(content)
+    response = StreamingHttpResponse(content, content_type=content_type)
+    filename = f'walkin_{filters.start:%Y%m%d}_{filters.end:%Y%m%d}.{file_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+@admin_required
+@require_GET
+def perf_stats_view(request):
+    """p50/p95/p99 và số truy vấn của các request gần nhất theo tên URL"""
+    return JsonResponse({
+        'enabled': getattr(settings, 'WALKIN_INSTRUMENTATION', False),
+        'window': registry.window,
+        'views': registry.summary(),
+    })
+
+
+@require_GET
+@never_cache
+def metrics_view(request):
+    """Số liệu vận hành (định dạng Prometheus), bảo vệ bằng WALKIN_METRICS_TOKEN nếu có"""
+    token = getattr(settings, 'WALKIN_METRICS_TOKEN', '')
+    if token and not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,246 @@
+# walkin/waitlist.py
+"""
+Hàng chờ trong bộ nhớ của từng bàn
+
+Mỗi bàn có một heap các khách đang chờ hôm nay, khoá theo (ưu tiên, giờ vào
+hàng, id) giống WalkInQueue.Meta.ordering: thêm/bớt O(log n), xem người kế
+tiếp O(1), không cần truy vấn và sắp xếp lại mỗi lần tải trang.
+
+Heap được dựng từ cơ sở dữ liệu ở lần dùng đầu tiên của mỗi tiến trình và
+được cập nhật bởi tín hiệu queue_changed (phát từ các phương thức chuyển
+trạng thái). Mỗi thay đổi cũng tăng phiên bản 'desk' trong cache dùng chung:
+tiến trình nào thấy phiên bản khác với phiên bản heap của mình (thay đổi từ
+worker khác) sẽ dựng lại heap của bàn đó. Phiên bản này cũng tăng khi bàn
+được lưu.
+
+Heap chỉ được giữ giữa các request khi mọi worker dùng chung phiên bản
+(settings.WALKIN_WAITLIST_HEAP: cache 'walkin_counters' trên Redis, hoặc chỉ
+một tiến trình); nếu không, hàng chờ được đọc lại từ cơ sở dữ liệu mỗi lần.
+
+Heap được đọc bởi nhiều thread (request, thread truy vấn song song) trong
+khi tín hiệu cập nhật nó: mọi thao tác của DeskWaitlist giữ khoá của
+registry, các phép đọc nhiều phần tử làm trên một bản chụp lấy trong khoá.
+"""
+
+import heapq
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_version, get_version
+from .models import Desk, WalkInQueue
+from .signals import queue_changed
+from .utils import local_today, today_filter
+
+
+def _sort_key(is_priority, created_at, queue_id):
+    return (0 if is_priority else 1, created_at.timestamp(), queue_id)
+
+
+class DeskWaitlist:
+    """
+    Heap các khách đang chờ của một bàn trong một ngày
+
+    Khách rời hàng được đánh dấu và bỏ khỏi đỉnh heap khi cần (xoá lười),
+    nên mọi thao tác đều không phải dựng lại heap. `lock` là khoá của
+    registry chứa hàng chờ này (mặc định một khoá riêng).
+    """
+
+    def __init__(self, day, rows=(), version=None, serving=None, lock=None):
+        self._lock = lock or threading.RLock()
+        self.day = day
+        self.version = version
+        # (id, loại dịch vụ, started_at) của khách đang được phục vụ
+        self.serving = serving
+        self._keys = {}
+        self._types = {}
+        for queue_id, is_priority, created_at, service_type in rows:
+            self._keys[queue_id] = _sort_key(is_priority, created_at, queue_id)
+            self._types[queue_id] = service_type
+        self._heap = list(self._keys.values())
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, queue_id):
+        return queue_id in self._keys
+
+    def _snapshot(self):
+        """(khoá sắp xếp đã sắp xếp, loại dịch vụ theo id) tại một thời điểm"""
+        with self._lock:
+            keys, types = list(self._keys.values()), dict(self._types)
+        keys.sort()
+        return keys, types
+
+    def push(self, queue_id, is_priority, created_at, service_type=None):
+        """Thêm (hoặc cập nhật) một khách đang chờ"""
+        key = _sort_key(is_priority, created_at, queue_id)
+        with self._lock:
+            self._types[queue_id] = service_type
+            if self._keys.get(queue_id) == key:
+                return
+            self._keys[queue_id] = key
+            heapq.heappush(self._heap, key)
+
+    def remove(self, queue_id):
+        """Bỏ một khách khỏi hàng chờ, không làm gì nếu không có"""
+        with self._lock:
+            self._keys.pop(queue_id, None)
+            self._types.pop(queue_id, None)
+
+    def _prune(self):
+        heap = self._heap
+        while heap and self._keys.get(heap[0][2]) != heap[0]:
+            heapq.heappop(heap)
+        # Dọn heap khi phần tử đã xoá chiếm quá nửa
+        if len(heap) > 2 * len(self._keys) + 32:
+            self._heap = list(self._keys.values())
+            heapq.heapify(self._heap)
+
+    def peek(self):
+        """id của khách kế tiếp, None nếu hàng chờ trống"""
+        with self._lock:
+            self._prune()
+            return self._heap[0][2] if self._heap else None
+
+    def position(self, queue_id):
+        """Vị trí trong hàng (1 là người kế tiếp), None nếu không còn chờ"""
+        with self._lock:
+            key = self._keys.get(queue_id)
+            if key is None:
+                return None
+            keys = list(self._keys.values())
+        return 1 + sum(1 for other in keys if other < key)
+
+    def ordered(self):
+        """id các khách đang chờ theo thứ tự được gọi"""
+        keys, _ = self._snapshot()
+        return [key[2] for key in keys]
+
+    def ahead_of(self, is_priority):
+        """Loại dịch vụ của những khách sẽ được gọi trước một khách mới vào hàng"""
+        keys, types = self._snapshot()
+        return [types[key[2]] for key in keys if not is_priority or key[0] == 0]
+
+
+class WaitlistRegistry:
+    """Các DeskWaitlist của tiến trình hiện tại, theo id bàn"""
+
+    def __init__(self):
+        self._waitlists = {}
+        self._lock = threading.RLock()
+
+    def _load(self, desk, day, version):
+        # Luôn đọc từ primary: heap dựng từ replica đang trễ sẽ được giữ tới
+        # thay đổi kế tiếp của bàn
+        rows = (
+            WalkInQueue.objects.using('default').filter(
+                desk=desk, status__in=['waiting', 'in_progress'], **today_filter(desk.location)
+            )
+            .order_by('started_at')
+            .values_list('id', 'status', 'is_priority', 'created_at', 'service_type', 'started_at')
+        )
+        waiting, serving = [], None
+        for queue_id, status, is_priority, created_at, service_type, started_at in rows:
+            if status == 'waiting':
+                waiting.append((queue_id, is_priority, created_at, service_type))
+            else:
+                serving = (queue_id, service_type, started_at)
+        return DeskWaitlist(day, waiting, version, serving, lock=self._lock)
+
+    def get(self, desk):
+        """Hàng chờ hôm nay của bàn, dựng lại nếu đã cũ"""
+        day = local_today(desk.location)
+        version = get_version('desk', desk.id)
+        if not settings.WALKIN_WAITLIST_HEAP:
+            # Phiên bản riêng của từng tiến trình không thấy thay đổi ở worker khác
+            return self._load(desk, day, version)
+        with self._lock:
+            waitlist = self._waitlists.get(desk.id)
+            if waitlist is None or waitlist.day != day or waitlist.version != version:
+                waitlist = self._waitlists[desk.id] = self._load(desk, day, version)
+            return waitlist
+
+    def invalidate(self, desk_id=None):
+        """Bỏ hàng chờ đã dựng của một bàn (hoặc mọi bàn)"""
+        with self._lock:
+            if desk_id is None:
+                self._waitlists.clear()
+            else:
+                self._waitlists.pop(desk_id, None)
+
+    def apply(self, queue, status):
+        """
+        Cập nhật hàng chờ theo trạng thái mới của một khách
+
+        Chỉ cập nhật tại chỗ khi heap đang khớp với phiên bản ngay trước thay
+        đổi này; nếu không, heap bị bỏ và được dựng lại ở lần đọc sau.
+        """
+        version = bump_version('desk', queue.desk_id)
+        with self._lock:
+            waitlist = self._waitlists.get(queue.desk_id)
+            if waitlist is None:
+                return
+            if waitlist.version != version - 1 or waitlist.day != queue.queue_date:
+                del self._waitlists[queue.desk_id]
+                return
+            if status == 'waiting':
+                waitlist.push(queue.id, queue.is_priority, queue.created_at, queue.service_type)
+            else:
+                waitlist.remove(queue.id)
+                if status == 'in_progress':
+                    waitlist.serving = (queue.id, queue.service_type, queue.started_at)
+                elif waitlist.serving and waitlist.serving[0] == queue.id:
+                    waitlist.serving = None
+            waitlist.version = version
+
+
+registry = WaitlistRegistry()
+
+
+def next_in_line(desk):
+    """id của khách kế tiếp tại bàn, None nếu không còn ai chờ"""
+    return registry.get(desk).peek()
+
+
+def claim_next(desk, user, attempts=3):
+    """
+    Gọi và bắt đầu phục vụ khách kế tiếp của bàn, None nếu không còn ai chờ
+
+    Nếu khách ở đầu hàng đã được gọi ở nơi khác (hàng chờ trong bộ nhớ đã
+    cũ), hàng chờ được dựng lại và thử lại với người kế tiếp.
+    """
+    for attempt in range(attempts):
+        queue_id = next_in_line(desk)
+        if queue_id is None:
+            return None
+        queue = WalkInQueue.claim(queue_id, user, desk=desk)
+        if queue is not None:
+            return queue
+        registry.invalidate(desk.id)
+    return None
+
+
+@receiver(queue_changed)
+def update_waitlist_on_queue_change(sender, queue, status=None, **kwargs):
+    registry.apply(queue, status or queue.status)
+
+
+@receiver(post_save, sender=Desk)
+@receiver(post_delete, sender=Desk)
+def invalidate_waitlist_on_desk_change(sender, instance, using, **kwargs):
+    desk_id = instance.id
+
+    def invalidate():
+        registry.invalidate(desk_id)
+        bump_version('desk', desk_id)
+
+    # Phiên bản chỉ tăng sau khi commit, như queue_changed: heap dựng lại
+    # trước đó từ dòng cũ sẽ được giữ dưới phiên bản mới. Heap của
+    # tiến trình này được bỏ ngay (dựng lại trước commit vẫn mang phiên bản cũ).
+    registry.invalidate(desk_id)
+    transaction.on_commit(invalidate, using=using)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,8 +43,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'walkin.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'walkin.sessions.SlidingSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
@@ -70,18 +72,116 @@ TEMPLATES = [
     },
 ]
 
+# Compiled templates are kept in memory by the cached loader in production
+# (DEBUG off). Set WALKIN_CACHED_TEMPLATES=1 to use it with DEBUG on as well;
+# template edits then need a restart.
+if not DEBUG or os.environ.get('WALKIN_CACHED_TEMPLATES') == '1':
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'walkin_project.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# WALKIN_DB_ENGINE selects the database: 'sqlite' (default) or 'postgresql'.
+WALKIN_DB_ENGINE = os.environ.get('WALKIN_DB_ENGINE', 'sqlite')
+
+if WALKIN_DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('WALKIN_DB_NAME', 'walkin'),
+            'USER': os.environ.get('WALKIN_DB_USER', 'walkin'),
+            'PASSWORD': os.environ.get('WALKIN_DB_PASSWORD', ''),
+            'HOST': os.environ.get('WALKIN_DB_HOST', 'localhost'),
+            'PORT': os.environ.get('WALKIN_DB_PORT', '5432'),
+            # Persistent connections reused across requests by each worker
+            'CONN_MAX_AGE': int(os.environ.get('WALKIN_DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': 5,
+            },
+        }
+    }
+    # Behind PgBouncer in transaction pooling mode the pooler owns the
+    # connections: close ours after each request and avoid server-side
+    # cursors, which do not survive a change of backend connection.
+    if os.environ.get('WALKIN_DB_POOLER') == 'pgbouncer':
+        DATABASES['default'].update({
+            'CONN_MAX_AGE': 0,
+            'DISABLE_SERVER_SIDE_CURSORS': True,
+        })
+    if os.environ.get('WALKIN_DB_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.environ['WALKIN_DB_REPLICA_HOST'],
+            'PORT': os.environ.get('WALKIN_DB_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            # Stock SQLite plus connection pragmas and BEGIN IMMEDIATE support
+            'ENGINE': 'walkin.backends.sqlite3',
+            'NAME': os.environ.get('WALKIN_DB_NAME', BASE_DIR / 'db.sqlite3'),
+            # A file-backed test database (instead of the shared-cache in-memory
+            # default) so concurrency tests get real SQLite locking semantics.
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        }
     }
-}
+
+    # WALKIN_DB_PROFILE=production tunes SQLite for concurrent clerks: WAL
+    # journaling (readers never block the writer), a busy timeout instead of
+    # immediate "database is locked" errors, a larger page cache and mmap, and
+    # persistent connections.
+    WALKIN_DB_PROFILE = os.environ.get('WALKIN_DB_PROFILE', 'development')
+
+    if WALKIN_DB_PROFILE == 'production':
+        DATABASES['default'].update({
+            'CONN_MAX_AGE': int(os.environ.get('WALKIN_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': 20,
+                'pragmas': {
+                    'journal_mode': 'WAL',
+                    'synchronous': 'NORMAL',
+                    'busy_timeout': 20000,
+                    'cache_size': -64000,  # 64 MB
+                    'mmap_size': 268435456,  # 256 MB
+                    'temp_store': 'MEMORY',
+                },
+            },
+        })
+
+    # A second SQLite file (e.g. a Litestream/rsync copy) can stand in for a
+    # read replica locally.
+    if os.environ.get('WALKIN_DB_REPLICA_NAME'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'NAME': os.environ['WALKIN_DB_REPLICA_NAME'],
+            'TEST': {'MIRROR': 'default'},
+        }
+
+# Read-only pages (dashboard, desk detail, desk management) read queue data
+# from this alias when it is configured; everything else uses 'default'.
+WALKIN_DB_READ_REPLICA = 'replica' if 'replica' in DATABASES else None
+DATABASE_ROUTERS = ['walkin.routers.PrimaryReplicaRouter']
+
+# The walk-in backend loads request.user together with its location. The stock
+# backend stays listed so sessions created before the switch remain valid.
+AUTHENTICATION_BACKENDS = [
+    'walkin.backends.auth.LocationModelBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
 
 
 # Password validation
@@ -128,8 +228,103 @@ LOGIN_REDIRECT_URL = '/dashboard/'
 LOGOUT_REDIRECT_URL = '/login/'
 
 # Session settings
+# Sessions slide for 8 hours of inactivity, but SlidingSessionMiddleware only
+# rewrites them once per WALKIN_SESSION_REFRESH_INTERVAL instead of on every
+# request. Set WALKIN_SESSION_ENGINE=django.contrib.sessions.backends.signed_cookies
+# to keep sessions out of the database entirely.
+SESSION_ENGINE = os.environ.get('WALKIN_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db')
 SESSION_COOKIE_AGE = 28800  # 8 hours
-SESSION_SAVE_EVERY_REQUEST = True
+SESSION_SAVE_EVERY_REQUEST = False
+WALKIN_SESSION_REFRESH_INTERVAL = 300  # seconds
+
+# Cache
+# Per-process memory cache by default; set WALKIN_REDIS_URL so that every
+# worker shares cached pages (display boards) and invalidation versions.
+# 'walkin_counters' holds state rather than cached data: invalidation
+# versions, /metrics counters and gauges, and service-time averages. It is
+# kept apart from 'default' (sessions, fragments, boards) so that culling
+# there cannot reset them; its keys are bounded by the number of desks,
+# locations and views, so the memory backend never culls. With Redis the keys
+# are stored without expiry and survive any volatile-* maxmemory-policy.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'walkin',
+    },
+    'walkin_counters': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'walkin-counters',
+        'OPTIONS': {'MAX_ENTRIES': 1_000_000},
+    },
+}
+if os.environ.get('WALKIN_REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['WALKIN_REDIS_URL'],
+    }
+    CACHES['walkin_counters'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['WALKIN_REDIS_URL'],
+        'KEY_PREFIX': 'counters',
+    }
+
+# Lobby display boards
+WALKIN_BOARD_NEXT_COUNT = 3  # waiting numbers shown per desk
+WALKIN_BOARD_CACHE_TIMEOUT = 300  # seconds; boards are also invalidated on change
+
+# Wait-time estimates: service times are tracked per desk and service type as
+# exponentially weighted moving averages, updated on every completed ticket.
+WALKIN_ETA_ALPHA = 0.2  # weight of the newest service time
+WALKIN_ETA_DEFAULT_SERVICE_MINUTES = 10  # used until a desk has history
+
+# Real-time queue events (Server-Sent Events)
+# The in-process broker only reaches screens connected to the same worker;
+# set WALKIN_REDIS_URL when running several ASGI workers.
+WALKIN_EVENT_BROKER = {
+    'BACKEND': 'walkin.events.InProcessBroker',
+}
+if os.environ.get('WALKIN_REDIS_URL'):
+    WALKIN_EVENT_BROKER = {
+        'BACKEND': 'walkin.events.RedisBroker',
+        'OPTIONS': {'url': os.environ['WALKIN_REDIS_URL']},
+    }
+WALKIN_EVENT_HEARTBEAT = 15  # seconds between keep-alive comments
+WALKIN_EVENT_STREAM_TIMEOUT = 300  # seconds before a stream is recycled
+
+# Per-desk waiting lists (walkin/waitlist.py) can be kept as heaps in process
+# memory, invalidated through 'walkin_counters' versions. That is only correct
+# when every worker sees the same versions: with WALKIN_REDIS_URL, or with a
+# single worker process (WALKIN_WAITLIST_HEAP=1). Otherwise a worker would
+# never see tickets enqueued on another one, so the waiting list is read from
+# the database on every use.
+WALKIN_WAITLIST_HEAP = bool(os.environ.get('WALKIN_REDIS_URL')) or os.environ.get('WALKIN_WAITLIST_HEAP') == '1'
+
+# Async dashboard / desk detail / desk management views, used when served by
+# an ASGI server (asgi.py). wsgi.py defaults this to 0 so WSGI servers keep
+# the sync views. Independent queries of an async view run concurrently on a
+# pool of this many threads, each with its own database connection (0 runs
+# them one after another on the request thread).
+WALKIN_ASYNC_VIEWS = os.environ.get('WALKIN_ASYNC_VIEWS', '1') == '1'
+WALKIN_PARALLEL_QUERY_THREADS = int(os.environ.get('WALKIN_PARALLEL_QUERY_THREADS', 8))
+
+# Prometheus metrics at /metrics. Counters live in the cache, so they are
+# shared by all workers when WALKIN_REDIS_URL is set (LocMemCache keeps
+# separate numbers per process). Set WALKIN_METRICS_TOKEN to require
+# "Authorization: Bearer <token>" from the scraper.
+WALKIN_METRICS_TOKEN = os.environ.get('WALKIN_METRICS_TOKEN', '')
+
+# Request instrumentation: query count, SQL/template time and duplicate
+# queries per request (Server-Timing headers), rolling p50/p95/p99 per URL
+# name at /ops/perf/. Opt-in with WALKIN_INSTRUMENTATION=1.
+WALKIN_INSTRUMENTATION = os.environ.get('WALKIN_INSTRUMENTATION') == '1'
+WALKIN_INSTRUMENTATION_WINDOW = 1000  # requests kept per URL name
+if WALKIN_INSTRUMENTATION:
+    MIDDLEWARE.insert(0, 'walkin.instrumentation.QueryInstrumentationMiddleware')
+    TEMPLATES[0]['BACKEND'] = 'walkin.instrumentation.InstrumentedDjangoTemplates'
+
+# Retention: `manage.py archive_walkins` moves queue rows older than this many
+# days into the WalkInQueueArchive table (daily rollups are kept as they are).
+WALKIN_RETENTION_DAYS = int(os.environ.get('WALKIN_RETENTION_DAYS', 180))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
@@ -12,5 +12,8 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'walkin_project.settings')
+# The read-heavy pages have async versions for ASGI; under WSGI every async
+# view would need its own event loop, so keep the sync ones
+os.environ.setdefault('WALKIN_ASYNC_VIEWS', '0')
 
 application = get_wsgi_application()